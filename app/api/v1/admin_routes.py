@@ -1,9 +1,22 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Query
 from fastapi.responses import JSONResponse
 import logging
+import threading
+from typing import Optional
 
 from app.core.security import get_api_key
-from app.indexing.search_service import preload_index_and_metadata, IndexStore
+from app.indexing.search_service import (
+    preload_index_and_metadata,
+    set_search_params,
+    IndexStore,
+)
+from app.core.prompt_builder import template_store
+from app.indexing.embeddings import query_batcher, query_cache
+from app.indexing.index_builder import build_index
+from app.services.lesson_cache import lesson_cache
+from app.services.lesson_catalog import lesson_catalog
+from app.services.llm_service import answer_cache, gateway
+from app.services.passage_cache import passage_cache
 
 logger = logging.getLogger(__name__)
 
@@ -13,13 +26,51 @@ router = APIRouter(
 )
 
 
+# One rebuild at a time per worker; /status reports its progress
+rebuild_lock = threading.Lock()
+rebuild_state = {"status": "idle", "error": None}
+
+
+def rebuild_and_reload() -> None:
+    """
+    Background task behind /reindex?rebuild=true: build the index (which may
+    spawn INDEX_BUILD_WORKERS processes), then load it.
+    """
+    try:
+        build_index()
+        preload_index_and_metadata()
+        logger.info(f"✅ Rebuild complete: {len(IndexStore.metadata)} chunks loaded")
+        rebuild_state.update(status="idle", error=None)
+    except Exception as e:
+        logger.error(f"Error during index rebuild: {e}")
+        rebuild_state.update(status="failed", error=str(e))
+    finally:
+        rebuild_lock.release()
+
+
 @router.post("/reindex")
-def reindex():
+def reindex(
+    background_tasks: BackgroundTasks,
+    rebuild: bool = Query(
+        False, description="Incrementally rebuild the index from app/data first"
+    ),
+):
     """
-    Trigger a full rebuild of the FAISS index and metadata.
+    Reload the FAISS index and metadata, optionally rebuilding them first.
+    The rebuild only embeds chunks that are new or changed since the last
+    build; it runs as a background task, so the call answers 202 at once and
+    /status shows when it is done (409 if one is already running).
+    With several uvicorn workers only the worker serving this request reloads;
+    the others pick up the new files on restart.
     """
+    logger.info(f"🔄 Admin triggered reindex(rebuild={rebuild})")
+    if rebuild:
+        if not rebuild_lock.acquire(blocking=False):
+            raise HTTPException(status_code=409, detail="A rebuild is already running")
+        rebuild_state.update(status="building", error=None)
+        background_tasks.add_task(rebuild_and_reload)
+        return JSONResponse(status_code=202, content={"status": "reindex started"})
     try:
-        logger.info("🔄 Admin triggered reindex()")
         preload_index_and_metadata()
         logger.info(f"✅ Reindex complete: {len(IndexStore.metadata)} chunks loaded")
         return JSONResponse(
@@ -34,6 +85,27 @@ def reindex():
         raise HTTPException(status_code=500, detail=f"Reindex failed: {e}")
 
 
+@router.post("/templates/reload")
+def reload_templates():
+    """
+    Re-read and recompile the prompt templates in app/prompts. If any template
+    is malformed the previous set stays in use. Like /reindex, only the worker
+    serving this request reloads. Cached LLM answers were generated from the
+    old prompts, so they are dropped.
+    """
+    try:
+        modes = template_store.load()
+    except ValueError as e:
+        logger.error(f"Template reload rejected: {e}")
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error during template reload: {e}")
+        raise HTTPException(status_code=500, detail=f"Template reload failed: {e}")
+    answer_cache.clear()
+    logger.info(f"✅ Reloaded prompt templates: {', '.join(modes)}")
+    return JSONResponse(content={"status": "reloaded", "modes": modes})
+
+
 @router.get("/status")
 def admin_status():
     """
@@ -43,5 +115,31 @@ def admin_status():
         content={
             "index_loaded": IndexStore.index is not None,
             "metadata_count": len(IndexStore.metadata) if IndexStore.metadata else 0,
+            "chunk_count": len(IndexStore.chunk_texts),
+            "rebuild": dict(rebuild_state),
+            "search_params": IndexStore.search_params,
+            "embedding_cache": query_cache.stats(),
+            "embedding_batcher": query_batcher.stats() if query_batcher else None,
+            "answer_cache": answer_cache.stats(),
+            "llm_gateway": gateway.stats(),
+            "bible_passage_cache": passage_cache.stats(),
+            "lesson_catalog": lesson_catalog.stats(),
+            "lesson_cache": lesson_cache.stats(),
         }
     )
+
+
+@router.post("/search-params")
+def update_search_params(
+    nprobe: Optional[int] = Query(None, ge=1, description="IVF lists per query"),
+    ef_search: Optional[int] = Query(None, ge=1, description="HNSW efSearch"),
+):
+    """
+    Tune the recall/latency trade-off of the loaded approximate index.
+    """
+    if IndexStore.index is None:
+        raise HTTPException(status_code=503, detail="FAISS index not loaded")
+    IndexStore.search_params = set_search_params(
+        IndexStore.index, nprobe=nprobe, ef_search=ef_search
+    )
+    return JSONResponse(content={"search_params": IndexStore.search_params})
@@ -1,8 +1,6 @@
-import json
 from fastapi import APIRouter, HTTPException
-from pathlib import Path
 import logging
-from app.services.bible_service import parse_reference
+from app.services.bible_service import BIBLE, parse_reference
 
 SPANISH_BOOK_MAP = {
     "Gén.": "Génesis",
@@ -17,17 +15,9 @@ SPANISH_BOOK_MAP = {
 }
 
 
-BIBLE_DATA_PATH = Path(__file__).parent.parent.parent / "bible" / "RVR1960.json"
 router = APIRouter()
 logger = logging.getLogger(__name__)
 
-try:
-    with open(BIBLE_DATA_PATH, "r", encoding="utf-8") as f:
-        BIBLE = json.load(f)
-except Exception as e:
-    BIBLE = {}
-    logger.error(f"Failed to load Bible JSON: {e}")
-
 
 @router.get("/books")
 def list_books():
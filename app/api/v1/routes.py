@@ -1,40 +1,111 @@
 from typing import Literal
-from fastapi import APIRouter, Body, HTTPException, Query, UploadFile, File
+from fastapi import APIRouter, Body, Header, HTTPException, Query, UploadFile, File
 import json
+import math
 from fastapi import Form
 from fastapi.responses import FileResponse
-from fastapi.responses import StreamingResponse, JSONResponse
+from fastapi.responses import (
+    JSONResponse,
+    RedirectResponse,
+    Response,
+    StreamingResponse,
+)
+from starlette.concurrency import run_in_threadpool
 import botocore
 from typing import Literal, Optional
 import logging
 from pydantic import BaseModel, Field
 from pathlib import Path
-from app.indexing.search_service import search_lessons, IndexStore
-from app.services.llm_service import generate_llm_response, get_llm_response
+from app.indexing.search_service import (
+    search_lessons_async,
+    IndexStore,
+    DOC_TYPE_ALIASES,
+)
+from app.services.llm_gateway import LLMTimeoutError, LLMUnavailableError
+from app.services.llm_service import (
+    generate_llm_response_async,
+    get_llm_response_async,
+    stream_llm_response,
+    stream_llm_text,
+)
 from app.services.cms_service import (
     load_metadata_by_path,
 )
 
+from app.services.lesson_cache import LessonDocument, lesson_cache
+from app.services.lesson_catalog import lesson_catalog
 from app.services.llm_parser import extract_pdf_to_json
-from app.core.config import BUCKET, s3
+from app.services.s3_store import stream_body
+from app.core.config import BUCKET, s3, settings
+from app.core.http_cache import (
+    byte_range,
+    cache_headers,
+    not_modified,
+    parse_http_date,
+    strong_etags,
+)
 
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
 
+# Headers for server-sent event streams; X-Accel-Buffering stops nginx-style
+# proxies from holding tokens back until the response completes
+SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+
+def sse_event(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+def llm_unavailable(e: LLMUnavailableError) -> HTTPException:
+    # 504 when the request ran out of time, 503 when the model is throttled
+    # or failing; Retry-After tells clients when to come back
+    return HTTPException(
+        status_code=504 if isinstance(e, LLMTimeoutError) else 503,
+        detail=str(e),
+        headers={"Retry-After": str(math.ceil(e.retry_after))},
+    )
+
+
+def llm_error_event(e: LLMUnavailableError) -> str:
+    return sse_event("error", {"detail": str(e), "retry_after": e.retry_after})
+
 
 class QARequest(BaseModel):
     question: str
     top_k: int = Field(default=1, ge=1, le=20, description="Must be between 1 and 20")
     lang: Literal["en", "es"] = "es"
     mode: Literal["explain", "reflect", "apply", "summarize", "ask"] = "explain"
+    stream: bool = Field(
+        default=False, description="Stream the answer as server-sent events"
+    )
+
+
+def lesson_document_response(
+    document: LessonDocument,
+    if_none_match: Optional[str],
+    if_modified_since: Optional[str],
+) -> Response:
+    """
+    JSON response for a cached lesson document carrying its S3 validators,
+    or 304 when the client's copy is current.
+    """
+    headers = cache_headers(
+        document.etag, document.last_modified, settings.LESSON_HTTP_CACHE_CONTROL
+    )
+    if not_modified(
+        document.etag, document.last_modified, if_none_match, if_modified_since
+    ):
+        return Response(status_code=304, headers=headers)
+    return JSONResponse(content=document.document, headers=headers)
 
 
 @router.get("/ping")
 def ping():
     status = {
         "faiss_index_loaded": IndexStore.index is not None,
-        "metadata_loaded": isinstance(IndexStore.metadata, list)
+        "metadata_loaded": IndexStore.metadata is not None
         and len(IndexStore.metadata) > 0,
     }
     return (
@@ -45,16 +116,22 @@ def ping():
 
 
 @router.get("/lessons/{year}/{quarter}/{lesson_id}")
-def get_lesson(year: str, quarter: str, lesson_id: str):
+def get_lesson(
+    year: str,
+    quarter: str,
+    lesson_id: str,
+    if_none_match: Optional[str] = Header(None),
+    if_modified_since: Optional[str] = Header(None),
+):
     """
     Returns the full lesson.json file for a given year, quarter, and lesson ID.
     Example: /api/v1/lessons/2025/Q2/lesson-6
     """
     key = f"{year}/{quarter}/{lesson_id}/lesson.json"
     try:
-        obj = s3.get_object(Bucket=BUCKET, Key=key)
-        body = obj["Body"].read().decode("utf-8")
-        return JSONResponse(content=json.loads(body))
+        return lesson_document_response(
+            lesson_cache.get_document(key), if_none_match, if_modified_since
+        )
     except botocore.exceptions.ClientError as e:
         if e.response["Error"]["Code"] in ("NoSuchKey", "404"):
             logger.error(f"Lesson JSON not found in S3: {key}")
@@ -64,16 +141,22 @@ def get_lesson(year: str, quarter: str, lesson_id: str):
 
 
 @router.get("/lessons/{year}/{quarter}/{lesson_id}/metadata")
-def get_lesson_metadata(year: str, quarter: str, lesson_id: str):
+def get_lesson_metadata(
+    year: str,
+    quarter: str,
+    lesson_id: str,
+    if_none_match: Optional[str] = Header(None),
+    if_modified_since: Optional[str] = Header(None),
+):
     """
     Returns the metadata.json file for a given year, quarter, and lesson ID.
     Example: /api/v1/lessons/2025/Q2/lesson_06/metadata
     """
     key = f"{year}/{quarter}/{lesson_id}/metadata.json"
     try:
-        obj = s3.get_object(Bucket=BUCKET, Key=key)
-        body = obj["Body"].read().decode("utf-8")
-        return JSONResponse(content=json.loads(body))
+        return lesson_document_response(
+            lesson_cache.get_document(key), if_none_match, if_modified_since
+        )
     except botocore.exceptions.ClientError as e:
         if e.response["Error"]["Code"] in ("NoSuchKey", "404"):
             logger.error(f"Metadata not found in S3: {key}")
@@ -82,103 +165,146 @@ def get_lesson_metadata(year: str, quarter: str, lesson_id: str):
         raise HTTPException(status_code=500, detail="Error fetching metadata from S3")
 
 
+def pdf_error_response(e: botocore.exceptions.ClientError, key: str) -> Response:
+    """
+    304/416 response for an S3 error on a PDF read; raises HTTPException
+    (404 or 500) for the others.
+    """
+    error = e.response["Error"]
+    if e.response.get("ResponseMetadata", {}).get("HTTPStatusCode") == 304:
+        s3_headers = e.response["ResponseMetadata"].get("HTTPHeaders", {})
+        headers = {"Cache-Control": settings.LESSON_HTTP_CACHE_CONTROL}
+        if s3_headers.get("etag"):
+            headers["ETag"] = s3_headers["etag"]
+        if s3_headers.get("last-modified"):
+            headers["Last-Modified"] = s3_headers["last-modified"]
+        return Response(status_code=304, headers=headers)
+    if error["Code"] == "InvalidRange":
+        return Response(
+            status_code=416,
+            headers={"Content-Range": f"bytes */{error.get('ActualObjectSize', '*')}"},
+        )
+    if error["Code"] in ("NoSuchKey", "404"):
+        logger.error(f"PDF not found in S3: {key}")
+        raise HTTPException(status_code=404, detail="PDF file not found")
+    logger.error(f"Error retrieving PDF from S3: {e}")
+    raise HTTPException(status_code=500, detail="Error fetching PDF from S3")
+
+
+def presigned_pdf_url(key: str, lesson_id: str) -> Optional[str]:
+    """
+    Short-lived presigned GET URL for a lesson PDF, or None if it does not
+    exist. The lesson catalog's bucket listing is checked first and signing is
+    local, so a listed PDF costs no request to S3 while the catalog is fresh.
+    A PDF missing from a possibly stale listing (e.g. just imported through
+    another worker) is confirmed with head_object before giving up.
+    """
+    if not lesson_catalog.has_object(key):
+        try:
+            s3.head_object(Bucket=BUCKET, Key=key)
+        except botocore.exceptions.ClientError as e:
+            if e.response.get("Error", {}).get("Code") in ("NoSuchKey", "404"):
+                return None
+            raise
+    return s3.generate_presigned_url(
+        "get_object",
+        Params={
+            "Bucket": BUCKET,
+            "Key": key,
+            "ResponseContentDisposition": f'attachment; filename="{lesson_id}.pdf"',
+        },
+        ExpiresIn=settings.LESSON_PDF_URL_EXPIRY_SECONDS,
+    )
+
+
 @router.get("/lessons/{year}/{quarter}/{lesson_id}/pdf")
-def get_lesson_pdf(year: str, quarter: str, lesson_id: str):
+async def get_lesson_pdf(
+    year: str,
+    quarter: str,
+    lesson_id: str,
+    delivery: Optional[Literal["proxy", "redirect", "url"]] = Query(
+        None, description="Overrides LESSON_PDF_DELIVERY for this request"
+    ),
+    range_header: Optional[str] = Header(None, alias="Range"),
+    if_none_match: Optional[str] = Header(None),
+    if_modified_since: Optional[str] = Header(None),
+):
     """
     Returns the PDF file for a given year, quarter, and lesson ID.
     Example: /api/v1/lessons/2025/Q2/lesson-08/pdf
+    In redirect/url delivery the client downloads from a presigned S3 URL.
+    In proxy delivery, range requests (a single byte range) and conditional
+    requests are passed through to S3, so partial downloads get a 206 and
+    current copies a 304.
     """
     key = f"{year}/{quarter}/{lesson_id}/{lesson_id}.pdf"
-    try:
-        obj = s3.get_object(Bucket=BUCKET, Key=key)
-        # Stream the PDF content
-        return StreamingResponse(
-            obj["Body"].iter_chunks(chunk_size=8192),
-            media_type="application/pdf",
-            headers={"Content-Disposition": f'attachment; filename="{lesson_id}.pdf"'},
-        )
-    except botocore.exceptions.ClientError as e:
-        if e.response["Error"]["Code"] in ("NoSuchKey", "404"):
+    mode = delivery or settings.LESSON_PDF_DELIVERY
+    if mode in ("redirect", "url"):
+        # Off the event loop: a stale catalog is revalidated with a listing
+        try:
+            url = await run_in_threadpool(presigned_pdf_url, key, lesson_id)
+        except botocore.exceptions.ClientError as e:
+            return pdf_error_response(e, key)
+        if url is None:
             logger.error(f"PDF not found in S3: {key}")
             raise HTTPException(status_code=404, detail="PDF file not found")
-        logger.error(f"Error retrieving PDF from S3: {e}")
-        raise HTTPException(status_code=500, detail="Error fetching PDF from S3")
+        # The URL expires, so neither answer may be cached
+        headers = {"Cache-Control": "no-store"}
+        if mode == "url":
+            return JSONResponse(
+                content={
+                    "url": url,
+                    "expires_in": settings.LESSON_PDF_URL_EXPIRY_SECONDS,
+                },
+                headers=headers,
+            )
+        return RedirectResponse(url, status_code=307, headers=headers)
+
+    params = {"Bucket": BUCKET, "Key": key}
+    requested_range = byte_range(range_header)
+    if requested_range:
+        params["Range"] = requested_range
+    modified_since = parse_http_date(if_modified_since)
+    if if_none_match:
+        params["IfNoneMatch"] = strong_etags(if_none_match)
+    elif modified_since:
+        params["IfModifiedSince"] = modified_since
+    try:
+        obj = await run_in_threadpool(s3.get_object, **params)
+    except botocore.exceptions.ClientError as e:
+        return pdf_error_response(e, key)
+
+    headers = cache_headers(
+        obj.get("ETag", ""),
+        obj.get("LastModified"),
+        settings.LESSON_HTTP_CACHE_CONTROL,
+    )
+    headers["Accept-Ranges"] = "bytes"
+    headers["Content-Disposition"] = f'attachment; filename="{lesson_id}.pdf"'
+    if "ContentLength" in obj:
+        headers["Content-Length"] = str(obj["ContentLength"])
+    status_code = 200
+    if obj.get("ContentRange"):
+        headers["Content-Range"] = obj["ContentRange"]
+        status_code = 206
+    # Stream the PDF content
+    return StreamingResponse(
+        stream_body(obj["Body"], settings.LESSON_PDF_CHUNK_SIZE),
+        status_code=status_code,
+        media_type="application/pdf",
+        headers=headers,
+    )
 
 
 @router.get("/quarters")
 def list_quarters():
     """
-    Lists all quarters by scanning S3 bucket for metadata.json in each quarter folder.
-    Returns a list of { year, slug, metadata } objects.
+    Lists all quarters that have a metadata.json in their S3 folder.
+    Returns a list of { year, slug, metadata, cover_url } objects, served
+    from the in-memory lesson catalog.
     """
     try:
-        # List only numeric year prefixes (e.g. "2025/")
-        resp = s3.list_objects_v2(Bucket=BUCKET, Delimiter="/", Prefix="")
-        year_prefixes = [
-            p["Prefix"].rstrip("/")
-            for p in resp.get("CommonPrefixes", [])
-            if p["Prefix"].rstrip("/").isdigit()
-        ]
-
-        quarters_info = []
-        for year in year_prefixes:
-            prefix_y = f"{year}/"
-            resp_q = s3.list_objects_v2(Bucket=BUCKET, Delimiter="/", Prefix=prefix_y)
-            for cp in resp_q.get("CommonPrefixes", []):
-                slug = cp["Prefix"][len(prefix_y) :].rstrip("/")
-                meta_key = f"{year}/{slug}/metadata.json"
-                try:
-                    obj = s3.get_object(Bucket=BUCKET, Key=meta_key)
-                    metadata = json.loads(obj["Body"].read().decode("utf-8"))
-                except botocore.exceptions.ClientError as e:
-                    # Skip quarters without metadata.json
-                    code = e.response.get("Error", {}).get("Code")
-                    if code in ("NoSuchKey", "404"):
-                        logger.warning(f"Missing metadata.json for {year}/{slug}")
-                        continue
-                    logger.error(
-                        f"Error fetching metadata.json for {year}/{slug}: {e}",
-                        exc_info=True,
-                    )
-                    raise HTTPException(
-                        status_code=500, detail="Error fetching quarter metadata"
-                    )
-                # determine cover key from metadata (fall back to slug-based png if not provided)
-                cover_key = (
-                    metadata.get("coverKey")
-                    or f"covers/{metadata.get('slug')}-cover.png"
-                )
-                cover_url = None
-                try:
-                    # verify the object exists
-                    s3.head_object(Bucket=BUCKET, Key=cover_key)
-                    # generate a short-lived presigned URL
-                    cover_url = s3.generate_presigned_url(
-                        "get_object",
-                        Params={"Bucket": BUCKET, "Key": cover_key},
-                        ExpiresIn=3600,
-                    )
-                except botocore.exceptions.ClientError as err:
-                    # missing cover is OK; leave cover_url as None
-                    code = err.response.get("Error", {}).get("Code", "")
-                    if code not in ("NoSuchKey", "404"):
-                        logger.warning(
-                            f"Unexpected error checking cover for {year}/{slug}: {err}"
-                        )
-
-                quarters_info.append(
-                    {
-                        "year": year,
-                        "slug": slug,
-                        "metadata": metadata,
-                        "cover_url": cover_url,
-                    }
-                )
-
-        # Sort by year then slug
-        quarters_info.sort(key=lambda x: (x["year"], x["slug"]))
-        return quarters_info
-
+        return lesson_catalog.quarters()
     except Exception as e:
         logger.error(f"Error listing quarters from S3: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail="Unable to list quarters from S3")
@@ -190,77 +316,17 @@ def list_lessons(
     quarter: Optional[str] = Query(None, description="Filter by quarter, e.g. 'Q2'"),
 ):
     """
-    Lists available lessons by scanning S3 prefixes. Optionally filter by year and quarter.
+    Lists available lessons from the in-memory lesson catalog. Optionally filter by year and quarter.
     """
     try:
-        lessons = []
-        # Determine which years to scan
-        if year:
-            years = [year]
-        else:
-            resp = s3.list_objects_v2(Bucket=BUCKET, Delimiter="/", Prefix="")
-            years = [p["Prefix"].rstrip("/") for p in resp.get("CommonPrefixes", [])]
-
-        for y in years:
-            # Determine quarters under this year
-            prefix_y = f"{y}/"
-            if quarter:
-                quarters = [quarter]
-            else:
-                resp_q = s3.list_objects_v2(
-                    Bucket=BUCKET, Delimiter="/", Prefix=prefix_y
-                )
-                quarters = [
-                    cp["Prefix"][len(prefix_y) :].rstrip("/")
-                    for cp in resp_q.get("CommonPrefixes", [])
-                ]
-
-            for q in quarters:
-                # List lesson folders under this quarter
-                prefix_l = f"{y}/{q}/"
-                resp_l = s3.list_objects_v2(
-                    Bucket=BUCKET, Delimiter="/", Prefix=prefix_l
-                )
-                for cp in resp_l.get("CommonPrefixes", []):
-                    lesson_id = cp["Prefix"][len(prefix_l) :].rstrip("/")
-                    # Load lesson metadata.json
-                    meta_key = f"{y}/{q}/{lesson_id}/metadata.json"
-                    try:
-                        obj = s3.get_object(Bucket=BUCKET, Key=meta_key)
-                        metadata = json.loads(obj["Body"].read().decode("utf-8"))
-                    except botocore.exceptions.ClientError as e:
-                        code = e.response.get("Error", {}).get("Code")
-                        # Skip if metadata.json missing
-                        if code in ("NoSuchKey", "404"):
-                            logger.warning(
-                                f"Missing metadata.json for {y}/{q}/{lesson_id}"
-                            )
-                            continue
-                        logger.error(
-                            f"Error fetching lesson metadata {meta_key}: {e}",
-                            exc_info=True,
-                        )
-                        raise HTTPException(
-                            status_code=500, detail="Error fetching lesson metadata"
-                        )
-                    lessons.append(
-                        {
-                            "year": y,
-                            "quarter": q,
-                            "lesson_id": lesson_id,
-                            "metadata": metadata,
-                        }
-                    )
-        # Optionally sort
-        lessons.sort(key=lambda x: (x["year"], x["quarter"], x["lesson_id"]))
-        return lessons
+        return lesson_catalog.lessons(year=year, quarter=quarter)
     except Exception as e:
         logger.error(f"Error listing lessons from S3: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail="Unable to list lessons from S3")
 
 
 @router.post("/llm")
-def process_llm(
+async def process_llm(
     text: str = Body(..., embed=True),
     mode: Literal["explain", "reflect", "apply", "summarize", "ask"] = Body(
         ..., embed=True
@@ -271,7 +337,7 @@ def process_llm(
         raise HTTPException(status_code=400, detail="Text input cannot be empty.")
     try:
         # Perform semantic search for context
-        context_chunks = search_lessons(text, top_k=1)
+        context_chunks = await search_lessons_async(text, top_k=1)
         rag_refs: dict[str, str] = {}
         formatted_chunks: list[str] = []
         for idx, chunk in enumerate(context_chunks):
@@ -289,40 +355,51 @@ def process_llm(
             formatted_chunks.append(chunk_text)
 
         context_text = "\n\n".join(formatted_chunks)
-        result = generate_llm_response(text, mode, context_text, lang)
+        result = await generate_llm_response_async(text, mode, context_text, lang)
         return {
             "result": result,
             "rag_refs": rag_refs,
         }
+    except LLMUnavailableError as e:
+        raise llm_unavailable(e)
     except Exception as e:
         logger.error(f"Error processing LLM request: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @router.get("/search")
-def semantic_search(
+async def semantic_search(
     q: str = Query(..., description="Search query text"),
     type: str = Query(
         "all", description="Filter by document type: 'lesson', 'book', or 'all'"
     ),
     top_k: int = Query(5, ge=1, le=20, description="Number of top results to return"),
+    year: Optional[str] = Query(None, description="Only lessons from this year"),
+    quarter: Optional[str] = Query(None, description="Only lessons from this quarter"),
+    lesson_id: Optional[str] = Query(None, description="Only this lesson"),
+    book_title: Optional[str] = Query(None, description="Only this book"),
 ):
     """
     Semantic search through lessons and books using FAISS.
+    Filters are applied inside the index, so `top_k` matching results are
+    returned whenever that many exist.
     """
     if not q or not q.strip():
         raise HTTPException(status_code=422, detail="Query string cannot be empty.")
 
     try:
-        raw_results = search_lessons(q, top_k=top_k)
-
-        if type.lower() in ["lesson", "book"]:
-            filtered = [r for r in raw_results if r.get("type") == type.lower()]
-        else:
-            filtered = raw_results
+        filters = {
+            "type": DOC_TYPE_ALIASES.get(type.lower()),
+            "year": year,
+            "quarter": quarter,
+            "lesson_id": lesson_id,
+            "book_title": book_title,
+        }
+        filters = {field: value for field, value in filters.items() if value}
+        raw_results = await search_lessons_async(q, top_k=top_k, filters=filters)
 
         filtered = sorted(
-            filtered, key=lambda x: x.get("normalized_score", 0), reverse=True
+            raw_results, key=lambda x: x.get("normalized_score", 0), reverse=True
         )
         return {"query": q, "results": filtered, "count": len(filtered), "filter": type}
 
@@ -332,7 +409,7 @@ def semantic_search(
 
 
 @router.post("/llm/answer")
-def generate_answer(payload: QARequest):
+async def generate_answer(payload: QARequest):
     """
     Generates a response for a given question.
     1. Searches for relevant lessons using the question as a query.
@@ -345,12 +422,17 @@ def generate_answer(payload: QARequest):
         "lang": "es",
         "mode": "explain",
     }
+    With "stream": true the answer is sent as server-sent events: one `refs`
+    event (question, context_used, rag_refs, other_refs), a `token` event per
+    chunk of the answer as it is generated, then `done` (or `error`).
     """
     if not payload.question or not payload.question.strip():
         raise HTTPException(status_code=400, detail="La pregunta no puede estar vacía.")
 
     try:
-        context_chunks = search_lessons(payload.question, top_k=payload.top_k)
+        context_chunks = await search_lessons_async(
+            payload.question, top_k=payload.top_k
+        )
         # 2a. Collect RAG references and raw texts
         rag_refs: dict[str, str] = {}
         formatted_chunks: list[str] = []
@@ -384,10 +466,21 @@ def generate_answer(payload: QARequest):
                 status_code=404,
                 detail="No se encontró contexto relevante para esta pregunta.",
             )
+        if payload.stream:
+            return StreamingResponse(
+                answer_events(payload, len(context_chunks), rag_refs, context_text),
+                media_type="text/event-stream",
+                headers=SSE_HEADERS,
+            )
+
         # 3. generate_llm_response
-        response = generate_llm_response(
+        response = await generate_llm_response_async(
             payload.question, payload.mode, context_text, payload.lang
         )
+        # The service reports model and prompt failures as "[Error ...]" strings
+        if isinstance(response, str):
+            logger.error(f"LLM answer failed: {response}")
+            raise HTTPException(status_code=502, detail=f"Error del modelo: {response}")
 
         return {
             "question": payload.question,
@@ -397,6 +490,10 @@ def generate_answer(payload: QARequest):
             "other_refs": response.get("refs", ""),
         }
 
+    except HTTPException:
+        raise
+    except LLMUnavailableError as e:
+        raise llm_unavailable(e)
     except ValueError as ve:
         logger.error(f"Validation error: {ve}")
         raise HTTPException(status_code=400, detail=f"Error de validación: {str(ve)}")
@@ -405,30 +502,80 @@ def generate_answer(payload: QARequest):
         raise HTTPException(status_code=500, detail=f"Error interno: {str(e)}")
 
 
+async def answer_events(
+    payload: QARequest, context_used: int, rag_refs: dict, context_text: str
+):
+    try:
+        async for part in stream_llm_response(
+            payload.question, payload.mode, context_text, payload.lang
+        ):
+            if "refs" in part:
+                yield sse_event(
+                    "refs",
+                    {
+                        "question": payload.question,
+                        "context_used": context_used,
+                        "rag_refs": rag_refs,
+                        "other_refs": part["refs"],
+                    },
+                )
+            else:
+                yield sse_event("token", {"text": part["text"]})
+        yield sse_event("done", {})
+    except LLMUnavailableError as e:
+        logger.error(f"LLM unavailable while streaming answer: {e}")
+        yield llm_error_event(e)
+    except Exception as e:
+        logger.error(f"Error streaming LLM answer: {e}")
+        yield sse_event("error", {"detail": f"Error interno: {str(e)}"})
+
+
 # New endpoint: /prompt
 
 
 class PromptRequest(BaseModel):
     prompt: str = Field(..., description="The text prompt to send to the LLM")
     lang: Literal["en", "es"] = Field("es", description="Language of the response")
+    stream: bool = Field(False, description="Stream the response as server-sent events")
 
 
 @router.post("/prompt")
-def generate_from_prompt(payload: PromptRequest):
+async def generate_from_prompt(payload: PromptRequest):
     """
     Receives a free-form prompt and returns an LLM-generated response.
+    With "stream": true the response is sent as `token` server-sent events
+    followed by `done` (or `error`).
     """
     if not payload.prompt.strip():
         raise HTTPException(status_code=400, detail="Prompt cannot be empty.")
+    if payload.stream:
+        return StreamingResponse(
+            prompt_events(payload), media_type="text/event-stream", headers=SSE_HEADERS
+        )
     try:
-        llm_result = get_llm_response(payload.prompt)
+        llm_result = await get_llm_response_async(payload.prompt, lang=payload.lang)
         # llm_result is a dict with key "answer"
         return {"response": llm_result.get("answer", ""), "lang": payload.lang}
+    except LLMUnavailableError as e:
+        raise llm_unavailable(e)
     except Exception as e:
         logger.error(f"Error generating prompt response: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail="Failed to generate LLM response")
 
 
+async def prompt_events(payload: PromptRequest):
+    try:
+        async for chunk in stream_llm_text(payload.prompt, lang=payload.lang):
+            yield sse_event("token", {"text": chunk})
+        yield sse_event("done", {"lang": payload.lang})
+    except LLMUnavailableError as e:
+        logger.error(f"LLM unavailable while streaming prompt: {e}")
+        yield llm_error_event(e)
+    except Exception as e:
+        logger.error(f"Error streaming prompt response: {e}", exc_info=True)
+        yield sse_event("error", {"detail": "Failed to generate LLM response"})
+
+
 @router.post("/llm/parser")
 async def parse_pdf(file: UploadFile = File(...)):
     """
@@ -542,6 +689,12 @@ async def import_lesson(
     except Exception as e:
         logger.error(f"Error uploading PDF file to S3: {e}")
         raise HTTPException(status_code=500, detail="Could not upload PDF file to S3")
+    finally:
+        # Lists and lesson reads pick up the new lesson on their next read. This
+        # runs after the PDF upload, so a catalog rebuilt mid-import still
+        # lists the PDF
+        lesson_catalog.invalidate()
+        lesson_cache.invalidate(f"{year}/{quarter}/{lesson_id}/")
 
     return {
         "status": "ok",
@@ -1,4 +1,3 @@
-import json
 from datetime import datetime, timedelta
 from fastapi import APIRouter, HTTPException, Path
 from pydantic import BaseModel
@@ -6,7 +5,8 @@ from typing import Optional, List
 from datetime import datetime
 from decimal import Decimal
 from app.core.config import dynamodb
-from app.core.config import BUCKET, s3
+from app.services.lesson_cache import lesson_cache
+from app.services.s3_store import s3_store
 
 
 router = APIRouter()
@@ -146,10 +146,10 @@ def get_full_lesson_report(year: str, quarter: str, lesson_id: str, user_id: str
     metadata_key = f"{year}/{quarter}/{lesson_id}/metadata.json"
     summary_key = f"{year}/{quarter}/{lesson_id}/lesson.json"
     try:
-        metadata_obj = s3.get_object(Bucket=BUCKET, Key=metadata_key)
-        summary_obj = s3.get_object(Bucket=BUCKET, Key=summary_key)
-        metadata = json.loads(metadata_obj["Body"].read())
-        lesson_summary = json.loads(summary_obj["Body"].read())
+        # Both files come from the lesson cache; misses are fetched concurrently
+        metadata, lesson_summary = s3_store.map(
+            lesson_cache.get_json, [metadata_key, summary_key]
+        )
     except Exception as s3_err:
         raise HTTPException(
             status_code=500, detail=f"Error loading lesson files from S3: {str(s3_err)}"
@@ -336,10 +336,9 @@ def get_last_viewed_position(user_id: str):
 
         # Attempt to load metadata and lesson summary from S3.
         try:
-            metadata_object = s3.get_object(Bucket=BUCKET, Key=metadata_key)
-            lesson_summary_object = s3.get_object(Bucket=BUCKET, Key=lesson_summary_key)
-            metadata = json.loads(metadata_object["Body"].read())
-            lesson_summary = json.loads(lesson_summary_object["Body"].read())
+            metadata, lesson_summary = s3_store.map(
+                lesson_cache.get_json, [metadata_key, lesson_summary_key]
+            )
         except Exception as s3_error:
             raise HTTPException(
                 status_code=500,
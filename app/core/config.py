@@ -1,7 +1,9 @@
 # app/core/config.py
 from dotenv import load_dotenv
 import os
+from typing import Optional
 import boto3
+from botocore.config import Config
 
 load_dotenv()  # Load variables from .env
 
@@ -22,6 +24,110 @@ class Settings:
     JWT_PRIVATE_KEY: str = os.getenv("JWT_PRIVATE_KEY", "")
     JWT_PUBLIC_KEY: str = os.getenv("JWT_PUBLIC_KEY", "")
 
+    # Query embedding cache
+    EMBED_CACHE_SIZE: int = int(os.getenv("EMBED_CACHE_SIZE", 1024))
+    EMBED_CACHE_TTL_SECONDS: float = float(os.getenv("EMBED_CACHE_TTL_SECONDS", 86400))
+    # Micro-batching of concurrent query embeddings (window 0 disables it)
+    EMBED_BATCH_WINDOW_MS: float = float(os.getenv("EMBED_BATCH_WINDOW_MS", 5))
+    EMBED_BATCH_MAX_SIZE: int = int(os.getenv("EMBED_BATCH_MAX_SIZE", 32))
+
+    # Index builds
+    EMBED_BATCH_SIZE: int = int(os.getenv("EMBED_BATCH_SIZE", 64))
+    INDEX_BUILD_WORKERS: int = int(os.getenv("INDEX_BUILD_WORKERS", 1))
+    # flat, ivf-flat, ivf-pq or hnsw; INDEX_NLIST=0 picks ~4*sqrt(n) IVF lists
+    INDEX_TYPE: str = os.getenv("INDEX_TYPE", "flat")
+    INDEX_NLIST: int = int(os.getenv("INDEX_NLIST", 0))
+    INDEX_PQ_M: int = int(os.getenv("INDEX_PQ_M", 16))
+    INDEX_HNSW_M: int = int(os.getenv("INDEX_HNSW_M", 32))
+    # l2 (raw distances) or cosine (normalized vectors, inner-product index)
+    INDEX_METRIC: str = os.getenv("INDEX_METRIC", "l2")
+
+    # Query-time recall/latency knobs for approximate indexes
+    SEARCH_NPROBE: int = int(os.getenv("SEARCH_NPROBE", 16))
+    SEARCH_EF_SEARCH: int = int(os.getenv("SEARCH_EF_SEARCH", 64))
+    # Cosine indexes only: hits below this similarity are dropped
+    SEARCH_MIN_SIMILARITY: float = float(os.getenv("SEARCH_MIN_SIMILARITY", 0.0))
+
+    # Memory-map the FAISS index read-only so uvicorn workers share its pages
+    INDEX_MMAP: bool = os.getenv("INDEX_MMAP", "true").lower() == "true"
+
+    # Threads for CPU-bound request work (query embedding, FAISS search)
+    CPU_EXECUTOR_WORKERS: int = int(
+        os.getenv("CPU_EXECUTOR_WORKERS", min(8, os.cpu_count() or 1))
+    )
+    # Semantic LLM answer cache: a question reuses a cached answer for the same
+    # mode, lang and retrieved context when their embeddings are this similar
+    ANSWER_CACHE_SIZE: int = int(os.getenv("ANSWER_CACHE_SIZE", 512))
+    ANSWER_CACHE_TTL_SECONDS: float = float(
+        os.getenv("ANSWER_CACHE_TTL_SECONDS", 7 * 86400)
+    )
+    ANSWER_CACHE_SIMILARITY: float = float(os.getenv("ANSWER_CACHE_SIMILARITY", 0.95))
+
+    # Bible references are resolved from the local RVR1960 text; references
+    # missing there fall back to bible-api.com unless this is turned off
+    BIBLE_REMOTE_FALLBACK: bool = (
+        os.getenv("BIBLE_REMOTE_FALLBACK", "true").lower() == "true"
+    )
+    # Passages fetched from bible-api.com: in-process LRU size and the SQLite
+    # file behind it (unset: app/indexing/bible_passages.sqlite3, "": none)
+    BIBLE_PASSAGE_CACHE_SIZE: int = int(os.getenv("BIBLE_PASSAGE_CACHE_SIZE", 1024))
+    BIBLE_PASSAGE_CACHE_PATH: Optional[str] = os.getenv("BIBLE_PASSAGE_CACHE_PATH")
+    # Timeout for Bible passage lookups (bible-api.com)
+    BIBLE_API_TIMEOUT_SECONDS: float = float(os.getenv("BIBLE_API_TIMEOUT_SECONDS", 5))
+    # Concurrent bible-api.com requests (process-wide for sync prompts, per
+    # prompt for async ones)
+    BIBLE_FETCH_WORKERS: int = int(os.getenv("BIBLE_FETCH_WORKERS", 8))
+
+    # LLM gateway: concurrent Gemini calls, token-bucket rate (calls/second,
+    # 0 disables) and burst, retries on 429/5xx with exponential backoff and
+    # jitter, per-request deadline, and the circuit breaker (consecutive
+    # failures to open it, 0 disables; seconds before a trial call)
+    LLM_MAX_CONCURRENCY: int = int(os.getenv("LLM_MAX_CONCURRENCY", 32))
+    LLM_RATE_PER_SECOND: float = float(os.getenv("LLM_RATE_PER_SECOND", 10))
+    LLM_RATE_BURST: int = int(os.getenv("LLM_RATE_BURST", 20))
+    LLM_MAX_RETRIES: int = int(os.getenv("LLM_MAX_RETRIES", 3))
+    LLM_BACKOFF_BASE_SECONDS: float = float(os.getenv("LLM_BACKOFF_BASE_SECONDS", 0.5))
+    LLM_BACKOFF_MAX_SECONDS: float = float(os.getenv("LLM_BACKOFF_MAX_SECONDS", 8))
+    LLM_TIMEOUT_SECONDS: float = float(os.getenv("LLM_TIMEOUT_SECONDS", 30))
+    LLM_CIRCUIT_FAILURES: int = int(os.getenv("LLM_CIRCUIT_FAILURES", 5))
+    LLM_CIRCUIT_RESET_SECONDS: float = float(os.getenv("LLM_CIRCUIT_RESET_SECONDS", 30))
+
+    # Threads fanning out independent S3 reads, and the S3 client's HTTP
+    # connection pool (keep it above the thread count)
+    S3_FETCH_WORKERS: int = int(os.getenv("S3_FETCH_WORKERS", 16))
+    S3_MAX_POOL_CONNECTIONS: int = int(os.getenv("S3_MAX_POOL_CONNECTIONS", 50))
+
+    # Seconds /quarters and /lessons answer from the in-memory lesson catalog
+    # before revalidating it against the bucket listing
+    CATALOG_TTL_SECONDS: float = float(os.getenv("CATALOG_TTL_SECONDS", 60))
+    # Parsed lesson.json/metadata.json documents kept in memory (total body
+    # bytes), and seconds they are served before an ETag revalidation
+    LESSON_CACHE_MAX_BYTES: int = int(
+        os.getenv("LESSON_CACHE_MAX_BYTES", 64 * 1024 * 1024)
+    )
+    LESSON_CACHE_TTL_SECONDS: float = float(os.getenv("LESSON_CACHE_TTL_SECONDS", 300))
+    # Cache-Control sent with lesson JSON, metadata and PDFs; they also carry
+    # the S3 ETag/Last-Modified, so clients and CDNs revalidate with a 304
+    LESSON_HTTP_CACHE_CONTROL: str = os.getenv(
+        "LESSON_HTTP_CACHE_CONTROL", "public, max-age=300"
+    )
+    # How /pdf delivers lesson PDFs: "proxy" streams them through the API in
+    # LESSON_PDF_CHUNK_SIZE chunks, "redirect" answers 307 to a presigned S3
+    # URL and "url" returns that URL as JSON; URLs expire after
+    # LESSON_PDF_URL_EXPIRY_SECONDS. Clients may pick a mode with ?delivery=
+    LESSON_PDF_DELIVERY: str = os.getenv("LESSON_PDF_DELIVERY", "proxy")
+    LESSON_PDF_URL_EXPIRY_SECONDS: int = int(
+        os.getenv("LESSON_PDF_URL_EXPIRY_SECONDS", 300)
+    )
+    LESSON_PDF_CHUNK_SIZE: int = int(os.getenv("LESSON_PDF_CHUNK_SIZE", 1024 * 1024))
+
+    # Estimated tokens of Bible passages + retrieved context packed into a
+    # prompt, with per-mode overrides as "mode=tokens,..."
+    CONTEXT_TOKEN_BUDGET: int = int(os.getenv("CONTEXT_TOKEN_BUDGET", 600))
+    CONTEXT_TOKEN_BUDGETS: str = os.getenv(
+        "CONTEXT_TOKEN_BUDGETS", "ask=800,summarize=1000"
+    )
+
 
 settings = Settings()
 # build a valid S3 client, with a fallback if region is bogus
@@ -35,10 +141,13 @@ try:
         aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
         aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY,
         region_name=_region,
+        config=Config(max_pool_connections=settings.S3_MAX_POOL_CONNECTIONS),
     )
+    # Same region fallback as S3, so importing settings (e.g. from the index
+    # builder) does not fail with NoRegionError when AWS_REGION is unset
     dynamodb = boto3.resource(
         "dynamodb",
-        region_name=os.getenv("AWS_REGION"),
+        region_name=_region,
         aws_access_key_id=os.getenv("AWS_ACCESS_KEY_ID"),
         aws_secret_access_key=os.getenv("AWS_SECRET_ACCESS_KEY"),
     )
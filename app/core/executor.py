@@ -0,0 +1,24 @@
+# app/core/executor.py
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Any, Callable, TypeVar
+
+from app.core.config import settings
+
+T = TypeVar("T")
+
+# Dedicated, bounded pool for CPU-bound request work (query embedding, FAISS
+# search). It is separate from the threadpool Starlette runs sync handlers in,
+# so a burst of searches cannot starve /health or the lesson endpoints.
+cpu_executor = ThreadPoolExecutor(
+    max_workers=settings.CPU_EXECUTOR_WORKERS, thread_name_prefix="cpu-bound"
+)
+
+
+async def run_cpu_bound(func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """
+    Run `func(*args, **kwargs)` on the CPU executor without blocking the event loop.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(cpu_executor, partial(func, *args, **kwargs))
@@ -0,0 +1,88 @@
+# app/core/http_cache.py
+import re
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Optional
+
+# Single byte ranges as S3 accepts them: "bytes=0-99", "bytes=100-", "bytes=-500"
+BYTE_RANGE = re.compile(r"bytes=(\d+-\d*|-\d+)")
+
+
+def parse_http_date(value: Optional[str]) -> Optional[datetime]:
+    """
+    Timezone-aware datetime of an HTTP date header, or None if it is missing
+    or invalid.
+    """
+    if not value:
+        return None
+    try:
+        parsed = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return parsed if parsed.tzinfo else None
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    """
+    Weak comparison of `etag` against an If-None-Match list ("*" matches any).
+    """
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag.removeprefix("W/")
+    return any(
+        candidate.strip().removeprefix("W/") == opaque
+        for candidate in if_none_match.split(",")
+    )
+
+
+def strong_etags(if_none_match: str) -> str:
+    """
+    If-None-Match with weak markers dropped, for forwarding to S3, which
+    compares ETags strongly (CDNs weaken ETags of compressed responses).
+    """
+    return ", ".join(c.strip().removeprefix("W/") for c in if_none_match.split(","))
+
+
+def not_modified(
+    etag: str,
+    last_modified: Optional[datetime],
+    if_none_match: Optional[str] = None,
+    if_modified_since: Optional[str] = None,
+) -> bool:
+    """
+    Whether a GET with these request validators can be answered with 304.
+    If-None-Match takes precedence; If-Modified-Since is compared at second
+    resolution and ignored when it cannot be parsed.
+    """
+    if if_none_match:
+        return etag_matches(if_none_match, etag)
+    since = parse_http_date(if_modified_since)
+    if since and last_modified:
+        return last_modified.replace(microsecond=0) <= since
+    return False
+
+
+def cache_headers(
+    etag: str, last_modified: Optional[datetime], cache_control: str
+) -> dict:
+    """
+    ETag, Last-Modified and Cache-Control response headers.
+    """
+    headers = {"Cache-Control": cache_control}
+    if etag:
+        headers["ETag"] = etag
+    if last_modified:
+        headers["Last-Modified"] = format_datetime(
+            last_modified.astimezone(timezone.utc), usegmt=True
+        )
+    return headers
+
+
+def byte_range(range_header: Optional[str]) -> Optional[str]:
+    """
+    The Range header to forward to S3, or None to send the whole object.
+    Multiple ranges and other units are ignored, which HTTP allows.
+    """
+    if range_header and BYTE_RANGE.fullmatch(range_header.strip()):
+        return range_header.strip()
+    return None
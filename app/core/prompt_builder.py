@@ -1,9 +1,43 @@
+import asyncio
 import os
+import string
+import threading
+import httpx
 import requests
 import re
-from typing import Optional, List
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, NamedTuple, Optional, Tuple
 from pathlib import Path
 
+from app.core.config import settings
+from app.services.bible_service import lookup_verses
+from app.services.passage_cache import passage_cache, reference_key
+
+
+class CleanTable(dict):
+    """
+    str.translate table for clean_text: control characters become spaces,
+    double quotes single quotes, and other non-printable characters are
+    dropped. Entries are filled in on first sight of each character.
+    """
+
+    def __missing__(self, codepoint: int):
+        ch = chr(codepoint)
+        if ch in "\r\n\t":
+            value = " "
+        elif ch == '"':
+            value = "'"
+        elif ch.isprintable():
+            value = ch
+        else:
+            value = None
+        self[codepoint] = value
+        return value
+
+
+CLEAN_TABLE = CleanTable()
+SPACE_RUNS = re.compile(r" {2,}")
+
 
 def clean_text(text: str) -> str:
     """
@@ -13,18 +47,10 @@ def clean_text(text: str) -> str:
     - Removing control characters
     - Replacing double quotes with single quotes
     - Removing non-printable or weird characters
+    One translate pass and one regex; retrieved chunks are cleaned when the
+    index is built, so requests only clean the question.
     """
-    import re
-
-    # Replace control characters with space
-    text = re.sub(r"[\r\n\t]+", " ", text)
-    # Replace multiple spaces
-    text = re.sub(r" +", " ", text)
-    # Replace double quotes with single quotes
-    text = text.replace('"', "'")
-    # Remove any remaining non-printable characters
-    text = "".join(ch for ch in text if ch.isprintable())
-    return text.strip()
+    return SPACE_RUNS.sub(" ", text.translate(CLEAN_TABLE)).strip()
 
 
 # Map Spanish book names to their English counterparts for API
@@ -167,76 +193,225 @@ SPANISH_BOOK_MAP = {
     "Apoc.": "Revelation",
 }
 
+FALLBACK_PROMPT = "An error occurred while building the prompt. Please try again later."
+
 # Directory where prompt templates are stored (each mode has its own .txt file)
 TEMPLATES_DIR = Path(__file__).resolve().parent.parent / "prompts"
 
 
+class BibleReference(NamedTuple):
+    text: str  # the reference as written, e.g. 'Génesis 22:9, 16-18'
+    book: str  # book name or abbreviation as written, e.g. 'Génesis', '2 Tim.'
+    chapter: int
+    verses: Tuple[Tuple[int, int], ...]  # inclusive ranges, e.g. ((9, 9), (16, 18))
+    start: int  # span of `text` in the searched string
+    end: int
+
+    @property
+    def key(self) -> str:
+        """
+        Normalized reference, e.g. 'S. Juan 3:16-18,20', for the passage cache.
+        """
+        return reference_key(self.book, self.chapter, self.verses)
+
+
+def book_names_pattern(names) -> str:
+    """
+    Regex matching any of `names`, factored into a character trie so the
+    engine follows a single branch per character instead of trying each name.
+    Optional suffixes are greedy, so the longest name wins ('1 Juan' over 'Juan').
+    """
+    trie: dict = {}
+    for name in names:
+        node = trie
+        for ch in name:
+            node = node.setdefault(ch, {})
+        node[""] = {}
+
+    def build(node: dict) -> str:
+        branches = [re.escape(ch) + build(child) for ch, child in node.items() if ch]
+        if not branches:
+            return ""
+        body = "(?:" + "|".join(branches) + ")"
+        return body + "?" if "" in node else body
+
+    return build(trie)
+
+
+# Compiled once: a book name at the start of the text or after whitespace/'(',
+# then chapter:verse with optional ranges and comma-separated verse lists
+BIBLE_REFERENCE_PATTERN = re.compile(
+    rf"(?:^|(?<=[\s(]))(?P<book>{book_names_pattern(SPANISH_BOOK_MAP)})\s*"
+    r"(?P<chapter>\d+):(?P<verses>\d+(?:-\d+)?(?:,\s*\d+(?:-\d+)?)*)\b"
+)
+
+
+def extract_bible_references(text: str) -> List[BibleReference]:
+    """
+    Single pass over `text` returning every Spanish Bible reference with its
+    book, chapter, verse ranges and span.
+    Raises a ValueError if the input is not a valid string.
+    """
+    if not isinstance(text, str):
+        raise ValueError("Input text must be a string.")
+    # Every reference contains chapter:verse
+    if ":" not in text:
+        return []
+
+    references = []
+    for match in BIBLE_REFERENCE_PATTERN.finditer(text):
+        verses = []
+        for part in match.group("verses").split(","):
+            first, _, last = part.strip().partition("-")
+            verses.append((int(first), int(last or first)))
+        references.append(
+            BibleReference(
+                text=match.group(0),
+                book=match.group("book"),
+                chapter=int(match.group("chapter")),
+                verses=tuple(verses),
+                start=match.start(),
+                end=match.end(),
+            )
+        )
+    return references
+
+
 def find_bible_references(text: str) -> List[str]:
     """
     Finds Bible references in Spanish within the text using defined book names.
     Returns references like 'Juan 3:16'.
     Raises a ValueError if the input is not a valid string.
     """
-    if not isinstance(text, str):
-        raise ValueError("Input text must be a string.")
+    return [reference.text for reference in extract_bible_references(text)]
 
-    try:
-        # Build regex for Spanish books
-        book_names = sorted(SPANISH_BOOK_MAP.keys(), key=len, reverse=True)
-        escaped_books = [re.escape(book) for book in book_names]
-        pattern_books = "|".join(escaped_books)
-        # Allow preceding start, whitespace, or '('
-        pattern = rf"(?:(?<=^)|(?<=[\s(]))(?:{pattern_books})\s*\d+:\d+(?:-\d+)?(?:(?:,\s*\d+(?:-\d+)?))*\b"
-        matches = re.findall(pattern, text)
-        return matches
-    except re.error as regex_error:
-        # Log regex errors and return an empty list for graceful handling
-        print(f"Regex error occurred: {regex_error}")
-        return []
-    except Exception as e:
-        # Catch any unexpected exceptions and return an empty list
-        print(f"Unexpected error occurred in find_bible_references: {e}")
-        return []
+
+def unique_references(*texts: str) -> List[BibleReference]:
+    """
+    References found in `texts`, in order, keeping the first occurrence of
+    each written reference.
+    """
+    references = {}
+    for text in texts:
+        for reference in extract_bible_references(text):
+            references.setdefault(reference.text, reference)
+    return list(references.values())
+
+
+def local_passage(reference: BibleReference) -> str:
+    """
+    Text of `reference` from the in-memory Bible, "" if it is not there.
+    """
+    body = lookup_verses(reference.book, reference.chapter, reference.verses)
+    return with_reference(reference.text, body)
+
+
+# Shared, bounded pool for sync bible-api.com fetches, so a prompt citing many
+# references cannot spawn a thread (and an outbound request) per reference
+bible_executor = ThreadPoolExecutor(
+    max_workers=settings.BIBLE_FETCH_WORKERS, thread_name_prefix="bible-api"
+)
+
+
+def resolve_bible_texts(refs: List[BibleReference]) -> List[str]:
+    """
+    Passage text for each reference, in order ("" when unresolved). References
+    are read from the in-memory Bible; with BIBLE_REMOTE_FALLBACK the misses
+    are fetched from bible-api.com in parallel.
+    """
+    texts = [local_passage(ref) for ref in refs]
+    missing = [ref for ref, text in zip(refs, texts) if not text]
+    if missing and settings.BIBLE_REMOTE_FALLBACK:
+        fetched = dict(zip(missing, bible_executor.map(fetch_bible_text, missing)))
+        texts = [text or fetched.get(ref, "") for ref, text in zip(refs, texts)]
+    return texts
 
 
-def fetch_bible_text(ref: str) -> str:
+async def resolve_bible_texts_async(refs: List[BibleReference]) -> List[str]:
+    """
+    resolve_bible_texts for the event loop; misses are fetched concurrently
+    with the async HTTP client.
+    """
+    texts = [local_passage(ref) for ref in refs]
+    missing = [ref for ref, text in zip(refs, texts) if not text]
+    if missing and settings.BIBLE_REMOTE_FALLBACK:
+        fetched = dict(zip(missing, await fetch_bible_texts_async(missing)))
+        texts = [text or fetched.get(ref, "") for ref, text in zip(refs, texts)]
+    return texts
+
+
+def bible_api_url(ref: str) -> str:
+    """
+    bible-api.com URL for a Spanish reference, or "" if the reference is unusable.
+    """
     # Validate input
     if not isinstance(ref, str) or not ref.strip():
         print("Invalid Bible reference input.")
         return ""
+    # Split book and chapter:verse
+    parts = ref.strip().split(" ", 1)
+    if not parts[0]:
+        print("Bible reference missing book information.")
+        return ""
+    book_part = parts[0]
+    chapter_verse = parts[1] if len(parts) > 1 and parts[1].strip() else ""
+    # Map Spanish book names to English
+    eng_book = SPANISH_BOOK_MAP.get(book_part, book_part)
+    api_ref = f"{eng_book} {chapter_verse}".strip()
+    if not api_ref:
+        print("Incomplete Bible reference.")
+        return ""
+    return f"https://bible-api.com/{api_ref.replace(' ', '+')}"
+
+
+def format_bible_response(data: dict) -> str:
+    """
+    Passage body of a bible-api.com response, "(translation): text", without
+    the reference (see with_reference), or "" if it has no text.
+    """
+    if "error" in data:
+        print(f"API error: {data['error']}")
+        return ""
+    # Combine all verses if present
+    verses = data.get("verses", [])
+    if verses:
+        texts = [v.get("text", "").strip() for v in verses]
+        combined = " ".join(texts)
+        translation = data.get("translation_name", "")
+        return f"({translation}): {combined}"
+    fallback_text = data.get("text", "").strip()
+    if fallback_text:
+        return f"({data.get('translation_name', '')}): {fallback_text}"
+    print("No text found in API response.")
+    return ""
+
+
+def with_reference(ref: str, body: str) -> str:
+    """
+    "ref (translation): text" for a cached passage body, "" for none. The
+    cache is keyed by normalized reference, so the header is added per call.
+    """
+    return f"{ref} {body}" if body else ""
+
+
+def fetch_bible_text(reference: BibleReference) -> str:
+    """
+    Passage from bible-api.com, served from the passage cache when possible.
+    """
+    body = passage_cache.get_or_fetch(
+        reference.key, lambda: request_bible_text(reference.text)
+    )
+    return with_reference(reference.text, body)
+
+
+def request_bible_text(ref: str) -> str:
     try:
-        # Split book and chapter:verse
-        parts = ref.strip().split(" ", 1)
-        if not parts[0]:
-            print("Bible reference missing book information.")
+        url = bible_api_url(ref)
+        if not url:
             return ""
-        book_part = parts[0]
-        chapter_verse = parts[1] if len(parts) > 1 and parts[1].strip() else ""
-        # Map Spanish book names to English
-        eng_book = SPANISH_BOOK_MAP.get(book_part, book_part)
-        api_ref = f"{eng_book} {chapter_verse}".strip()
-        if not api_ref:
-            print("Incomplete Bible reference.")
-            return ""
-        url = f"https://bible-api.com/{api_ref.replace(' ', '+')}"
-        resp = requests.get(url, timeout=5)
+        resp = requests.get(url, timeout=settings.BIBLE_API_TIMEOUT_SECONDS)
         resp.raise_for_status()
-        data = resp.json()
-        if "error" in data:
-            print(f"API error: {data['error']}")
-            return ""
-        # Combine all verses if present
-        verses = data.get("verses", [])
-        if verses:
-            texts = [v.get("text", "").strip() for v in verses]
-            combined = " ".join(texts)
-            translation = data.get("translation_name", "")
-            return f"{ref} ({translation}): {combined}"
-        fallback_text = data.get("text", "").strip()
-        if fallback_text:
-            return fallback_text
-        print("No text found in API response.")
-        return ""
+        return format_bible_response(resp.json())
     except requests.exceptions.Timeout:
         print("Request to Bible API timed out.")
         return ""
@@ -248,40 +423,327 @@ def fetch_bible_text(ref: str) -> str:
         return ""
 
 
-def load_template(mode: str) -> str:
+async def fetch_bible_text_async(
+    reference: BibleReference, client: httpx.AsyncClient
+) -> str:
+    """
+    fetch_bible_text on a shared async HTTP client, for use from the event loop.
+    """
+    body = await passage_cache.get_or_fetch_async(
+        reference.key, lambda: request_bible_text_async(reference.text, client)
+    )
+    return with_reference(reference.text, body)
+
+
+async def request_bible_text_async(ref: str, client: httpx.AsyncClient) -> str:
+    try:
+        url = bible_api_url(ref)
+        if not url:
+            return ""
+        resp = await client.get(url, timeout=settings.BIBLE_API_TIMEOUT_SECONDS)
+        resp.raise_for_status()
+        return format_bible_response(resp.json())
+    except httpx.TimeoutException:
+        print("Request to Bible API timed out.")
+        return ""
+    except httpx.HTTPStatusError as http_err:
+        print(f"HTTP error occurred: {http_err}")
+        return ""
+    except Exception as e:
+        print(f"Unexpected error occurred in fetch_bible_text_async: {e}")
+        return ""
+
+
+async def fetch_bible_texts_async(refs) -> List[str]:
+    """
+    Fetch every reference concurrently, at most BIBLE_FETCH_WORKERS at a time;
+    results follow the order of `refs`.
+    """
+    limits = httpx.Limits(max_connections=settings.BIBLE_FETCH_WORKERS)
+    async with httpx.AsyncClient(limits=limits) as client:
+        return await asyncio.gather(
+            *(fetch_bible_text_async(ref, client) for ref in refs)
+        )
+
+
+def warm_bible_passages(texts, workers: int = 4) -> dict:
+    """
+    Fill the passage cache with every reference in `texts` (e.g. the lesson
+    corpus) that the local Bible cannot resolve, so serving them later makes
+    no outbound requests. Returns counts of references found and fetched.
     """
-    Load the prompt template for the given mode from the prompts directory.
+    refs = {ref.key: ref for text in texts for ref in extract_bible_references(text)}
+    missing = [ref for ref in refs.values() if not local_passage(ref)]
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        fetched = sum(bool(text) for text in pool.map(fetch_bible_text, missing))
+    return {"references": len(refs), "remote": len(missing), "cached": fetched}
+
+
+# Placeholders a template may use; {lang} is bound when it is compiled
+TEMPLATE_FIELDS = ("context", "question", "lang")
+
+
+class CompiledTemplate:
     """
-    template_path = TEMPLATES_DIR / f"{mode}.txt"
-    if not template_path.exists():
-        raise FileNotFoundError(
-            f"Template for mode '{mode}' not found at {template_path}"
+    A prompt template parsed once for a (mode, lang): the literal text split
+    around its {context} and {question} slots, with {lang} already filled in.
+    Raises ValueError for unknown placeholders, format specs or bad braces.
+    """
+
+    def __init__(self, mode: str, lang: str, source: str):
+        self.mode = mode
+        self.lang = lang
+        # [literal, field, literal, field, ..., literal]; fields are slot names
+        self._parts: List[str] = [""]
+        try:
+            parsed = list(string.Formatter().parse(source))
+        except ValueError as e:
+            raise ValueError(f"Malformed template for mode '{mode}': {e}") from e
+        for literal, field, spec, conversion in parsed:
+            self._parts[-1] += literal
+            if field is None:
+                continue
+            if field not in TEMPLATE_FIELDS or spec or conversion:
+                raise ValueError(
+                    f"Malformed template for mode '{mode}': unsupported "
+                    f"placeholder '{{{field}}}'"
+                )
+            if field == "lang":
+                self._parts[-1] += lang
+            else:
+                self._parts.extend([field, ""])
+
+    def render(self, context: str, question: str) -> str:
+        values = {"context": context, "question": question}
+        parts = self._parts
+        return "".join(
+            part if i % 2 == 0 else values[part] for i, part in enumerate(parts)
         )
-    return template_path.read_text(encoding="utf-8")
 
 
-def truncate_context(context: str, max_chars: int = 2000) -> str:
+class TemplateStore:
+    """
+    Prompt templates read from `directory` once and compiled per (mode, lang)
+    on first use, so building a prompt does no disk I/O. `load()` reads and
+    validates every template and swaps them in only if all of them compile;
+    it runs at startup and backs the admin hot-reload endpoint.
+    """
+
+    def __init__(self, directory: Path):
+        self.directory = directory
+        self._sources: Optional[dict] = None
+        self._compiled: dict = {}
+        self._lock = threading.Lock()
+
+    def load(self) -> List[str]:
+        sources = {
+            path.stem: path.read_text(encoding="utf-8")
+            for path in sorted(self.directory.glob("*.txt"))
+        }
+        # Compile every template up front so a malformed one fails here
+        for mode, source in sources.items():
+            CompiledTemplate(mode, "es", source)
+        with self._lock:
+            self._sources = sources
+            self._compiled = {}
+        return list(sources)
+
+    def source(self, mode: str) -> str:
+        if self._sources is None:
+            self.load()
+        source = self._sources.get(mode)
+        if source is None:
+            raise FileNotFoundError(
+                f"Template for mode '{mode}' not found at {self.directory / f'{mode}.txt'}"
+            )
+        return source
+
+    def get(self, mode: str, lang: str) -> CompiledTemplate:
+        compiled = self._compiled.get((mode, lang))
+        if compiled is None:
+            compiled = CompiledTemplate(mode, lang, self.source(mode))
+            with self._lock:
+                self._compiled[(mode, lang)] = compiled
+        return compiled
+
+
+template_store = TemplateStore(TEMPLATES_DIR)
+
+
+def load_template(mode: str) -> str:
+    """
+    Return the prompt template for the given mode from the prompts directory.
+    Templates are read from disk once; see TemplateStore.
+    """
+    return template_store.source(mode)
+
+
+def parse_token_budgets(spec: str) -> dict:
+    """
+    Parse per-mode budgets written as "mode=tokens,mode=tokens".
+    """
+    budgets = {}
+    for item in spec.split(","):
+        if not item.strip():
+            continue
+        mode, _, tokens = item.partition("=")
+        budgets[mode.strip()] = int(tokens)
+    return budgets
+
+
+CONTEXT_TOKEN_BUDGETS = parse_token_budgets(settings.CONTEXT_TOKEN_BUDGETS)
+
+
+def context_token_budget(mode: str) -> int:
+    return CONTEXT_TOKEN_BUDGETS.get(mode, settings.CONTEXT_TOKEN_BUDGET)
+
+
+# Offline approximation of Gemini's tokenizer: a word costs one token per
+# four characters (rounded up) and each punctuation mark one token
+TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]")
+SENTENCE_BOUNDARY = re.compile(r"(?<=[.!?;…])\s+")
+# Retrieved chunks arrive joined by blank lines
+CHUNK_SEPARATOR = re.compile(r"\n\s*\n")
+
+# Sentence scores: Bible passages cited in the question or context come
+# first, then chunks by retrieval rank, nudged by overlap with the question
+PASSAGE_WEIGHT = 2.0
+OVERLAP_WEIGHT = 0.5
+
+
+def estimate_tokens(text: str) -> int:
+    return sum((len(token) + 3) // 4 for token in TOKEN_PATTERN.findall(text))
+
+
+def split_sentences(text: str) -> List[str]:
+    return [sentence for sentence in SENTENCE_BOUNDARY.split(text) if sentence]
+
+
+def question_terms(question: str) -> set:
+    # Words of four letters or more, so articles and prepositions do not count
+    return {w.lower() for w in re.findall(r"\w{4,}", question)}
+
+
+def pack_context(
+    passages: List[str], chunks: List[str], question: str, budget: int
+) -> Tuple[List[str], List[str]]:
     """
-    Truncate the context string to at most `max_chars` characters,
-    preserving the beginning of the text for relevance.
-    Includes robust input validation and error handling.
+    Keep the highest-scoring sentences of the Bible passages and retrieved
+    chunks (in retrieval order) that fit in `budget` estimated tokens.
+    Returns the kept text of each passage and chunk, sentences in their
+    original order; a passage or chunk with nothing kept is "".
     """
-    # Validate inputs
+    terms = question_terms(question)
+    units = [(PASSAGE_WEIGHT, text) for text in passages] + [
+        (1.0 / (rank + 1), text) for rank, text in enumerate(chunks)
+    ]
+
+    candidates = []
+    sentences = []
+    for unit, (weight, text) in enumerate(units):
+        sentences.append(split_sentences(text))
+        for position, sentence in enumerate(sentences[-1]):
+            score = weight
+            if terms:
+                overlap = len(terms & question_terms(sentence)) / len(terms)
+                score += OVERLAP_WEIGHT * overlap
+            # Ties go to earlier units, then earlier sentences
+            candidates.append((-score, unit, position))
+    candidates.sort()
+
+    kept = set()
+    used = 0
+    for _, unit, position in candidates:
+        # +1 for the separator joining it to its neighbours
+        cost = estimate_tokens(sentences[unit][position]) + 1
+        if used + cost <= budget:
+            kept.add((unit, position))
+            used += cost
+
+    packed = [
+        " ".join(
+            s for position, s in enumerate(unit_sentences) if (unit, position) in kept
+        )
+        for unit, unit_sentences in enumerate(sentences)
+    ]
+    if not kept and candidates:
+        # Not even the best sentence fits: keep as many of its words as do
+        _, unit, position = candidates[0]
+        words = []
+        for word in sentences[unit][position].split():
+            used += estimate_tokens(word)
+            if used > budget:
+                break
+            words.append(word)
+        packed[unit] = " ".join(words)
+    return packed[: len(passages)], packed[len(passages) :]
+
+
+def validate_prompt_inputs(
+    mode: str,
+    question: str,
+    context: str,
+    lang: str,
+    max_context_tokens: Optional[int],
+) -> None:
+    # Input validation and guard clauses
+    if not isinstance(mode, str) or not mode.strip():
+        raise ValueError("Invalid input: 'mode' must be a non-empty string.")
+    if not isinstance(question, str) or not question.strip():
+        raise ValueError("Invalid input: 'question' must be a non-empty string.")
     if not isinstance(context, str):
-        raise ValueError("Expected 'context' to be a string.")
-    if not isinstance(max_chars, int) or max_chars <= 0:
-        raise ValueError("Expected 'max_chars' to be a positive integer.")
+        raise ValueError("Invalid input: 'context' must be a string.")
+    if not isinstance(lang, str) or not lang.strip():
+        raise ValueError("Invalid input: 'lang' must be a non-empty string.")
+    if max_context_tokens is not None and (
+        not isinstance(max_context_tokens, int) or max_context_tokens <= 0
+    ):
+        raise ValueError(
+            "Invalid input: 'max_context_tokens' must be a positive integer."
+        )
 
-    try:
-        # If context length is within the limit, return as is.
-        if len(context) <= max_chars:
-            return context
-        # Otherwise, return only the first max_chars characters.
-        return context[:max_chars]
-    except Exception as e:
-        print(f"Unexpected error during context truncation: {e}")
-        # In an error scenario, attempt a safe fallback truncation
-        return context[:max_chars]
+
+def split_context(context: str) -> List[str]:
+    """
+    Retrieved chunks of a context, in retrieval order. The chunks were
+    cleaned by the index builder, so they are only stripped here.
+    """
+    chunks = (chunk.strip() for chunk in CHUNK_SEPARATOR.split(context))
+    return [chunk for chunk in chunks if chunk]
+
+
+def render_prompt(
+    template: CompiledTemplate,
+    question: str,
+    chunks: List[str],
+    max_context_tokens: int,
+    refs,
+    fetched: List[str],
+) -> str:
+    """
+    Fill the template with the question and the context: the fetched Bible
+    passages (`fetched[i]` is the text for the i-th ref) and the retrieved
+    chunks, packed into `max_context_tokens` estimated tokens.
+    """
+    passages = []
+    for ref, text in zip(refs, fetched):
+        if text:
+            passages.append(text)
+        else:
+            # Log a warning if a particular reference didn't yield text
+            print(f"Warning: No text fetched for Bible reference: {ref}")
+
+    passages, chunks = pack_context(passages, chunks, question, max_context_tokens)
+    bible_section = "\n".join(p for p in passages if p)
+    rag = "\n\n".join(c for c in chunks if c)
+
+    if bible_section:
+        context = f"Bible references: {bible_section}\nRAG: {rag}"
+    else:
+        context = rag
+
+    # Build the final prompt using the template
+    return template.render(context=context, question=question)
 
 
 def build_prompt(
@@ -289,13 +751,14 @@ def build_prompt(
     question: str,
     context: str,
     lang: str = "es",
-    max_context_chars: Optional[int] = 2000,
+    max_context_tokens: Optional[int] = None,
 ) -> dict:
     """
     Build the final LLM prompt by:
     1. Loading the template for `mode` (e.g., 'explain', 'reflect', 'apply', 'summarize', 'ask').
-    2. Truncating the context to avoid exceeding token limits.
-    3. Replacing placeholders in the template with the truncated context, question, and language.
+    2. Packing the Bible passages and retrieved context into a token budget
+       (`max_context_tokens`, by default the budget for `mode`).
+    3. Replacing placeholders in the template with the packed context, question, and language.
 
     Templates should use placeholders:
       {context}, {question}, {lang}
@@ -306,63 +769,56 @@ def build_prompt(
 
     Errors are logged and a fallback prompt is returned in case of failure.
     """
-    # Input validation and guard clauses
-    if not isinstance(mode, str) or not mode.strip():
-        raise ValueError("Invalid input: 'mode' must be a non-empty string.")
-    if not isinstance(question, str) or not question.strip():
-        raise ValueError("Invalid input: 'question' must be a non-empty string.")
-    if not isinstance(context, str):
-        raise ValueError("Invalid input: 'context' must be a string.")
-    if not isinstance(lang, str) or not lang.strip():
-        raise ValueError("Invalid input: 'lang' must be a non-empty string.")
-    if not isinstance(max_context_chars, int) or max_context_chars <= 0:
-        raise ValueError(
-            "Invalid input: 'max_context_chars' must be a positive integer."
-        )
+    validate_prompt_inputs(mode, question, context, lang, max_context_tokens)
 
     try:
         # Clean inputs
         question = clean_text(question)
-        context = clean_text(context)
+        chunks = split_context(context)
+        context = " ".join(chunks)
 
-        # Load template text
-        template = load_template(mode)
+        # Compiled template for this mode and language
+        template = template_store.get(mode, lang)
 
         # Find Bible references from question and context
-        refs = set(find_bible_references(question) + find_bible_references(context))
-
-        # Prepare Bible references section
-        bible_section = ""
-        if refs:
-            lines = []
-            for ref in refs:
-                fetched = fetch_bible_text(ref)
-                if fetched:
-                    lines.append(fetched)
-                else:
-                    # Log a warning if a particular reference didn't yield text
-                    print(f"Warning: No text fetched for Bible reference: {ref}")
-            bible_section = "\n".join(lines)
-
-        # Prepare the full context by including Bible references if available
-        if bible_section:
-            full_context = f"Bible references: {bible_section}\nRAG: {context}"
-            effective_max = max_context_chars + len(bible_section)
-        else:
-            full_context = context
-            effective_max = max_context_chars
+        references = unique_references(question, context)
+        fetched = resolve_bible_texts(references)
+        budget = max_context_tokens or context_token_budget(mode)
 
-        # Truncate full context ensuring Bible references are retained
-        truncated = truncate_context(full_context, max_chars=effective_max)
+        refs = [reference.text for reference in references]
+        prompt = render_prompt(template, question, chunks, budget, refs, fetched)
+        return {"prompt": prompt, "refs": set(refs)}
+    except Exception as e:
+        # Log the error and return a fallback prompt
+        print(f"Error generating prompt: {e}")
+        return {"prompt": FALLBACK_PROMPT, "refs": set()}
 
-        # Build the final prompt using the template
-        prompt = template.format(context=truncated, question=question, lang=lang)
 
-        return {"prompt": prompt, "refs": refs}
+async def build_prompt_async(
+    mode: str,
+    question: str,
+    context: str,
+    lang: str = "es",
+    max_context_tokens: Optional[int] = None,
+) -> dict:
+    """
+    build_prompt for the event loop: Bible passages missing from the local
+    Bible are fetched with the async HTTP client instead of blocking calls.
+    """
+    validate_prompt_inputs(mode, question, context, lang, max_context_tokens)
+
+    try:
+        question = clean_text(question)
+        chunks = split_context(context)
+        context = " ".join(chunks)
+        template = template_store.get(mode, lang)
+        references = unique_references(question, context)
+        fetched = await resolve_bible_texts_async(references)
+        budget = max_context_tokens or context_token_budget(mode)
+
+        refs = [reference.text for reference in references]
+        prompt = render_prompt(template, question, chunks, budget, refs, fetched)
+        return {"prompt": prompt, "refs": set(refs)}
     except Exception as e:
-        # Log the error and return a fallback prompt
         print(f"Error generating prompt: {e}")
-        fallback_prompt = (
-            "An error occurred while building the prompt. Please try again later."
-        )
-        return {"prompt": fallback_prompt, "refs": set()}
+        return {"prompt": FALLBACK_PROMPT, "refs": set()}
@@ -1,15 +1,263 @@
+import asyncio
+import queue
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from concurrent.futures import Future, InvalidStateError
+from typing import Optional
+
+import numpy as np
 from sentence_transformers import SentenceTransformer
 
+from app.core.config import settings
+from app.core.executor import run_cpu_bound
+
+EMBEDDING_MODEL_NAME = "all-MiniLM-L6-v2"
+
 _model = None
 
 
 def get_embedding_model():
     global _model
     if _model is None:
-        _model = SentenceTransformer("all-MiniLM-L6-v2")
+        _model = SentenceTransformer(EMBEDDING_MODEL_NAME)
     return _model
 
 
 def embed_text(text: str) -> list[float]:
     model = get_embedding_model()
     return model.encode([text])[0]
+
+
+def embed_texts(texts: list[str], batch_size: int = 64) -> np.ndarray:
+    """
+    Embed many texts with batched forward passes.
+    Returns a float32 matrix with one row per input text.
+    """
+    model = get_embedding_model()
+    vectors = model.encode(texts, batch_size=batch_size, convert_to_numpy=True)
+    return np.asarray(vectors, dtype="float32")
+
+
+class EmbeddingCache:
+    """
+    Bounded, thread-safe LRU cache of query embeddings.
+    Entries expire after `ttl_seconds` (0 disables expiry); a `max_size` of 0
+    disables caching altogether.
+    """
+
+    def __init__(self, max_size: int, ttl_seconds: float):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, tuple[float, np.ndarray]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: str) -> Optional[np.ndarray]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                stored_at, vector = entry
+                if self.ttl_seconds and time.monotonic() - stored_at > self.ttl_seconds:
+                    del self._entries[key]
+                    self.evictions += 1
+                else:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return vector
+            self.misses += 1
+            return None
+
+    def put(self, key: str, vector: np.ndarray) -> None:
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic(), vector)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+
+query_cache = EmbeddingCache(
+    max_size=settings.EMBED_CACHE_SIZE,
+    ttl_seconds=settings.EMBED_CACHE_TTL_SECONDS,
+)
+
+
+class EmbeddingBatcher:
+    """
+    Coalesces concurrent query embeddings into a single model.encode call.
+    The first request of a batch waits at most `window_ms` for others to join,
+    and a batch is flushed early once it holds `max_batch_size` texts or every
+    in-flight caller, so a lone request never waits for the window.
+    """
+
+    def __init__(self, window_ms: float, max_batch_size: int):
+        self.window_seconds = window_ms / 1000
+        self.max_batch_size = max_batch_size
+        self._queue: "queue.Queue[tuple[str, Future]]" = queue.Queue()
+        self._worker: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._active = 0
+        self.batches = 0
+        self.texts = 0
+
+    def submit(self, text: str) -> Future:
+        """
+        Queue `text` for the next batch; the future resolves to its vector.
+        """
+        future: Future = Future()
+        self._ensure_worker()
+        with self._lock:
+            self._active += 1
+        future.add_done_callback(self._release)
+        self._queue.put((text, future))
+        return future
+
+    def embed(self, text: str) -> np.ndarray:
+        return self.submit(text).result()
+
+    def _release(self, future: Future) -> None:
+        with self._lock:
+            self._active -= 1
+
+    def _ensure_worker(self) -> None:
+        with self._lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(
+                    target=self._run, name="embedding-batcher", daemon=True
+                )
+                self._worker.start()
+
+    def _run(self) -> None:
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.window_seconds
+            while len(batch) < min(self.max_batch_size, self._active):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            try:
+                self._flush(batch)
+            except Exception as e:
+                # One bad batch must not stop the worker; its callers get the error
+                print(f"⚠️ Embedding batch failed: {e}")
+                for _, future in batch:
+                    try:
+                        future.set_exception(e)
+                    except InvalidStateError:
+                        pass
+
+    def _flush(self, batch: list[tuple[str, Future]]) -> None:
+        # Callers that gave up (e.g. a cancelled request) are dropped; the rest
+        # are marked running, so they can no longer be cancelled under us
+        batch = [item for item in batch if item[1].set_running_or_notify_cancel()]
+        if not batch:
+            return
+        # Identical queries in the same window share one row of the batch
+        texts = list(dict.fromkeys(text for text, _ in batch))
+        try:
+            vectors = embed_texts(texts, batch_size=len(texts))
+        except Exception as e:
+            for _, future in batch:
+                future.set_exception(e)
+            return
+        rows = dict(zip(texts, vectors))
+        for text, future in batch:
+            future.set_result(rows[text])
+        with self._lock:
+            self.batches += 1
+            self.texts += len(batch)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "window_ms": self.window_seconds * 1000,
+                "max_batch_size": self.max_batch_size,
+                "batches": self.batches,
+                "texts": self.texts,
+                "avg_batch_size": (
+                    round(self.texts / self.batches, 2) if self.batches else 0
+                ),
+            }
+
+
+query_batcher = (
+    EmbeddingBatcher(
+        window_ms=settings.EMBED_BATCH_WINDOW_MS,
+        max_batch_size=settings.EMBED_BATCH_MAX_SIZE,
+    )
+    if settings.EMBED_BATCH_WINDOW_MS > 0
+    else None
+)
+
+
+def normalize_query(text: str) -> str:
+    """
+    Cache key for a query. all-MiniLM-L6-v2 uses an uncased tokenizer that
+    ignores runs of whitespace, so casing and spacing do not change the vector.
+    """
+    return " ".join(unicodedata.normalize("NFC", text).split()).lower()
+
+
+def embed_query(text: str) -> np.ndarray:
+    """
+    Embed a search query, reusing the cached float32 vector for repeated queries.
+    Cache misses go through the micro-batcher when it is enabled.
+    The returned array is read-only because it is shared between requests.
+    """
+    key = normalize_query(text)
+    vector = query_cache.get(key)
+    if vector is None:
+        if query_batcher is not None:
+            vector = query_batcher.embed(text)
+        else:
+            vector = embed_text(text)
+        vector = _cache_query_vector(key, vector)
+    return vector
+
+
+async def embed_query_async(text: str) -> np.ndarray:
+    """
+    embed_query for the event loop: a cache miss awaits the micro-batcher
+    without holding a thread, or runs on the CPU executor when batching is off.
+    """
+    key = normalize_query(text)
+    vector = query_cache.get(key)
+    if vector is None:
+        if query_batcher is not None:
+            vector = await asyncio.wrap_future(query_batcher.submit(text))
+        else:
+            vector = await run_cpu_bound(embed_text, text)
+        vector = _cache_query_vector(key, vector)
+    return vector
+
+
+def _cache_query_vector(key: str, vector) -> np.ndarray:
+    vector = np.array(vector, dtype="float32")
+    vector.setflags(write=False)
+    query_cache.put(key, vector)
+    return vector
@@ -1,5 +1,11 @@
 # -*- coding: utf-8 -*-
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
+from typing import Optional
+import argparse
+import hashlib
+import math
+import multiprocessing
 import numpy as np
 import faiss
 import json
@@ -7,21 +13,206 @@ import os
 import sys
 
 # Add the project root to the Python path
-sys.path.append(str(Path(__file__).resolve().parents[2]))
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
+sys.path.append(str(PROJECT_ROOT))
 
 
 # Output locations
 OUTPUT_DIR = Path(__file__).resolve().parent
 INDEX_FILE = OUTPUT_DIR / "lesson_index.faiss"
-METADATA_FILE = OUTPUT_DIR / "lesson_index_meta.json"
+METADATA_FILE = OUTPUT_DIR / "lesson_index_meta.bin"
+# Per-chunk content hashes and their vectors, aligned with the FAISS ids
+MANIFEST_FILE = OUTPUT_DIR / "lesson_index_manifest.json"
+VECTORS_FILE = OUTPUT_DIR / "lesson_index_vectors.npy"
 
 # Input directories
 LESSON_DIR = OUTPUT_DIR.parent / "data"
 BOOK_DIR = LESSON_DIR / "books"
 
 
-def build_index():
-    from app.indexing.embeddings import embed_text
+def _init_encoder_worker(num_threads: int):
+    # Split the cores between workers instead of letting each one grab them all
+    import torch
+
+    torch.set_num_threads(num_threads)
+
+
+def _encode_batch(batch: list[str]) -> np.ndarray:
+    from app.indexing.embeddings import embed_texts
+
+    return embed_texts(batch, batch_size=len(batch))
+
+
+def encode_corpus(texts: list[str], batch_size: int, workers: int = 1) -> np.ndarray:
+    """
+    Embed every chunk in batches of `batch_size`, streaming each block into a
+    preallocated float32 matrix. With `workers > 1` the batches are sharded
+    across a process pool where each worker loads its own copy of the model.
+    """
+    batches = [texts[i : i + batch_size] for i in range(0, len(texts), batch_size)]
+    vectors = None
+    offset = 0
+
+    def collect(blocks):
+        nonlocal vectors, offset
+        for block in blocks:
+            if vectors is None:
+                vectors = np.empty((len(texts), block.shape[1]), dtype="float32")
+            vectors[offset : offset + len(block)] = block
+            offset += len(block)
+            print(f"🧮 Embedded {offset}/{len(texts)} chunks")
+
+    if workers > 1:
+        num_threads = max(1, (os.cpu_count() or 1) // workers)
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_encoder_worker,
+            initargs=(num_threads,),
+        ) as pool:
+            collect(pool.map(_encode_batch, batches))
+    else:
+        collect(map(_encode_batch, batches))
+
+    return vectors
+
+
+INDEX_TYPES = ("flat", "ivf-flat", "ivf-pq", "hnsw")
+INDEX_METRICS = ("l2", "cosine")
+# Each PQ sub-quantizer trains 256 centroids, so IVF-PQ needs at least that many
+MIN_PQ_TRAINING_VECTORS = 256
+
+
+def index_factory_string(
+    index_type: str,
+    num_vectors: int,
+    nlist: int = 0,
+    pq_m: int = 16,
+    hnsw_m: int = 32,
+) -> str:
+    """
+    Translate an INDEX_TYPE setting into a faiss.index_factory description.
+    """
+    if index_type == "flat":
+        return "Flat"
+    if index_type in ("ivf-flat", "ivf-pq"):
+        nlist = min(nlist or int(4 * math.sqrt(num_vectors)), num_vectors)
+        encoding = "Flat" if index_type == "ivf-flat" else f"PQ{pq_m}"
+        return f"IVF{max(nlist, 1)},{encoding}"
+    if index_type == "hnsw":
+        return f"HNSW{hnsw_m},Flat"
+    raise ValueError(
+        f"Unknown index type '{index_type}', expected one of {', '.join(INDEX_TYPES)}"
+    )
+
+
+def create_index(
+    vectors: np.ndarray,
+    index_type: str = "flat",
+    nlist: int = 0,
+    pq_m: int = 16,
+    hnsw_m: int = 32,
+    metric: str = "l2",
+) -> faiss.Index:
+    """
+    Build, train (for IVF types) and fill a FAISS index of the given type.
+    With metric="cosine" the vectors are L2-normalized and stored in an
+    inner-product index, so search scores are cosine similarities.
+    """
+    if metric not in INDEX_METRICS:
+        raise ValueError(
+            f"Unknown metric '{metric}', expected one of {', '.join(INDEX_METRICS)}"
+        )
+    faiss_metric = faiss.METRIC_L2
+    if metric == "cosine":
+        vectors = vectors.copy()
+        faiss.normalize_L2(vectors)
+        faiss_metric = faiss.METRIC_INNER_PRODUCT
+    if index_type == "ivf-pq" and len(vectors) < MIN_PQ_TRAINING_VECTORS:
+        print(f"⚠️ Only {len(vectors)} vectors, too few to train IVF-PQ; using flat")
+        index_type = "flat"
+    description = index_factory_string(index_type, len(vectors), nlist, pq_m, hnsw_m)
+    index = faiss.index_factory(vectors.shape[1], description, faiss_metric)
+    if not index.is_trained:
+        print(f"🏋️ Training {description} on {len(vectors)} vectors...")
+        index.train(vectors)
+    index.add(vectors)
+    return index
+
+
+def content_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def load_previous_vectors(model_name: str) -> dict[str, np.ndarray]:
+    """
+    Map each chunk content hash from the last build to its stored vector.
+    Returns {} when there is nothing reusable (first build, different model,
+    or a manifest that does not match the stored vectors).
+    """
+    if not MANIFEST_FILE.exists() or not VECTORS_FILE.exists():
+        return {}
+    try:
+        with open(MANIFEST_FILE, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+        if manifest.get("model") != model_name:
+            print(f"⚠️ Manifest built with {manifest.get('model')}, re-embedding all")
+            return {}
+        hashes = manifest.get("hashes", [])
+        vectors = np.load(VECTORS_FILE)
+        if len(hashes) != len(vectors):
+            print("⚠️ Manifest does not match stored vectors, re-embedding all")
+            return {}
+        return dict(zip(hashes, vectors))
+    except Exception as e:
+        print(f"⚠️ Ignoring previous build manifest: {e}")
+        return {}
+
+
+def replace_file(path: Path, write) -> None:
+    """
+    Write `path` through a sibling temp file and rename it into place. Running
+    workers that memory-mapped the old file keep reading its (unlinked) pages
+    instead of seeing it rewritten under them.
+    """
+    tmp = path.with_name(f".{path.stem}.tmp{path.suffix}")
+    write(tmp)
+    os.replace(tmp, path)
+
+
+def build_index(
+    batch_size: Optional[int] = None,
+    workers: Optional[int] = None,
+    full: bool = False,
+    index_type: Optional[str] = None,
+    metric: Optional[str] = None,
+    warm_bible_cache: bool = False,
+):
+    """
+    Walk the lesson and book data and (re)write the FAISS index and metadata.
+    Unless `full` is set, chunks whose content hash is already in the manifest
+    reuse their stored vector, so only new or changed chunks are embedded and
+    chunks that disappeared from the data are dropped from the index.
+    With `warm_bible_cache`, Bible references in the chunks that the local
+    Bible cannot resolve are fetched into the passage cache.
+    """
+    from app.core.config import settings
+    from app.core.prompt_builder import clean_text
+    from app.indexing.embeddings import EMBEDDING_MODEL_NAME
+    from app.indexing.metadata_store import write_metadata_store
+
+    batch_size = batch_size or settings.EMBED_BATCH_SIZE
+    workers = workers or settings.INDEX_BUILD_WORKERS
+    index_type = index_type or settings.INDEX_TYPE
+    metric = metric or settings.INDEX_METRIC
+    if index_type not in INDEX_TYPES:
+        raise ValueError(
+            f"Unknown index type '{index_type}', expected one of {', '.join(INDEX_TYPES)}"
+        )
+    if metric not in INDEX_METRICS:
+        raise ValueError(
+            f"Unknown metric '{metric}', expected one of {', '.join(INDEX_METRICS)}"
+        )
 
     print("🔍 Building index...")
     texts = []
@@ -42,6 +233,10 @@ def build_index():
                     lesson = data.get("lesson", {})
                     sections = lesson.get("daily_sections", [])
 
+                    # Lessons live under data/{year}/{quarter}/{lesson_id}/
+                    parts = Path(root).relative_to(LESSON_DIR).parts
+                    year, quarter = (parts + (None, None))[:2]
+
                     for i, section in enumerate(sections):
                         content_list = section.get("content", [])
                         text = " ".join(content_list).strip()
@@ -56,6 +251,8 @@ def build_index():
                         metadata.append(
                             {
                                 "type": "lesson-section",
+                                "year": year,
+                                "quarter": quarter,
                                 "lesson_id": lesson.get("id"),
                                 "lesson_number": lesson.get("lesson_number"),
                                 "title": lesson.get("title"),
@@ -63,7 +260,7 @@ def build_index():
                                 "day": section.get("day"),
                                 "day_index": i + 1,
                                 "day_title": section.get("title", f"Section {i+1}"),
-                                "source": path,
+                                "source": os.path.relpath(path, PROJECT_ROOT),
                                 "text": text,
                                 "quote": quote_text,
                             }
@@ -107,7 +304,7 @@ def build_index():
                                     "page_end": sec.get("page_end"),
                                     "item_title": title,
                                     "page_number": page,
-                                    "source": str(json_path),
+                                    "source": os.path.relpath(json_path, PROJECT_ROOT),
                                     "text": text,
                                     "book-section-id": item.get("book-section-id", ""),
                                 }
@@ -125,7 +322,8 @@ def build_index():
                             {
                                 "type": "json-flat",
                                 "file_name": json_path.stem,
-                                "source": str(json_path),
+                                "source": os.path.relpath(json_path, PROJECT_ROOT),
+                                "text": text,
                             }
                         )
             except Exception as e:
@@ -136,21 +334,97 @@ def build_index():
         print("⚠️ No documents found to index. Exiting.")
         return
 
-    print(f"✅ Found {len(texts)} content chunks. Embedding...")
+    # Store chunks normalized so prompts do not clean them on every request
+    texts = [clean_text(t) for t in texts]
+    for meta, text in zip(metadata, texts):
+        meta["text"] = text
+        if meta.get("quote"):
+            meta["quote"] = clean_text(meta["quote"])
+
+    hashes = [content_hash(t) for t in texts]
+    previous = {} if full else load_previous_vectors(EMBEDDING_MODEL_NAME)
+    pending = [i for i, h in enumerate(hashes) if h not in previous]
+    dropped = len(previous.keys() - set(hashes))
+    print(
+        f"✅ Found {len(texts)} content chunks: reusing "
+        f"{len(texts) - len(pending)}, embedding {len(pending)}, dropping {dropped}."
+    )
+
+    fresh = None
+    if pending:
+        print(f"Embedding in batches of {batch_size} with {workers} worker(s)...")
+        fresh = encode_corpus(
+            [texts[i] for i in pending], batch_size=batch_size, workers=workers
+        )
+    dim = fresh.shape[1] if fresh is not None else len(next(iter(previous.values())))
 
-    vectors = [embed_text(t) for t in texts]
-    index = faiss.IndexFlatL2(len(vectors[0]))
-    index.add(np.array(vectors).astype("float32"))
+    vectors = np.empty((len(texts), dim), dtype="float32")
+    fresh_rows = {i: row for row, i in enumerate(pending)}
+    for i, h in enumerate(hashes):
+        vectors[i] = fresh[fresh_rows[i]] if i in fresh_rows else previous[h]
+
+    index = create_index(
+        vectors,
+        index_type=index_type,
+        nlist=settings.INDEX_NLIST,
+        pq_m=settings.INDEX_PQ_M,
+        hnsw_m=settings.INDEX_HNSW_M,
+        metric=metric,
+    )
+
+    def write_manifest(path: Path) -> None:
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"model": EMBEDDING_MODEL_NAME, "dim": dim, "hashes": hashes}, f)
 
     print("💾 Writing index and metadata...")
-    faiss.write_index(index, str(INDEX_FILE))
-    with open(METADATA_FILE, "w", encoding="utf-8") as f:
-        json.dump(metadata, f, ensure_ascii=False, indent=2)
+    replace_file(INDEX_FILE, lambda path: faiss.write_index(index, str(path)))
+    replace_file(METADATA_FILE, lambda path: write_metadata_store(metadata, path))
+    replace_file(VECTORS_FILE, lambda path: np.save(path, vectors))
+    replace_file(MANIFEST_FILE, write_manifest)
 
     print(f"✅ Successfully indexed {len(texts)} chunks.")
     print(f"📁 Index: {INDEX_FILE}")
     print(f"📁 Metadata: {METADATA_FILE}")
 
+    if warm_bible_cache:
+        from app.core.prompt_builder import warm_bible_passages
+
+        print("📖 Warming the Bible passage cache...")
+        counts = warm_bible_passages(texts)
+        print(
+            f"✅ {counts['references']} references, {counts['remote']} not in the"
+            f" local Bible, {counts['cached']} cached"
+        )
+
 
 if __name__ == "__main__":
-    build_index()
+    parser = argparse.ArgumentParser(description="Build the FAISS lesson index.")
+    parser.add_argument(
+        "--batch-size", type=int, help="Texts per embedding forward pass"
+    )
+    parser.add_argument(
+        "--workers", type=int, help="Processes to shard the embedding across"
+    )
+    parser.add_argument(
+        "--full", action="store_true", help="Ignore the manifest and re-embed all"
+    )
+    parser.add_argument(
+        "--index-type", choices=INDEX_TYPES, help="FAISS index type to write"
+    )
+    parser.add_argument(
+        "--metric", choices=INDEX_METRICS, help="l2 distance or cosine similarity"
+    )
+    parser.add_argument(
+        "--warm-bible-cache",
+        action="store_true",
+        help="Fetch corpus Bible references missing locally into the passage cache",
+    )
+    args = parser.parse_args()
+    build_index(
+        batch_size=args.batch_size,
+        workers=args.workers,
+        full=args.full,
+        index_type=args.index_type,
+        metric=args.metric,
+        warm_bible_cache=args.warm_bible_cache,
+    )
@@ -0,0 +1,231 @@
+# -*- coding: utf-8 -*-
+"""
+Compact, memory-mapped storage for the per-chunk index metadata.
+
+Layout of a metadata store file:
+    MAGIC | header length (uint64) | JSON header | 8-byte aligned sections
+
+Long string fields (TEXT_FIELDS) are text columns: int64 offsets into a
+UTF-8 blob plus an int8 state per row. Every other field (type, book_title,
+section_title, page numbers...) is categorical: the header holds each
+distinct value once and the file an int32 code per row.
+The file is opened read-only with np.memmap, so uvicorn workers share its
+pages through the OS page cache instead of each holding a copy of the rows.
+"""
+from collections.abc import Sequence
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+import json
+import struct
+
+import numpy as np
+
+MAGIC = b"SSMETA01"
+ALIGNMENT = 8
+
+# Code / state for rows where a field is missing from the metadata dict
+ABSENT = -1
+# Text column row states
+TEXT_PRESENT, TEXT_NONE, TEXT_ABSENT = 0, 1, 2
+
+
+# Long, mostly unique strings; every other field is stored as a category
+TEXT_FIELDS = ("text", "quote")
+
+
+def _is_text_column(field: str, values: List[Any], text_fields) -> bool:
+    return field in text_fields and all(v is None or isinstance(v, str) for v in values)
+
+
+def write_metadata_store(
+    metadata: List[dict], path: Path, text_fields=TEXT_FIELDS
+) -> None:
+    """
+    Serialize a list of metadata dicts (one per FAISS id) into a store file.
+    """
+    fields: Dict[str, None] = {}
+    for meta in metadata:
+        fields.update(dict.fromkeys(meta))
+
+    sections: List[bytes] = []
+    offset = 0
+    columns: Dict[str, dict] = {}
+
+    def add_section(data: bytes) -> int:
+        nonlocal offset
+        start = offset
+        padding = -len(data) % ALIGNMENT
+        sections.append(data + b"\0" * padding)
+        offset += len(data) + padding
+        return start
+
+    for field in fields:
+        present = [meta[field] for meta in metadata if field in meta]
+        if _is_text_column(field, present, text_fields):
+            states = np.full(len(metadata), TEXT_ABSENT, dtype="int8")
+            offsets = np.zeros(len(metadata) + 1, dtype="int64")
+            chunks = []
+            position = 0
+            for row, meta in enumerate(metadata):
+                if field in meta:
+                    value = meta[field]
+                    if value is None:
+                        states[row] = TEXT_NONE
+                    else:
+                        encoded = value.encode("utf-8")
+                        chunks.append(encoded)
+                        position += len(encoded)
+                        states[row] = TEXT_PRESENT
+                offsets[row + 1] = position
+            columns[field] = {
+                "kind": "text",
+                "states": add_section(states.tobytes()),
+                "offsets": add_section(offsets.tobytes()),
+                "blob": add_section(b"".join(chunks)),
+                "blob_length": position,
+            }
+        else:
+            values: List[Any] = []
+            lookup: Dict[str, int] = {}
+            codes = np.full(len(metadata), ABSENT, dtype="int32")
+            for row, meta in enumerate(metadata):
+                if field not in meta:
+                    continue
+                # Key on the JSON form so 1, "1" and True stay distinct values
+                key = json.dumps(meta[field], ensure_ascii=False, sort_keys=True)
+                if key not in lookup:
+                    lookup[key] = len(values)
+                    values.append(meta[field])
+                codes[row] = lookup[key]
+            columns[field] = {
+                "kind": "category",
+                "codes": add_section(codes.tobytes()),
+                "values": values,
+            }
+
+    header = json.dumps(
+        {"count": len(metadata), "fields": list(fields), "columns": columns},
+        ensure_ascii=False,
+    ).encode("utf-8")
+    preamble_length = len(MAGIC) + 8 + len(header)
+    header += b" " * (-preamble_length % ALIGNMENT)
+
+    with open(path, "wb") as f:
+        f.write(MAGIC)
+        f.write(struct.pack("<Q", len(header)))
+        f.write(header)
+        for data in sections:
+            f.write(data)
+
+
+class TextColumn(Sequence):
+    """
+    Lazily decoded view of one text column; rows without a value read as None.
+    """
+
+    def __init__(self, states: np.ndarray, offsets: np.ndarray, blob: np.ndarray):
+        self._states = states
+        self._offsets = offsets
+        self._blob = blob
+
+    def __len__(self) -> int:
+        return len(self._states)
+
+    def __getitem__(self, idx):
+        if isinstance(idx, slice):
+            return [self[i] for i in range(*idx.indices(len(self)))]
+        if self._states[idx] != TEXT_PRESENT:
+            return None
+        start, end = self._offsets[idx], self._offsets[idx + 1]
+        return self._blob[start:end].tobytes().decode("utf-8")
+
+
+class MetadataStore(Sequence):
+    """
+    Read-only, list-like view of a metadata store file. Indexing by FAISS id
+    materializes that row's metadata dict on demand.
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._buffer = np.memmap(self.path, dtype="uint8", mode="r")
+        if self._buffer[: len(MAGIC)].tobytes() != MAGIC:
+            raise ValueError(f"{self.path} is not a metadata store file")
+        (header_length,) = struct.unpack(
+            "<Q", self._buffer[len(MAGIC) : len(MAGIC) + 8].tobytes()
+        )
+        data_start = len(MAGIC) + 8 + header_length
+        header = json.loads(self._buffer[len(MAGIC) + 8 : data_start].tobytes())
+
+        self._count = header["count"]
+        self._fields = header["fields"]
+        self._categories: Dict[str, tuple] = {}
+        self._texts: Dict[str, TextColumn] = {}
+
+        def view(dtype: str, start: int, count: int) -> np.ndarray:
+            return np.frombuffer(
+                self._buffer, dtype=dtype, count=count, offset=data_start + start
+            )
+
+        for field, column in header["columns"].items():
+            if column["kind"] == "category":
+                codes = view("int32", column["codes"], self._count)
+                self._categories[field] = (codes, column["values"])
+            else:
+                self._texts[field] = TextColumn(
+                    view("int8", column["states"], self._count),
+                    view("int64", column["offsets"], self._count + 1),
+                    view("uint8", column["blob"], column["blob_length"]),
+                )
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __getitem__(self, idx):
+        if isinstance(idx, slice):
+            return [self[i] for i in range(*idx.indices(len(self)))]
+        if idx < 0:
+            idx += self._count
+        if not 0 <= idx < self._count:
+            raise IndexError("metadata index out of range")
+        row = {}
+        for field in self._fields:
+            if field in self._categories:
+                codes, values = self._categories[field]
+                code = codes[idx]
+                if code != ABSENT:
+                    row[field] = values[code]
+            else:
+                column = self._texts[field]
+                state = column._states[idx]
+                if state != TEXT_ABSENT:
+                    row[field] = column[idx]
+        return row
+
+    def __iter__(self) -> Iterator[dict]:
+        for idx in range(self._count):
+            yield self[idx]
+
+    def text_column(self, field: str) -> Optional[TextColumn]:
+        return self._texts.get(field)
+
+    def postings(self, field: str) -> Optional[Dict[str, np.ndarray]]:
+        """
+        FAISS ids per value of a categorical field, keyed by str(value).
+        Returns None when the field is not stored as a category.
+        """
+        if field not in self._categories:
+            return None
+        codes, values = self._categories[field]
+        order = np.argsort(codes, kind="stable")
+        bounds = np.searchsorted(codes[order], np.arange(len(values) + 1))
+        postings: Dict[str, np.ndarray] = {}
+        for code, value in enumerate(values):
+            if value in (None, ""):
+                continue
+            ids = order[bounds[code] : bounds[code + 1]].astype("int64")
+            key = str(value)
+            if key in postings:
+                ids = np.sort(np.concatenate([postings[key], ids]))
+            postings[key] = ids
+        return postings
@@ -1,36 +1,165 @@
 import faiss
 import json
+import logging
 import numpy as np
+from functools import lru_cache
 from pathlib import Path
-from typing import List
-from app.indexing.embeddings import embed_text
+from typing import Dict, List, Optional, Sequence
+from app.core.config import settings
+from app.core.executor import run_cpu_bound
+from app.indexing.embeddings import embed_query, embed_query_async
+from app.indexing.metadata_store import MetadataStore
 
 BASE_DIR = Path(__file__).resolve().parent
+PROJECT_ROOT = BASE_DIR.parents[1]
 INDEX_FILE = BASE_DIR / "lesson_index.faiss"
-METADATA_FILE = BASE_DIR / "lesson_index_meta.json"
+METADATA_FILE = BASE_DIR / "lesson_index_meta.bin"
+# Metadata format written by older builds
+LEGACY_METADATA_FILE = BASE_DIR / "lesson_index_meta.json"
+# Vectors (and HNSW graphs) stay in the page cache instead of the heap
+MMAP_FLAGS = faiss.IO_FLAG_MMAP_IFC | faiss.IO_FLAG_READ_ONLY
 
+logger = logging.getLogger(__name__)
 
-def load_faiss_index() -> faiss.Index:
+
+def load_faiss_index(mmap: Optional[bool] = None) -> faiss.Index:
+    """
+    Load the FAISS index. With `mmap` (default INDEX_MMAP) the codes are
+    memory-mapped read-only, so every worker process serving the same file
+    shares one copy in the OS page cache.
+    """
     if not INDEX_FILE.exists():
         raise FileNotFoundError(f"Missing index file: {INDEX_FILE}")
+    if settings.INDEX_MMAP if mmap is None else mmap:
+        try:
+            return faiss.read_index(str(INDEX_FILE), MMAP_FLAGS)
+        except RuntimeError as e:
+            print(f"⚠️ Could not memory-map {INDEX_FILE.name}, loading a copy: {e}")
     return faiss.read_index(str(INDEX_FILE))
 
 
-def load_metadata() -> List[dict]:
-    if not METADATA_FILE.exists():
-        raise FileNotFoundError(f"Missing metadata file: {METADATA_FILE}")
-    with open(str(METADATA_FILE), "r", encoding="utf-8") as f:
-        return json.load(f)
+def set_search_params(
+    index: faiss.Index, nprobe: Optional[int] = None, ef_search: Optional[int] = None
+) -> dict:
+    """
+    Apply query-time recall/latency knobs to an approximate index:
+    `nprobe` (IVF lists scanned per query) and `ef_search` (HNSW candidate
+    list size). Knobs that do not apply to the index type are ignored.
+    Returns the parameters now in effect.
+    """
+    index = faiss.downcast_index(index)
+    params = {
+        "index_type": type(index).__name__,
+        "metric": "cosine" if is_cosine_index(index) else "l2",
+    }
+    if hasattr(index, "nprobe"):
+        if nprobe:
+            index.nprobe = min(nprobe, index.nlist)
+        params["nprobe"] = index.nprobe
+    if hasattr(index, "hnsw"):
+        if ef_search:
+            index.hnsw.efSearch = ef_search
+        params["ef_search"] = index.hnsw.efSearch
+    return params
+
+
+def load_metadata() -> Sequence[dict]:
+    if METADATA_FILE.exists():
+        return MetadataStore(METADATA_FILE)
+    if LEGACY_METADATA_FILE.exists():
+        with open(str(LEGACY_METADATA_FILE), "r", encoding="utf-8") as f:
+            return json.load(f)
+    raise FileNotFoundError(f"Missing metadata file: {METADATA_FILE}")
+
+
+# Metadata fields that searches can be restricted to
+FILTER_FIELDS = ("type", "year", "quarter", "lesson_id", "book_title")
+# Public document type names accepted by /search, mapped to metadata types
+DOC_TYPE_ALIASES = {
+    "lesson": "lesson-section",
+    "lesson-section": "lesson-section",
+    "book": "book-section",
+    "book-section": "book-section",
+}
+
+
+def build_filter_index(
+    metadata: Sequence[dict],
+) -> Dict[str, Dict[str, np.ndarray]]:
+    """
+    Inverted index of FAISS ids per value of each filterable metadata field.
+    """
+    if isinstance(metadata, MetadataStore):
+        return {field: metadata.postings(field) or {} for field in FILTER_FIELDS}
+
+    postings: Dict[str, Dict[str, list]] = {field: {} for field in FILTER_FIELDS}
+    for idx, meta in enumerate(metadata):
+        for field in FILTER_FIELDS:
+            value = meta.get(field)
+            if value not in (None, ""):
+                postings[field].setdefault(str(value), []).append(idx)
+    return {
+        field: {value: np.array(ids, dtype="int64") for value, ids in values.items()}
+        for field, values in postings.items()
+    }
+
 
+def select_ids(filters: Dict[str, str]) -> np.ndarray:
+    """
+    FAISS ids whose metadata matches every filter (field -> value). A field
+    that no chunk of the index records (an index built before the field
+    existed) matches nothing, like an unknown value.
+    """
+    selected = None
+    for field, value in filters.items():
+        if field not in FILTER_FIELDS:
+            raise ValueError(f"Cannot filter search results on '{field}'")
+        postings = IndexStore.filter_ids.get(field)
+        if not postings:
+            logger.warning(
+                f"Index has no '{field}' metadata; rebuild it to filter on {field}"
+            )
+            return np.empty(0, dtype="int64")
+        ids = postings.get(str(value))
+        if ids is None:
+            return np.empty(0, dtype="int64")
+        selected = ids if selected is None else np.intersect1d(selected, ids)
+    return selected
+
+
+def make_search_params(
+    index: faiss.Index, selector: faiss.IDSelector
+) -> faiss.SearchParameters:
+    # IVF and HNSW indexes need their own parameter types to keep nprobe/efSearch
+    index = faiss.downcast_index(index)
+    if hasattr(index, "nprobe"):
+        return faiss.SearchParametersIVF(sel=selector, nprobe=index.nprobe)
+    if hasattr(index, "hnsw"):
+        return faiss.SearchParametersHNSW(sel=selector, efSearch=index.hnsw.efSearch)
+    return faiss.SearchParameters(sel=selector)
+
+
+def is_cosine_index(index: faiss.Index) -> bool:
+    # Built with metric="cosine": normalized vectors in an inner-product index
+    return index.metric_type == faiss.METRIC_INNER_PRODUCT
 
-def normalize_score(score: float) -> float:
+
+def normalize_score(score: float, cosine: bool = False) -> float:
+    if cosine:
+        return round(100 * max(score, 0.0), 2)
     return round(100 * (1 / (1 + score)), 2)
 
 
+@lru_cache(maxsize=8)
+def _load_source_json(path: str) -> dict:
+    # Sources are recorded relative to the project root
+    with open(PROJECT_ROOT / path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
 def load_chunk_text(meta: dict) -> str:
     try:
-        with open(meta["source"], "r", encoding="utf-8") as f:
-            data = json.load(f)
+        data = _load_source_json(meta["source"])
 
         if meta["type"] == "lesson-section":
             sections = data.get("lesson", {}).get("daily_sections", [])
@@ -62,47 +191,146 @@ def load_chunk_text(meta: dict) -> str:
         return f"Error loading Contenido: {e}"
 
 
+def build_chunk_store(metadata: Sequence[dict]) -> Sequence[str]:
+    """
+    Resolve the text of every indexed chunk once, in FAISS id order, so search
+    hits are hydrated with a list lookup instead of re-reading source files.
+    A metadata store already holds the texts as a memory-mapped column.
+    Chunks indexed without an inline "text" fall back to load_chunk_text.
+    """
+    if isinstance(metadata, MetadataStore) and metadata.text_column("text"):
+        return metadata.text_column("text")
+    try:
+        return [meta.get("text") or load_chunk_text(meta) for meta in metadata]
+    finally:
+        _load_source_json.cache_clear()
+
+
 class IndexStore:
     index = None
     metadata = []
+    chunk_texts = []
+    filter_ids = {}
+    search_params = {}
+    # Bumped on every (re)load so caches derived from the index can expire
+    version = 0
 
 
 def preload_index_and_metadata():
+    IndexStore.version += 1
     try:
         IndexStore.index = load_faiss_index()
+        IndexStore.search_params = set_search_params(
+            IndexStore.index,
+            nprobe=settings.SEARCH_NPROBE,
+            ef_search=settings.SEARCH_EF_SEARCH,
+        )
         IndexStore.metadata = load_metadata()
+        IndexStore.chunk_texts = build_chunk_store(IndexStore.metadata)
+        IndexStore.filter_ids = build_filter_index(IndexStore.metadata)
     except Exception as e:
         print(f"[ERROR] Could not preload FAISS index: {e}")
 
 
-def search_lessons(query: str, top_k: int = 5) -> List[dict]:
+def get_chunk_text(idx: int) -> str:
+    text = None
+    if 0 <= idx < len(IndexStore.chunk_texts):
+        text = IndexStore.chunk_texts[idx]
+    return text or load_chunk_text(IndexStore.metadata[idx])
+
+
+def search_lessons(
+    query: str,
+    top_k: int = 5,
+    min_similarity: Optional[float] = None,
+    filters: Optional[Dict[str, str]] = None,
+) -> List[dict]:
+    """
+    Return the top_k chunks closest to `query`. On a cosine index "score" is
+    the cosine similarity and hits below `min_similarity` (default
+    SEARCH_MIN_SIMILARITY) are dropped; on an L2 index it is the raw distance.
+    `filters` (field -> value, see FILTER_FIELDS) restrict the search inside
+    FAISS, so up to top_k matching chunks come back without over-fetching.
+    """
     if not query or not isinstance(query, str) or not query.strip():
         return [{"error": "Query is empty or invalid."}]
 
     try:
-        if IndexStore.index is None or not IndexStore.metadata:
-            raise RuntimeError("FAISS index or metadata not loaded in memory.")
-
-        query_vector = embed_text(query)
-        D, I = IndexStore.index.search(np.array([query_vector], dtype="float32"), top_k)
-
-        results = []
-        for score, idx in zip(D[0], I[0]):
-            if idx < 0 or idx >= len(IndexStore.metadata):
-                continue
-
-            meta = IndexStore.metadata[idx]
-            score_value = float(score)
-            results.append(
-                {
-                    **meta,
-                    "score": score_value,
-                    "normalized_score": normalize_score(score_value),
-                    "text": load_chunk_text(meta),
-                }
-            )
+        ensure_index_loaded()
+        return search_vector(embed_query(query), top_k, min_similarity, filters)
+    except Exception as e:
+        return [{"error": str(e)}]
+
 
-        return results
+async def search_lessons_async(
+    query: str,
+    top_k: int = 5,
+    min_similarity: Optional[float] = None,
+    filters: Optional[Dict[str, str]] = None,
+) -> List[dict]:
+    """
+    search_lessons for async handlers: the query embedding is awaited and the
+    FAISS search runs on the bounded CPU executor, off the event loop.
+    """
+    if not query or not isinstance(query, str) or not query.strip():
+        return [{"error": "Query is empty or invalid."}]
 
+    try:
+        ensure_index_loaded()
+        query_vector = await embed_query_async(query)
+        return await run_cpu_bound(
+            search_vector, query_vector, top_k, min_similarity, filters
+        )
     except Exception as e:
         return [{"error": str(e)}]
+
+
+def ensure_index_loaded() -> None:
+    if IndexStore.index is None or not IndexStore.metadata:
+        raise RuntimeError("FAISS index or metadata not loaded in memory.")
+
+
+def search_vector(
+    query_vector: np.ndarray,
+    top_k: int = 5,
+    min_similarity: Optional[float] = None,
+    filters: Optional[Dict[str, str]] = None,
+) -> List[dict]:
+    """
+    Search the loaded index with an already embedded query (see search_lessons).
+    """
+    cosine = is_cosine_index(IndexStore.index)
+    if min_similarity is None:
+        min_similarity = settings.SEARCH_MIN_SIMILARITY
+
+    query_matrix = np.array([query_vector], dtype="float32")
+    if cosine:
+        faiss.normalize_L2(query_matrix)
+    params = None
+    if filters:
+        ids = select_ids(filters)
+        if not len(ids):
+            return []
+        selector = faiss.IDSelectorBatch(ids)
+        params = make_search_params(IndexStore.index, selector)
+    D, I = IndexStore.index.search(query_matrix, top_k, params=params)
+
+    results = []
+    for score, idx in zip(D[0], I[0]):
+        if idx < 0 or idx >= len(IndexStore.metadata):
+            continue
+
+        meta = IndexStore.metadata[idx]
+        score_value = float(score)
+        if cosine and score_value < min_similarity:
+            continue
+        results.append(
+            {
+                **meta,
+                "score": score_value,
+                "normalized_score": normalize_score(score_value, cosine),
+                "text": get_chunk_text(idx),
+            }
+        )
+
+    return results
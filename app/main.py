@@ -7,6 +7,7 @@ from contextlib import asynccontextmanager
 from fastapi.middleware.cors import CORSMiddleware
 
 from app.indexing.search_service import preload_index_and_metadata
+from app.core.prompt_builder import template_store
 from app.api.v1.routes import router as api_router  # your public routes
 from app.api.v1.admin_routes import router as admin_router  # admin‐only
 from app.api.v1.auth import router as auth_router  # auth routes
@@ -19,6 +20,8 @@ from app.core.config import settings
 async def lifespan(app: FastAPI):
     # Load FAISS index + metadata once at startup
     preload_index_and_metadata()
+    # Compile the prompt templates so a malformed one fails the startup
+    template_store.load()
     yield
     # (optional teardown)
 
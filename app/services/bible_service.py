@@ -1,4 +1,12 @@
+import json
+import logging
 import re
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+BIBLE_DATA_PATH = Path(__file__).parent.parent.parent / "bible" / "RVR1960.json"
+BIBLE_TRANSLATION = "RVR1960"
 
 # Complete list of 66 books in Reina-Valera 1960 canonical order
 FULL_BOOKS = [
@@ -234,6 +242,20 @@ def parse_reference(ref: str) -> dict:
     if not match:
         raise ValueError(f"Invalid reference format: '{ref}'")
     book_part, chapter, verse_start, verse_end = match.groups()
+    # Build result
+    return {
+        "book": normalize_book(book_part),
+        "chapter": chapter,
+        "verse_start": verse_start,
+        "verse_end": verse_end or verse_start,
+    }
+
+
+def normalize_book(book_part: str) -> str:
+    """
+    Map a Spanish book name or abbreviation ('Juan', '2 Tim.') to its
+    Reina-Valera 1960 name ('S. Juan', '2 Timoteo').
+    """
     # Extract numeric prefix
     num_prefix = ""
     book_name = book_part
@@ -253,10 +275,40 @@ def parse_reference(ref: str) -> dict:
         else:
             # fallback to reconstructed name
             book_key = f"{num_prefix}{book_name}"
-    # Build result
-    return {
-        "book": book_key,
-        "chapter": chapter,
-        "verse_start": verse_start,
-        "verse_end": verse_end or verse_start,
-    }
+    return book_key
+
+
+def load_bible(path: Path = BIBLE_DATA_PATH) -> dict:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except Exception as e:
+        logger.error(f"Failed to load Bible JSON: {e}")
+        return {}
+
+
+# Shared in-memory RVR1960 text: {book: {chapter: {verse: text}}}
+BIBLE = load_bible()
+
+
+def lookup_verses(book: str, chapter: int, verses) -> str:
+    """
+    Passage body "(RVR1960): <verses>" of a parsed reference (book as
+    written, e.g. '2 Tim.', and inclusive verse ranges such as
+    ((16, 17), (20, 20))) from the in-memory Bible. Returns "" when the
+    reference cannot be resolved locally.
+    """
+    book_data = BIBLE.get(book) or BIBLE.get(normalize_book(book))
+    chapter_data = (book_data or {}).get(str(chapter))
+    if not chapter_data:
+        return ""
+
+    texts = []
+    for first, last in verses:
+        for verse in range(first, last + 1):
+            text = chapter_data.get(str(verse))
+            if text:
+                texts.append(text.strip())
+    if not texts:
+        return ""
+    return f"({BIBLE_TRANSLATION}): {' '.join(texts)}"
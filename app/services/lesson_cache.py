@@ -0,0 +1,145 @@
+# app/services/lesson_cache.py
+import json
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, NamedTuple, Optional
+
+import botocore
+
+from app.core.config import settings
+from app.services.s3_store import S3Store, s3_store
+
+
+def not_modified(e: botocore.exceptions.ClientError) -> bool:
+    error = e.response.get("Error", {})
+    status = e.response.get("ResponseMetadata", {}).get("HTTPStatusCode")
+    return status == 304 or error.get("Code") in ("304", "NotModified")
+
+
+class LessonDocument(NamedTuple):
+    etag: str
+    last_modified: Optional[datetime]
+    document: Any
+
+
+class LessonObjectCache:
+    """
+    Read-through LRU of parsed lesson documents (lesson.json, metadata.json)
+    keyed by S3 key and remembered with their ETag, bounded by the total size
+    of their bodies (`max_bytes`; larger documents are not kept).
+
+    A cached document is served without touching S3 for `ttl_seconds`; after
+    that it is revalidated with a conditional GET (IfNoneMatch), which costs
+    no body transfer and no parsing when the object is unchanged. Imports
+    call `invalidate()` so this worker sees the new lesson at once; other
+    workers pick it up at their next revalidation.
+
+    Documents are shared between requests and must not be modified.
+    """
+
+    def __init__(self, store: S3Store, max_bytes: int, ttl_seconds: float):
+        self.store = store
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        # key -> (LessonDocument, body size, validated at)
+        self._entries: "OrderedDict[str, tuple[LessonDocument, int, float]]" = (
+            OrderedDict()
+        )
+        self._bytes = 0
+        # Bumped by invalidate(), so a fetch that raced an import is not stored
+        self._generation = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.revalidations = 0
+        self.misses = 0
+
+    def get_json(self, key: str) -> Any:
+        """
+        Parsed JSON object at `key`. S3 errors (botocore ClientError, e.g.
+        NoSuchKey) and JSONDecodeError propagate, as from S3Store.get_json.
+        """
+        return self.get_document(key).document
+
+    def get_document(self, key: str) -> LessonDocument:
+        """
+        Parsed JSON object at `key` with the ETag and Last-Modified of the S3
+        object, for HTTP validators. Errors propagate as from get_json.
+        """
+        with self._lock:
+            generation = self._generation
+            entry = self._entries.get(key)
+            if entry and time.monotonic() - entry[2] < self.ttl_seconds:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+
+        params = {"Bucket": self.store.bucket, "Key": key}
+        if entry:
+            params["IfNoneMatch"] = entry[0].etag
+        try:
+            obj = self.store.client.get_object(**params)
+        except botocore.exceptions.ClientError as e:
+            if not (entry and not_modified(e)):
+                raise
+            with self._lock:
+                self.revalidations += 1
+                # Unless an import invalidated the key meanwhile
+                if self._entries.get(key) is entry:
+                    self._entries[key] = entry[:2] + (time.monotonic(),)
+                    self._entries.move_to_end(key)
+            return entry[0]
+
+        body = obj["Body"].read()
+        document = LessonDocument(
+            obj.get("ETag", ""),
+            obj.get("LastModified"),
+            json.loads(body.decode("utf-8")),
+        )
+        with self._lock:
+            self.misses += 1
+            # The object may predate an import that invalidated it meanwhile
+            if self._generation == generation:
+                self._store(key, document, len(body))
+        return document
+
+    def invalidate(self, prefix: str = "") -> None:
+        """
+        Drop every cached document whose key starts with `prefix`.
+        """
+        with self._lock:
+            self._generation += 1
+            for key in [k for k in self._entries if k.startswith(prefix)]:
+                self._bytes -= self._entries.pop(key)[1]
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "revalidations": self.revalidations,
+                "misses": self.misses,
+            }
+
+    def _store(self, key: str, document: LessonDocument, size: int) -> None:
+        old = self._entries.pop(key, None)
+        if old:
+            self._bytes -= old[1]
+        if size > self.max_bytes:
+            return
+        self._entries[key] = (document, size, time.monotonic())
+        self._bytes += size
+        while self._bytes > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self._bytes -= evicted[1]
+
+
+lesson_cache = LessonObjectCache(
+    s3_store,
+    max_bytes=settings.LESSON_CACHE_MAX_BYTES,
+    ttl_seconds=settings.LESSON_CACHE_TTL_SECONDS,
+)
@@ -0,0 +1,190 @@
+# app/services/lesson_catalog.py
+import json
+import logging
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+import botocore
+
+from app.core.config import settings
+from app.services.s3_store import S3Store, s3_store
+
+logger = logging.getLogger(__name__)
+
+# Lifetime of the presigned cover URLs handed out by /quarters
+COVER_URL_EXPIRY_SECONDS = 3600
+
+
+class LessonCatalog:
+    """
+    In-memory index of the quarters and lessons in the S3 bucket, as served
+    by /quarters and /lessons.
+
+    One listing of the bucket gives every key with its ETag. A quarter is a
+    `{year}/{slug}/metadata.json` key (numeric years only) and a lesson a
+    `{year}/{quarter}/{lesson_id}/metadata.json` key; a metadata.json is
+    downloaded again only when its ETag changed, and those downloads run
+    concurrently. The catalog is revalidated at most every `ttl_seconds`,
+    and `invalidate()` (called by lesson imports) forces a revalidation on
+    the next read.
+    """
+
+    def __init__(self, store: S3Store, ttl_seconds: float):
+        self.store = store
+        self.ttl_seconds = ttl_seconds
+        # metadata.json key -> (ETag, parsed metadata)
+        self._metadata: Dict[str, Tuple[str, dict]] = {}
+        self._keys: set = set()
+        self._quarters: Optional[List[dict]] = None
+        self._lessons: List[dict] = []
+        self._validated_at = 0.0
+        self._urls_at = 0.0
+        self._lock = threading.Lock()
+        self.refreshes = 0
+        self.metadata_fetches = 0
+
+    def quarters(self) -> List[dict]:
+        """
+        [{year, slug, metadata, cover_url}], sorted by year then slug.
+        """
+        with self._lock:
+            self._ensure_fresh()
+            if time.monotonic() - self._urls_at > COVER_URL_EXPIRY_SECONDS / 2:
+                self._sign_cover_urls()
+            return self._quarters
+
+    def lessons(
+        self, year: Optional[str] = None, quarter: Optional[str] = None
+    ) -> List[dict]:
+        """
+        [{year, quarter, lesson_id, metadata}] sorted by year, quarter and
+        lesson_id, optionally filtered by year and quarter.
+        """
+        with self._lock:
+            self._ensure_fresh()
+            lessons = self._lessons
+        return [
+            lesson
+            for lesson in lessons
+            if (year is None or lesson["year"] == year)
+            and (quarter is None or lesson["quarter"] == quarter)
+        ]
+
+    def has_object(self, key: str) -> bool:
+        """
+        Whether `key` was in the last bucket listing, e.g. to check that a PDF
+        exists before handing out a presigned URL without a request to S3.
+        """
+        with self._lock:
+            self._ensure_fresh()
+            return key in self._keys
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._validated_at = 0.0
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "quarters": len(self._quarters or ()),
+                "lessons": len(self._lessons),
+                "age_seconds": (
+                    round(time.monotonic() - self._validated_at, 1)
+                    if self._quarters is not None and self._validated_at
+                    else None
+                ),
+                "ttl_seconds": self.ttl_seconds,
+                "refreshes": self.refreshes,
+                "metadata_fetches": self.metadata_fetches,
+            }
+
+    def _ensure_fresh(self) -> None:
+        if (
+            self._quarters is not None
+            and self._validated_at
+            and time.monotonic() - self._validated_at < self.ttl_seconds
+        ):
+            return
+        self._refresh()
+
+    def _refresh(self) -> None:
+        etags = {obj["Key"]: obj.get("ETag", "") for obj in self.store.list_objects()}
+        metadata: Dict[str, Tuple[str, dict]] = {}
+        stale = []
+        for key, etag in etags.items():
+            parts = key.split("/")
+            if parts[-1] != "metadata.json" or len(parts) not in (3, 4):
+                continue
+            cached = self._metadata.get(key)
+            if cached and cached[0] == etag:
+                metadata[key] = cached
+            else:
+                stale.append(key)
+        documents = self.store.map(self._fetch_metadata, stale)
+        self.metadata_fetches += len(stale)
+        for key, document in zip(stale, documents):
+            if document is not None:
+                metadata[key] = (etags[key], document)
+
+        quarters, lessons = [], []
+        for key, (_, document) in metadata.items():
+            parts = key.split("/")
+            if len(parts) == 3 and parts[0].isdigit():
+                quarters.append(
+                    {"year": parts[0], "slug": parts[1], "metadata": document}
+                )
+            elif len(parts) == 4:
+                lessons.append(
+                    {
+                        "year": parts[0],
+                        "quarter": parts[1],
+                        "lesson_id": parts[2],
+                        "metadata": document,
+                    }
+                )
+        quarters.sort(key=lambda x: (x["year"], x["slug"]))
+        lessons.sort(key=lambda x: (x["year"], x["quarter"], x["lesson_id"]))
+
+        self._metadata = metadata
+        self._keys = set(etags)
+        self._quarters = quarters
+        self._lessons = lessons
+        self._sign_cover_urls()
+        self._validated_at = time.monotonic()
+        self.refreshes += 1
+
+    def _fetch_metadata(self, key: str) -> Optional[dict]:
+        try:
+            return self.store.get_json(key)
+        except botocore.exceptions.ClientError as e:
+            # Deleted between the listing and the download
+            if e.response.get("Error", {}).get("Code") in ("NoSuchKey", "404"):
+                return None
+            raise
+        except json.JSONDecodeError as e:
+            logger.error(f"Skipping invalid metadata JSON {key}: {e}")
+            return None
+
+    def _sign_cover_urls(self) -> None:
+        # Covers are looked up in the listing instead of one head_object per
+        # quarter; presigning is local, so URLs are refreshed before expiry
+        quarters = []
+        for quarter in self._quarters:
+            metadata = quarter["metadata"]
+            cover_key = (
+                metadata.get("coverKey") or f"covers/{metadata.get('slug')}-cover.png"
+            )
+            cover_url = None
+            if cover_key in self._keys:
+                cover_url = self.store.client.generate_presigned_url(
+                    "get_object",
+                    Params={"Bucket": self.store.bucket, "Key": cover_key},
+                    ExpiresIn=COVER_URL_EXPIRY_SECONDS,
+                )
+            quarters.append({**quarter, "cover_url": cover_url})
+        self._quarters = quarters
+        self._urls_at = time.monotonic()
+
+
+lesson_catalog = LessonCatalog(s3_store, ttl_seconds=settings.CATALOG_TTL_SECONDS)
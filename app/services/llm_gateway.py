@@ -0,0 +1,356 @@
+# app/services/llm_gateway.py
+import asyncio
+import logging
+import random
+import threading
+import time
+import weakref
+from typing import AsyncIterator, Optional
+
+logger = logging.getLogger(__name__)
+
+# HTTP statuses worth retrying: throttling and transient server errors
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+
+class LLMUnavailableError(RuntimeError):
+    """
+    The model could not be called: the circuit is open, the request could not
+    get a rate-limit token or a slot in time, or retries were exhausted.
+    `retry_after` is a hint, in seconds, for the client.
+    """
+
+    def __init__(self, message: str, retry_after: float = 1.0):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class LLMTimeoutError(LLMUnavailableError):
+    """
+    The per-request deadline passed before the model answered.
+    """
+
+
+def is_retryable(exc: BaseException) -> bool:
+    # google.api_core errors carry their HTTP status as `code`
+    if getattr(exc, "code", None) in RETRYABLE_STATUS:
+        return True
+    return isinstance(exc, (asyncio.TimeoutError, TimeoutError, ConnectionError))
+
+
+class TokenBucket:
+    """
+    Allows `rate` calls per second with bursts of up to `burst`. Callers
+    reserve a token and are told how long to wait for it; rate 0 disables.
+    """
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, max_wait: float) -> Optional[float]:
+        """
+        Take a token and return the seconds to wait before using it, or None
+        (taking nothing) when that would be longer than `max_wait`.
+        """
+        if self.rate <= 0:
+            return 0.0
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(
+                self.burst, self._tokens + (now - self._updated) * self.rate
+            )
+            self._updated = now
+            wait = max(0.0, (1 - self._tokens) / self.rate)
+            if wait > max_wait:
+                return None
+            self._tokens -= 1
+            return wait
+
+
+class CircuitBreaker:
+    """
+    Opens after `failure_threshold` consecutive retryable failures and then
+    rejects calls for `reset_seconds`. After that one trial call is let
+    through (half-open): success closes the circuit, failure reopens it.
+    A threshold of 0 disables the breaker.
+    """
+
+    def __init__(self, failure_threshold: int, reset_seconds: float):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.failures = 0
+        self._opened_at: Optional[float] = None
+        # When the half-open trial call was let through; a trial that never
+        # reports back (e.g. cancelled) is replaced after reset_seconds
+        self._trial_at: Optional[float] = None
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._opened_at is None:
+                return "closed"
+            if time.monotonic() - self._opened_at >= self.reset_seconds:
+                return "half-open"
+            return "open"
+
+    def allow(self) -> None:
+        """
+        Raise LLMUnavailableError unless a call may go through now.
+        """
+        with self._lock:
+            if self._opened_at is None:
+                return
+            now = time.monotonic()
+            remaining = self.reset_seconds - (now - self._opened_at)
+            if remaining <= 0 and (
+                self._trial_at is None or now - self._trial_at >= self.reset_seconds
+            ):
+                self._trial_at = now
+                return
+            raise LLMUnavailableError(
+                "LLM circuit breaker is open", retry_after=max(1.0, remaining)
+            )
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.failures = 0
+            self._opened_at = None
+            self._trial_at = None
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            if self.failure_threshold <= 0:
+                return
+            if self._trial_at is not None or self.failures >= self.failure_threshold:
+                if self._opened_at is None:
+                    logger.warning(
+                        f"LLM circuit breaker opened after {self.failures} failures"
+                    )
+                self._opened_at = time.monotonic()
+                self._trial_at = None
+
+
+class LLMGateway:
+    """
+    Every model call goes through here. A call waits for a concurrency slot
+    (at most `max_concurrency` in flight) and a rate-limit token, is retried
+    with exponential backoff and full jitter on 429/5xx and timeouts, and
+    gives up with LLMTimeoutError once `timeout_seconds` have passed since
+    it started. A circuit breaker fails calls fast while the provider keeps
+    failing.
+
+    `backend` is anything with the google.generativeai.GenerativeModel call
+    signatures, `generate_content(prompt)` and
+    `generate_content_async(prompt, stream=False)`, so tests can swap in a
+    local fake.
+    """
+
+    def __init__(
+        self,
+        backend,
+        max_concurrency: int,
+        rate_per_second: float,
+        burst: int,
+        max_retries: int,
+        backoff_base: float,
+        backoff_max: float,
+        timeout_seconds: float,
+        breaker: CircuitBreaker,
+    ):
+        self.backend = backend
+        self.max_concurrency = max_concurrency
+        self.bucket = TokenBucket(rate_per_second, burst)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.timeout_seconds = timeout_seconds
+        self.breaker = breaker
+        # Sync callers share one semaphore; async callers get one per event
+        # loop, since an asyncio.Semaphore is bound to the loop it waits on
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self._loop_slots: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.retries = 0
+        self.failures = 0
+        self.rejected = 0
+
+    def generate(self, prompt: str):
+        """
+        backend.generate_content(prompt) under the gateway's limits. The
+        deadline bounds waiting and retries; a call already in progress is
+        not interrupted.
+        """
+        deadline = time.monotonic() + self.timeout_seconds
+        if not self._slots.acquire(timeout=self.timeout_seconds):
+            self._reject("No LLM concurrency slot available")
+        try:
+            attempt = 0
+            while True:
+                time.sleep(self._admit(deadline))
+                try:
+                    response = self.backend.generate_content(prompt)
+                except Exception as e:
+                    delay = self._failed(e, attempt, deadline)
+                    time.sleep(delay)
+                    attempt += 1
+                    continue
+                self.breaker.record_success()
+                return response
+        finally:
+            self._slots.release()
+
+    async def generate_async(self, prompt: str):
+        """
+        backend.generate_content_async(prompt) under the gateway's limits;
+        each attempt is cancelled when the deadline passes.
+        """
+        deadline = time.monotonic() + self.timeout_seconds
+        slots = self._async_slots()
+        try:
+            await asyncio.wait_for(slots.acquire(), self.timeout_seconds)
+        except asyncio.TimeoutError:
+            self._reject("No LLM concurrency slot available")
+        try:
+            attempt = 0
+            while True:
+                await asyncio.sleep(self._admit(deadline))
+                try:
+                    response = await asyncio.wait_for(
+                        self.backend.generate_content_async(prompt),
+                        deadline - time.monotonic(),
+                    )
+                except Exception as e:
+                    await asyncio.sleep(self._failed(e, attempt, deadline))
+                    attempt += 1
+                    continue
+                self.breaker.record_success()
+                return response
+        finally:
+            slots.release()
+
+    async def stream_async(self, prompt: str) -> AsyncIterator:
+        """
+        Response chunks of backend.generate_content_async(prompt, stream=True).
+        Attempts are retried until the first chunk arrives; after that an
+        error ends the stream. Waiting for any chunk is bounded by
+        `timeout_seconds`, and the slot is held until the stream ends.
+        """
+        deadline = time.monotonic() + self.timeout_seconds
+        slots = self._async_slots()
+        try:
+            await asyncio.wait_for(slots.acquire(), self.timeout_seconds)
+        except asyncio.TimeoutError:
+            self._reject("No LLM concurrency slot available")
+        try:
+            attempt = 0
+            while True:
+                await asyncio.sleep(self._admit(deadline))
+                try:
+                    response = await asyncio.wait_for(
+                        self.backend.generate_content_async(prompt, stream=True),
+                        deadline - time.monotonic(),
+                    )
+                    chunks = response.__aiter__()
+                    first = await asyncio.wait_for(
+                        chunks.__anext__(), deadline - time.monotonic()
+                    )
+                except StopAsyncIteration:
+                    self.breaker.record_success()
+                    return
+                except Exception as e:
+                    await asyncio.sleep(self._failed(e, attempt, deadline))
+                    attempt += 1
+                    continue
+                break
+            self.breaker.record_success()
+            yield first
+            while True:
+                try:
+                    chunk = await asyncio.wait_for(
+                        chunks.__anext__(), self.timeout_seconds
+                    )
+                except StopAsyncIteration:
+                    return
+                except asyncio.TimeoutError:
+                    raise LLMTimeoutError("LLM stream stalled")
+                yield chunk
+        finally:
+            slots.release()
+
+    def _async_slots(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            slots = self._loop_slots.get(loop)
+            if slots is None:
+                slots = asyncio.Semaphore(self.max_concurrency)
+                self._loop_slots[loop] = slots
+            return slots
+
+    def _admit(self, deadline: float) -> float:
+        """
+        Seconds to wait before the next attempt, once the circuit breaker and
+        the rate limiter let it through.
+        """
+        self.breaker.allow()
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise LLMTimeoutError("LLM request deadline exceeded")
+        wait = self.bucket.reserve(max_wait=remaining)
+        if wait is None:
+            self._reject("LLM rate limit exceeded")
+        with self._lock:
+            self.calls += 1
+        return wait
+
+    def _failed(self, exc: Exception, attempt: int, deadline: float) -> float:
+        """
+        Backoff before retrying after `exc`, or re-raise it (as an
+        LLMUnavailableError once retries or time run out).
+        """
+        if not is_retryable(exc):
+            # The provider answered, so this says nothing about its health
+            self.breaker.record_success()
+            raise exc
+        self.breaker.record_failure()
+        with self._lock:
+            self.failures += 1
+        if time.monotonic() >= deadline:
+            raise LLMTimeoutError("LLM request deadline exceeded") from exc
+        if attempt >= self.max_retries:
+            raise LLMUnavailableError(
+                f"LLM unavailable after {attempt + 1} attempts: {exc}"
+            ) from exc
+        # Full jitter: spread retries so throttled callers do not synchronize
+        delay = random.uniform(0, min(self.backoff_max, self.backoff_base * 2**attempt))
+        if time.monotonic() + delay >= deadline:
+            raise LLMTimeoutError("LLM request deadline exceeded") from exc
+        logger.info(f"LLM call failed ({exc}); retrying in {delay:.2f}s")
+        with self._lock:
+            self.retries += 1
+        return delay
+
+    def _reject(self, message: str) -> None:
+        with self._lock:
+            self.rejected += 1
+        raise LLMUnavailableError(message)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "max_concurrency": self.max_concurrency,
+                "rate_per_second": self.bucket.rate,
+                "burst": self.bucket.burst,
+                "timeout_seconds": self.timeout_seconds,
+                "calls": self.calls,
+                "retries": self.retries,
+                "failures": self.failures,
+                "rejected": self.rejected,
+                "circuit": self.breaker.state,
+            }
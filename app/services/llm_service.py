@@ -1,15 +1,167 @@
 import google.generativeai as genai
-from typing import Literal, Dict
+from collections import OrderedDict
+from typing import AsyncIterator, Literal, Dict, Optional, Union
+import hashlib
 import logging
+import threading
+import time
+
+import numpy as np
 
 from app.core.config import settings
-from app.core.prompt_builder import build_prompt
+from app.core.prompt_builder import build_prompt, build_prompt_async
+from app.indexing.embeddings import embed_query, embed_query_async, normalize_query
+from app.indexing.search_service import IndexStore
+from app.services.llm_gateway import CircuitBreaker, LLMGateway, LLMUnavailableError
 
 
 # Initialize Gemini client
 genai.configure(api_key=settings.GEMINI_API_KEY)
 model = genai.GenerativeModel("gemini-2.0-flash-lite")
 
+# All model calls go through the gateway; tests swap gateway.backend for a fake
+gateway = LLMGateway(
+    model,
+    max_concurrency=settings.LLM_MAX_CONCURRENCY,
+    rate_per_second=settings.LLM_RATE_PER_SECOND,
+    burst=settings.LLM_RATE_BURST,
+    max_retries=settings.LLM_MAX_RETRIES,
+    backoff_base=settings.LLM_BACKOFF_BASE_SECONDS,
+    backoff_max=settings.LLM_BACKOFF_MAX_SECONDS,
+    timeout_seconds=settings.LLM_TIMEOUT_SECONDS,
+    breaker=CircuitBreaker(
+        settings.LLM_CIRCUIT_FAILURES, settings.LLM_CIRCUIT_RESET_SECONDS
+    ),
+)
+
+
+class AnswerCache:
+    """
+    Semantic cache of LLM answers, bounded to `max_size` entries (LRU) that
+    expire after `ttl_seconds` (0 disables expiry). Answers are grouped by
+    (mode, lang, fingerprint of the retrieved context); inside a group a
+    question reuses the answer of any cached question whose embedding has a
+    cosine similarity of at least `threshold`. Entries are dropped when the
+    index is reloaded (IndexStore.version changes).
+    """
+
+    def __init__(self, max_size: int, ttl_seconds: float, threshold: float):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.threshold = threshold
+        # (group, normalized question) -> (stored_at, unit vector, answer)
+        self._entries: "OrderedDict[tuple, tuple[float, np.ndarray, dict]]" = (
+            OrderedDict()
+        )
+        self._groups: Dict[tuple, set] = {}
+        self._index_version = IndexStore.version
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_size > 0
+
+    @staticmethod
+    def group_key(mode: str, lang: str, context_text: str) -> tuple:
+        fingerprint = hashlib.sha256(context_text.encode("utf-8")).hexdigest()
+        return (mode, lang, fingerprint)
+
+    def get(
+        self, mode: str, lang: str, context_text: str, question: str, vector
+    ) -> Optional[dict]:
+        group = self.group_key(mode, lang, context_text)
+        unit = _unit(vector)
+        now = time.monotonic()
+        with self._lock:
+            self._check_index_version()
+            best_key, best_score = None, self.threshold
+            exact = (group, normalize_query(question))
+            candidates = (
+                [exact] if exact in self._entries else self._groups.get(group, ())
+            )
+            for key in list(candidates):
+                stored_at, cached, _ = self._entries[key]
+                if self._expired(stored_at, now):
+                    self._remove(key)
+                    self.evictions += 1
+                    continue
+                score = float(np.dot(unit, cached))
+                if key == exact or score >= best_score:
+                    best_key, best_score = key, score
+                    if key == exact:
+                        break
+            if best_key is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(best_key)
+            self.hits += 1
+            return self._entries[best_key][2]
+
+    def put(
+        self, mode: str, lang: str, context_text: str, question: str, vector, answer
+    ) -> None:
+        if not self.enabled:
+            return
+        group = self.group_key(mode, lang, context_text)
+        key = (group, normalize_query(question))
+        with self._lock:
+            self._check_index_version()
+            self._entries[key] = (time.monotonic(), _unit(vector), answer)
+            self._entries.move_to_end(key)
+            self._groups.setdefault(group, set()).add(key)
+            while len(self._entries) > self.max_size:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._groups.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "ttl_seconds": self.ttl_seconds,
+                "threshold": self.threshold,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+    def _expired(self, stored_at: float, now: float) -> bool:
+        return bool(self.ttl_seconds) and now - stored_at > self.ttl_seconds
+
+    def _remove(self, key: tuple) -> None:
+        del self._entries[key]
+        group = self._groups[key[0]]
+        group.discard(key)
+        if not group:
+            del self._groups[key[0]]
+
+    def _check_index_version(self) -> None:
+        if self._index_version != IndexStore.version:
+            self._entries.clear()
+            self._groups.clear()
+            self._index_version = IndexStore.version
+
+
+def _unit(vector) -> np.ndarray:
+    vector = np.asarray(vector, dtype="float32")
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+answer_cache = AnswerCache(
+    max_size=settings.ANSWER_CACHE_SIZE,
+    ttl_seconds=settings.ANSWER_CACHE_TTL_SECONDS,
+    threshold=settings.ANSWER_CACHE_SIMILARITY,
+)
+
 
 def generate_llm_response(
     text: str,
@@ -21,35 +173,191 @@ def generate_llm_response(
         return "[Error: Empty or invalid input provided to LLM]"
 
     try:
+        vector = question_vector(text)
+        cached = cached_answer(mode, lang, context_text, text, vector)
+        if cached:
+            return cached
+
         result = build_prompt(mode, text, context_text, lang)
-        if (
-            not isinstance(result, dict)
-            or "prompt" not in result
-            or "refs" not in result
-        ):
-            logging.error(
-                "build_prompt did not return the expected dictionary structure."
-            )
-            return "[Error: Invalid prompt result structure]"
+        error = check_prompt_result(result)
+        if error:
+            return error
+
+        response = gateway.generate(result["prompt"])
+        answer = answer_from_response(response, result["refs"])
+        cache_answer(mode, lang, context_text, text, vector, answer)
+        return answer
+    except LLMUnavailableError:
+        raise
+    except Exception as e:
+        logging.error(f"Error generating LLM response: {e}")
+        return f"[Error with Gemini SDK: {str(e)}]"
 
-        prompt = result["prompt"]
-        refs = result["refs"]
 
-        if not isinstance(prompt, str) or not prompt.strip():
-            logging.error("The prompt is empty or invalid.")
-            return "[Error: Prompt generation failed]"
+async def generate_llm_response_async(
+    text: str,
+    mode: Literal["explain", "reflect", "apply", "summarize"],
+    context_text: str,
+    lang: str = "en",
+) -> Union[dict, str]:
+    """
+    generate_llm_response on the async Gemini client, so a request waiting on
+    the model holds no thread.
+    Raises LLMUnavailableError when the gateway gives up on the model; other
+    errors are returned as "[Error ...]" strings.
+    """
+    if not isinstance(text, str) or not text.strip():
+        return "[Error: Empty or invalid input provided to LLM]"
+
+    try:
+        vector = await question_vector_async(text)
+        cached = cached_answer(mode, lang, context_text, text, vector)
+        if cached:
+            return cached
 
-        response = model.generate_content(prompt)
-        if not response or not hasattr(response, "text") or not response.text.strip():
-            logging.error("LLM returned an empty or invalid response.")
-            return "[Error: Invalid LLM response]"
+        result = await build_prompt_async(mode, text, context_text, lang)
+        error = check_prompt_result(result)
+        if error:
+            return error
 
-        return {"answer": response.text, "refs": refs}
+        response = await gateway.generate_async(result["prompt"])
+        answer = answer_from_response(response, result["refs"])
+        cache_answer(mode, lang, context_text, text, vector, answer)
+        return answer
+    except LLMUnavailableError:
+        raise
     except Exception as e:
         logging.error(f"Error generating LLM response: {e}")
         return f"[Error with Gemini SDK: {str(e)}]"
 
 
+async def stream_llm_response(
+    text: str,
+    mode: Literal["explain", "reflect", "apply", "summarize"],
+    context_text: str,
+    lang: str = "en",
+) -> AsyncIterator[dict]:
+    """
+    Streaming generate_llm_response. Yields {"refs": [...]} once the prompt is
+    built, then {"text": chunk} for each chunk as Gemini emits it.
+    Raises ValueError for empty input and RuntimeError if the prompt or the
+    model response is unusable.
+    """
+    if not isinstance(text, str) or not text.strip():
+        raise ValueError("Empty or invalid input provided to LLM")
+
+    vector = await question_vector_async(text)
+    cached = cached_answer(mode, lang, context_text, text, vector)
+    if cached:
+        # A cached answer is sent whole, as a single chunk
+        yield {"refs": sorted(cached["refs"])}
+        yield {"text": cached["answer"]}
+        return
+
+    result = await build_prompt_async(mode, text, context_text, lang)
+    error = check_prompt_result(result)
+    if error:
+        raise RuntimeError(error)
+
+    yield {"refs": sorted(result["refs"])}
+    chunks = []
+    async for chunk in stream_model_text(result["prompt"]):
+        chunks.append(chunk)
+        yield {"text": chunk}
+    answer = {"answer": "".join(chunks), "refs": result["refs"]}
+    cache_answer(mode, lang, context_text, text, vector, answer)
+
+
+async def stream_llm_text(prompt: str, lang: str = "es") -> AsyncIterator[str]:
+    """
+    Streaming get_llm_response: yields answer chunks as Gemini emits them.
+    """
+    if not isinstance(prompt, str) or not prompt.strip():
+        raise ValueError("Prompt is empty or invalid")
+
+    async for chunk in stream_model_text(with_lang_instruction(prompt, lang)):
+        yield chunk
+
+
+async def stream_model_text(prompt: str) -> AsyncIterator[str]:
+    emitted = False
+    async for chunk in gateway.stream_async(prompt):
+        try:
+            text = chunk.text
+        except ValueError:
+            # Chunks without text parts, e.g. a trailing finish_reason chunk
+            text = ""
+        if text:
+            emitted = True
+            yield text
+    if not emitted:
+        logging.error("LLM returned an empty or invalid response.")
+        raise RuntimeError("Invalid LLM response")
+
+
+def question_vector(text: str) -> Optional[np.ndarray]:
+    """
+    Embedding of the question for the answer cache, or None when the cache is
+    disabled or the question cannot be embedded (the answer is then uncached).
+    """
+    if not answer_cache.enabled:
+        return None
+    try:
+        return embed_query(text)
+    except Exception as e:
+        logging.warning(f"Answer cache skipped, could not embed question: {e}")
+        return None
+
+
+async def question_vector_async(text: str) -> Optional[np.ndarray]:
+    if not answer_cache.enabled:
+        return None
+    try:
+        return await embed_query_async(text)
+    except Exception as e:
+        logging.warning(f"Answer cache skipped, could not embed question: {e}")
+        return None
+
+
+def cached_answer(
+    mode: str, lang: str, context_text: str, text: str, vector
+) -> Optional[dict]:
+    if vector is None:
+        return None
+    return answer_cache.get(mode, lang, context_text, text, vector)
+
+
+def cache_answer(
+    mode: str, lang: str, context_text: str, text: str, vector, answer
+) -> None:
+    # Only successful answers are cached; errors are returned as strings
+    if vector is not None and isinstance(answer, dict):
+        answer_cache.put(mode, lang, context_text, text, vector, answer)
+
+
+def check_prompt_result(result) -> Optional[str]:
+    """
+    Error message for a malformed build_prompt result, or None if it is usable.
+    """
+    if not isinstance(result, dict) or "prompt" not in result or "refs" not in result:
+        logging.error("build_prompt did not return the expected dictionary structure.")
+        return "[Error: Invalid prompt result structure]"
+
+    prompt = result["prompt"]
+    if not isinstance(prompt, str) or not prompt.strip():
+        logging.error("The prompt is empty or invalid.")
+        return "[Error: Prompt generation failed]"
+    return None
+
+
+def answer_from_response(response, refs) -> Union[dict, str]:
+    if not response or not hasattr(response, "text") or not response.text.strip():
+        logging.error("LLM returned an empty or invalid response.")
+        return "[Error: Invalid LLM response]"
+
+    return {"answer": response.text, "refs": refs}
+
+
 # function that returns the LLM response
 
 
@@ -61,14 +369,41 @@ def get_llm_response(prompt: str, lang: str = "es") -> Dict[str, str]:
         logging.error("Empty or invalid prompt provided to get_llm_response.")
         return {"answer": "[Error: Prompt is empty or invalid]"}
     try:
-        # prepend instruction to generate response in specified language
-        prompt_with_lang = f"{prompt}\n\nPor favor, responde en {lang}."
-        response = model.generate_content(prompt_with_lang)
-        answer_text = getattr(response, "text", "").strip() if response else ""
-        if not answer_text:
-            logging.error("LLM returned an empty or invalid response.")
-            return {"answer": "[Error: Invalid LLM response]"}
-        return {"answer": answer_text}
+        response = gateway.generate(with_lang_instruction(prompt, lang))
+        return raw_answer(response)
+    except LLMUnavailableError:
+        raise
     except Exception as e:
         logging.error(f"Error in get_llm_response: {e}", exc_info=True)
         return {"answer": f"[Error with LLM service: {str(e)}]"}
+
+
+async def get_llm_response_async(prompt: str, lang: str = "es") -> Dict[str, str]:
+    """
+    get_llm_response on the async Gemini client. Raises LLMUnavailableError
+    when the gateway gives up on the model.
+    """
+    if not isinstance(prompt, str) or not prompt.strip():
+        logging.error("Empty or invalid prompt provided to get_llm_response.")
+        return {"answer": "[Error: Prompt is empty or invalid]"}
+    try:
+        response = await gateway.generate_async(with_lang_instruction(prompt, lang))
+        return raw_answer(response)
+    except LLMUnavailableError:
+        raise
+    except Exception as e:
+        logging.error(f"Error in get_llm_response: {e}", exc_info=True)
+        return {"answer": f"[Error with LLM service: {str(e)}]"}
+
+
+def with_lang_instruction(prompt: str, lang: str) -> str:
+    # prepend instruction to generate response in specified language
+    return f"{prompt}\n\nPor favor, responde en {lang}."
+
+
+def raw_answer(response) -> Dict[str, str]:
+    answer_text = getattr(response, "text", "").strip() if response else ""
+    if not answer_text:
+        logging.error("LLM returned an empty or invalid response.")
+        return {"answer": "[Error: Invalid LLM response]"}
+    return {"answer": answer_text}
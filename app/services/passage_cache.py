@@ -0,0 +1,239 @@
+# app/services/passage_cache.py
+import asyncio
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from pathlib import Path
+from typing import Awaitable, Callable, Optional
+
+from starlette.concurrency import run_in_threadpool
+
+from app.core.config import settings
+from app.services.bible_service import normalize_book
+
+DEFAULT_CACHE_PATH = (
+    Path(__file__).resolve().parents[1] / "indexing" / "bible_passages.sqlite3"
+)
+
+
+def reference_key(book: str, chapter: int, verses) -> str:
+    """
+    Cache key for a parsed reference: 'Jn. 3:16', 'Juan  3:16' and
+    'S. Juan 3:16' all map to 'S. Juan 3:16'.
+    """
+    ranges = ",".join(
+        str(first) if first == last else f"{first}-{last}" for first, last in verses
+    )
+    return f"{normalize_book(book)} {chapter}:{ranges}"
+
+
+class PassageCache:
+    """
+    Two-tier cache of Bible passages fetched from a remote API: an in-process
+    LRU of `max_size` entries in front of an SQLite file shared by every
+    worker (`path` None keeps the cache in memory only). Concurrent misses for
+    the same reference are single-flighted: one caller fetches, the others
+    wait for its result. Only non-empty passages are stored, so failed
+    lookups are retried.
+
+    Keys are normalized references, so entries hold the passage body only;
+    callers add the reference as the user spelled it.
+    """
+
+    def __init__(self, max_size: int, path: Optional[Path] = None):
+        self.max_size = max_size
+        self.path = Path(path) if path else None
+        self._entries: "OrderedDict[str, str]" = OrderedDict()
+        self._inflight: dict[str, Future] = {}
+        self._lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.fetches = 0
+
+    def _connection(self) -> Optional[sqlite3.Connection]:
+        # Opened lazily, under self._lock, so importing the app touches no files
+        if self._db is None and self.path is not None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._db = sqlite3.connect(
+                str(self.path), check_same_thread=False, timeout=5
+            )
+            self._db.execute("PRAGMA journal_mode=WAL")
+            # Bodies without the reference header; rows of the older
+            # "passages" table embedded it and are left unread
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS passage_bodies "
+                "(ref TEXT PRIMARY KEY, text TEXT NOT NULL, fetched_at REAL NOT NULL)"
+            )
+            self._db.commit()
+        return self._db
+
+    def get(self, key: str) -> str:
+        """
+        Cached passage for `key` (see reference_key), or "" on a miss.
+        """
+        with self._lock:
+            return self._get(key)
+
+    def _get(self, key: str) -> str:
+        text = self._entries.get(key)
+        if text:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return text
+        db = self._connection()
+        row = None
+        if db is not None:
+            row = db.execute(
+                "SELECT text FROM passage_bodies WHERE ref = ?", (key,)
+            ).fetchone()
+        if row:
+            self._remember(key, row[0])
+            self.disk_hits += 1
+            return row[0]
+        self.misses += 1
+        return ""
+
+    def put(self, key: str, text: str) -> None:
+        if not text:
+            return
+        with self._lock:
+            self._put(key, text)
+
+    def _put(self, key: str, text: str) -> None:
+        self._remember(key, text)
+        db = self._connection()
+        if db is not None:
+            db.execute(
+                "INSERT OR REPLACE INTO passage_bodies (ref, text, fetched_at) VALUES (?, ?, ?)",
+                (key, text, time.time()),
+            )
+            db.commit()
+
+    def _remember(self, key: str, text: str) -> None:
+        if self.max_size <= 0:
+            return
+        self._entries[key] = text
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def _peek(self, key: str) -> tuple[str, Optional[Future]]:
+        """
+        Text held in memory or the in-flight future for `key`, without
+        touching the SQLite tier.
+        """
+        with self._lock:
+            text = self._entries.get(key)
+            if text:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return text, None
+            return "", self._inflight.get(key)
+
+    def _claim(self, key: str) -> tuple[str, Optional[Future], bool]:
+        """
+        Cached text, or the in-flight future for `key` and whether the caller
+        owns the fill (and must call _settle).
+        """
+        with self._lock:
+            text = self._get(key)
+            if text:
+                return text, None, False
+            future = self._inflight.get(key)
+            if future is not None:
+                return "", future, False
+            future = Future()
+            self._inflight[key] = future
+            self.fetches += 1
+            return "", future, True
+
+    def _settle(self, key: str, future: Future, text: str) -> str:
+        with self._lock:
+            if text:
+                self._put(key, text)
+            del self._inflight[key]
+        future.set_result(text)
+        return text
+
+    def get_or_fetch(self, key: str, fetch: Callable[[], str]) -> str:
+        """
+        Cached passage for `key`, calling `fetch()` once on a miss.
+        """
+        text, future, owner = self._claim(key)
+        if future is None:
+            return text
+        if not owner:
+            return future.result()
+        fetched = ""
+        try:
+            fetched = fetch()
+        finally:
+            self._settle(key, future, fetched)
+        return fetched
+
+    async def get_or_fetch_async(
+        self, key: str, fetch: Callable[[], Awaitable[str]]
+    ) -> str:
+        """
+        get_or_fetch for the event loop; waiting on another caller's fill
+        does not block the loop, and SQLite reads and writes run in the
+        threadpool.
+        """
+        text, future = self._peek(key)
+        if text:
+            return text
+        if future is None:
+            if self.path is None:
+                text, future, owner = self._claim(key)
+            else:
+                text, future, owner = await run_in_threadpool(self._claim, key)
+            if future is None:
+                return text
+        else:
+            owner = False
+        if not owner:
+            return await asyncio.wrap_future(future)
+        fetched = ""
+        try:
+            fetched = await fetch()
+        finally:
+            if self.path is None:
+                self._settle(key, future, fetched)
+            else:
+                await run_in_threadpool(self._settle, key, future, fetched)
+        return fetched
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            db = self._connection()
+            if db is not None:
+                db.execute("DELETE FROM passage_bodies")
+                db.commit()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "path": str(self.path) if self.path else None,
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "fetches": self.fetches,
+            }
+
+
+# BIBLE_PASSAGE_CACHE_PATH="" keeps the cache in memory only
+passage_cache = PassageCache(
+    max_size=settings.BIBLE_PASSAGE_CACHE_SIZE,
+    path=(
+        DEFAULT_CACHE_PATH
+        if settings.BIBLE_PASSAGE_CACHE_PATH is None
+        else settings.BIBLE_PASSAGE_CACHE_PATH or None
+    ),
+)
@@ -0,0 +1,77 @@
+# app/services/s3_store.py
+import json
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, AsyncIterator, Callable, Iterable, Iterator, List
+
+from starlette.concurrency import run_in_threadpool
+
+from app.core.config import BUCKET, s3, settings
+
+# Independent S3 reads fan out on this pool. The S3 client's connection pool
+# (S3_MAX_POOL_CONNECTIONS) is sized above it so fetches do not queue for a
+# connection.
+s3_executor = ThreadPoolExecutor(
+    max_workers=settings.S3_FETCH_WORKERS, thread_name_prefix="s3"
+)
+
+
+class S3Store:
+    """
+    Shared access to the lesson bucket: paginated listings, JSON reads and a
+    bounded fan-out for independent reads.
+    """
+
+    def __init__(self, client, bucket: str, executor: ThreadPoolExecutor = None):
+        self.client = client
+        self.bucket = bucket
+        self.executor = executor or s3_executor
+
+    def list_objects(self, prefix: str = "") -> Iterator[dict]:
+        """
+        Every object under `prefix` ({Key, ETag, Size, ...}), following
+        continuation tokens past the 1,000 keys of a single response.
+        """
+        params = {"Bucket": self.bucket, "Prefix": prefix}
+        while True:
+            resp = self.client.list_objects_v2(**params)
+            yield from resp.get("Contents", [])
+            if not resp.get("IsTruncated"):
+                return
+            params["ContinuationToken"] = resp["NextContinuationToken"]
+
+    def get_json(self, key: str) -> Any:
+        """
+        Parsed JSON object at `key`; S3 errors (botocore ClientError) and
+        JSONDecodeError propagate.
+        """
+        obj = self.client.get_object(Bucket=self.bucket, Key=key)
+        return json.loads(obj["Body"].read().decode("utf-8"))
+
+    def map(self, func: Callable, items: Iterable) -> List:
+        """
+        [func(item) for item in items], run concurrently on the S3 pool.
+        Results keep the order of `items`; the first exception is raised.
+        """
+        items = list(items)
+        if len(items) <= 1:
+            return [func(item) for item in items]
+        return list(self.executor.map(func, items))
+
+
+async def stream_body(body, chunk_size: int) -> AsyncIterator[bytes]:
+    """
+    Chunks of an S3 streaming body (get_object's "Body"), each read in the
+    threadpool, so a slow download holds no thread between chunks. The body
+    is closed when the stream ends or the client disconnects.
+    """
+    try:
+        while True:
+            chunk = await run_in_threadpool(body.read, chunk_size)
+            if not chunk:
+                return
+            yield chunk
+    finally:
+        body.close()
+
+
+s3_store = S3Store(s3, BUCKET)
@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+"""
+Recall@k and per-query latency of the approximate index types against the
+exact flat baseline, on the vectors of the current index build.
+
+    python benchmarks/ann_recall.py --k 5 --queries 200
+"""
+from pathlib import Path
+import argparse
+import sys
+import time
+
+import faiss
+import numpy as np
+
+# Add the project root to the Python path
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from app.indexing.index_builder import INDEX_FILE, VECTORS_FILE  # noqa: E402
+from app.indexing.index_builder import create_index  # noqa: E402
+from app.indexing.search_service import set_search_params  # noqa: E402
+
+NPROBE_SWEEP = (1, 4, 8, 16, 32)
+EF_SEARCH_SWEEP = (16, 32, 64, 128)
+
+
+def load_vectors() -> np.ndarray:
+    if VECTORS_FILE.exists():
+        return np.load(VECTORS_FILE)
+    # Fall back to reading the vectors back out of a flat index
+    index = faiss.read_index(str(INDEX_FILE))
+    return index.reconstruct_n(0, index.ntotal)
+
+
+def timed_search(index, queries: np.ndarray, k: int) -> tuple[np.ndarray, float]:
+    # One query at a time, as the API issues them
+    start = time.perf_counter()
+    ids = np.vstack([index.search(q[None, :], k)[1] for q in queries])
+    return ids, (time.perf_counter() - start) * 1000 / len(queries)
+
+
+def recall_at_k(found: np.ndarray, truth: np.ndarray) -> float:
+    hits = sum(len(set(f) & set(t)) for f, t in zip(found, truth))
+    return hits / truth.size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--metric", choices=("l2", "cosine"), default="l2")
+    args = parser.parse_args()
+
+    vectors = load_vectors().astype("float32")
+    rng = np.random.default_rng(args.seed)
+    held_out = rng.choice(len(vectors), size=args.queries, replace=False)
+    queries = vectors[held_out]
+    corpus = np.delete(vectors, held_out, axis=0)
+    print(
+        f"Corpus: {len(corpus)} vectors, dim {corpus.shape[1]}; "
+        f"k={args.k}, metric={args.metric}"
+    )
+    if args.metric == "cosine":
+        faiss.normalize_L2(queries)
+
+    flat = create_index(corpus, "flat", metric=args.metric)
+    truth, flat_ms = timed_search(flat, queries, args.k)
+
+    print(f"{'index':<10} {'param':<14} {'recall@k':>9} {'ms/query':>9}")
+    print(f"{'flat':<10} {'-':<14} {1.0:>9.3f} {flat_ms:>9.3f}")
+    for index_type, knob, sweep in (
+        ("ivf-flat", "nprobe", NPROBE_SWEEP),
+        ("ivf-pq", "nprobe", NPROBE_SWEEP),
+        ("hnsw", "ef_search", EF_SEARCH_SWEEP),
+    ):
+        index = create_index(corpus, index_type, metric=args.metric)
+        for value in sweep:
+            params = set_search_params(index, **{knob: value})
+            found, ms = timed_search(index, queries, args.k)
+            label = f"{knob}={params.get(knob)}"
+            print(
+                f"{index_type:<10} {label:<14} "
+                f"{recall_at_k(found, truth):>9.3f} {ms:>9.3f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+"""
+Per-call cost of Bible reference extraction on 2,000-character contexts:
+the previous find_bible_references (alternation regex rebuilt on every call)
+against the matcher compiled once at import.
+
+    python benchmarks/bible_references.py --contexts 200 --rounds 5
+"""
+from pathlib import Path
+import argparse
+import re
+import sys
+import time
+
+# Add the project root to the Python path
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from app.core.prompt_builder import SPANISH_BOOK_MAP  # noqa: E402
+from app.core.prompt_builder import find_bible_references  # noqa: E402
+from app.indexing.metadata_store import MetadataStore  # noqa: E402
+from app.indexing.search_service import METADATA_FILE  # noqa: E402
+
+CONTEXT_CHARS = 2000
+
+
+def rebuilt_find_bible_references(text: str) -> list[str]:
+    # The implementation before the matcher was precompiled
+    book_names = sorted(SPANISH_BOOK_MAP.keys(), key=len, reverse=True)
+    escaped_books = [re.escape(book) for book in book_names]
+    pattern_books = "|".join(escaped_books)
+    pattern = rf"(?:(?<=^)|(?<=[\s(]))(?:{pattern_books})\s*\d+:\d+(?:-\d+)?(?:(?:,\s*\d+(?:-\d+)?))*\b"
+    return re.findall(pattern, text)
+
+
+def load_contexts(count: int) -> list[str]:
+    # Consecutive chunks of the indexed corpus, cut into 2,000-char windows
+    texts = [t for t in MetadataStore(METADATA_FILE).text_column("text") if t]
+    corpus = " ".join(texts)
+    step = max(CONTEXT_CHARS, (len(corpus) - CONTEXT_CHARS) // count)
+    return [corpus[i : i + CONTEXT_CHARS] for i in range(0, step * count, step)]
+
+
+def per_call_us(find, contexts: list[str], rounds: int) -> float:
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for context in contexts:
+            find(context)
+    return (time.perf_counter() - start) * 1e6 / (rounds * len(contexts))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--contexts", type=int, default=200)
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+
+    contexts = load_contexts(args.contexts)
+    mismatches = sum(
+        rebuilt_find_bible_references(c) != find_bible_references(c) for c in contexts
+    )
+    references = sum(len(find_bible_references(c)) for c in contexts)
+    print(
+        f"{len(contexts)} contexts of {CONTEXT_CHARS} chars, {references} references"
+        f" ({mismatches} contexts with differing matches)"
+    )
+
+    before = per_call_us(rebuilt_find_bible_references, contexts, args.rounds)
+    after = per_call_us(find_bible_references, contexts, args.rounds)
+    print(f"{'matcher':>12} {'us/call':>10}")
+    print(f"{'rebuilt':>12} {before:>10.1f}")
+    print(f"{'precompiled':>12} {after:>10.1f}")
+    print(f"Speed-up: {before / after:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
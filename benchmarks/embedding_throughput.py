@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+"""
+Query embedding throughput at 1, 8 and 64 concurrent clients, with the
+micro-batcher disabled (one model.encode per query) and enabled.
+
+    python benchmarks/embedding_throughput.py --requests 512 --window-ms 5
+"""
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+import argparse
+import sys
+import time
+
+# Add the project root to the Python path
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from app.indexing.embeddings import EmbeddingBatcher, embed_text  # noqa: E402
+
+QUESTIONS = [
+    "¿Qué significa la justificación por la fe?",
+    "¿Cuál es el propósito del santuario?",
+    "¿Cómo puedo tener paz en medio de la prueba?",
+    "¿Qué enseña Daniel 7 sobre el juicio?",
+    "¿Por qué es importante el sábado?",
+]
+
+
+def run(embed, clients: int, requests: int) -> float:
+    # Unique texts so no two requests could be served from a cache
+    texts = [f"{QUESTIONS[i % len(QUESTIONS)]} #{i}" for i in range(requests)]
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as pool:
+        list(pool.map(embed, texts))
+    return requests / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=512)
+    parser.add_argument("--window-ms", type=float, default=5)
+    parser.add_argument("--max-batch-size", type=int, default=32)
+    args = parser.parse_args()
+
+    embed_text("warm-up")
+    batcher = EmbeddingBatcher(args.window_ms, args.max_batch_size)
+
+    print(f"{'clients':>8} {'unbatched req/s':>16} {'batched req/s':>14}")
+    for clients in (1, 8, 64):
+        unbatched = run(embed_text, clients, args.requests)
+        batched = run(batcher.embed, clients, args.requests)
+        print(f"{clients:>8} {unbatched:>16.1f} {batched:>14.1f}")
+    print(f"Batcher stats: {batcher.stats()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,11 @@
 # tests/conftest.py
+import asyncio
+import json
+from collections import Counter
+from types import SimpleNamespace
+import boto3
 import pytest
+from moto import mock_aws
 from app.core.security import get_current_user, TokenData
 from fastapi.testclient import TestClient
 from app.main import app
@@ -12,6 +18,27 @@ def client():
     return TestClient(app)
 
 
+@pytest.fixture(autouse=True)
+def clear_answer_cache():
+    # Cached LLM answers must not leak from one test into another
+    from app.services.llm_service import answer_cache
+
+    answer_cache.clear()
+
+
+@pytest.fixture(autouse=True)
+def unthrottled_llm_gateway(monkeypatch):
+    # The shared gateway's rate limit and circuit breaker would otherwise carry
+    # state from one test into the next; tests of those build their own gateway
+    from app.services.llm_gateway import CircuitBreaker, TokenBucket
+    from app.services.llm_service import gateway
+
+    monkeypatch.setattr(gateway, "bucket", TokenBucket(rate=0, burst=1))
+    monkeypatch.setattr(
+        gateway, "breaker", CircuitBreaker(failure_threshold=0, reset_seconds=1)
+    )
+
+
 def override_get_current_user():
     return TokenData(sub="testuser", roles=["user"])
 
@@ -20,3 +47,77 @@ app.dependency_overrides[get_current_user] = override_get_current_user
 # Bypass JWT signing in tests
 security.create_access_token = lambda data: "testtoken"
 auth_module.create_access_token = lambda data: "testtoken"
+
+
+class FakeStreamingModel:
+    """
+    Local stand-in for the Gemini model. Returns `answer` whole, or with
+    stream=True as `chunk_size`-character chunks `delay` seconds apart.
+    """
+
+    def __init__(self, answer="La fe es confiar en Dios.", chunk_size=5, delay=0.0):
+        self.answer = answer
+        self.chunk_size = chunk_size
+        self.delay = delay
+        self.prompts = []
+
+    def generate_content(self, prompt, stream=False):
+        self.prompts.append(prompt)
+        return SimpleNamespace(text=self.answer)
+
+    async def generate_content_async(self, prompt, stream=False):
+        self.prompts.append(prompt)
+        if not stream:
+            return SimpleNamespace(text=self.answer)
+        return self._chunks()
+
+    async def _chunks(self):
+        for start in range(0, len(self.answer), self.chunk_size):
+            if self.delay:
+                await asyncio.sleep(self.delay)
+            yield SimpleNamespace(text=self.answer[start : start + self.chunk_size])
+
+
+@pytest.fixture
+def fake_llm(monkeypatch):
+    fake = FakeStreamingModel()
+    monkeypatch.setattr("app.services.llm_service.gateway.backend", fake)
+    return fake
+
+
+# Bucket created by the s3_client fixture
+S3_TEST_BUCKET = "lesson-test-bucket"
+
+
+class CountingClient:
+    """
+    Wraps an S3 client and counts the calls made through it (`calls`), with
+    get_object calls also split into full and conditional GETs (`gets`).
+    """
+
+    def __init__(self, client):
+        self.client = client
+        self.calls = Counter()
+        self.gets = Counter()
+
+    def get_object(self, **params):
+        self.calls["get_object"] += 1
+        self.gets["conditional" if "IfNoneMatch" in params else "full"] += 1
+        return self.client.get_object(**params)
+
+    def __getattr__(self, name):
+        self.calls[name] += 1
+        return getattr(self.client, name)
+
+
+def put_json(client, key, data, bucket=S3_TEST_BUCKET):
+    client.put_object(Bucket=bucket, Key=key, Body=json.dumps(data).encode("utf-8"))
+
+
+@pytest.fixture
+def s3_client():
+    # An empty moto bucket; test modules seed it by overriding this fixture
+    with mock_aws():
+        client = boto3.client("s3", region_name="us-east-1")
+        client.create_bucket(Bucket=S3_TEST_BUCKET)
+        yield CountingClient(client)
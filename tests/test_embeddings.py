@@ -0,0 +1,147 @@
+import asyncio
+import threading
+
+import numpy as np
+import pytest
+
+import app.indexing.embeddings as embeddings
+from app.indexing.embeddings import (
+    EmbeddingBatcher,
+    EmbeddingCache,
+    embed_query,
+    embed_query_async,
+    normalize_query,
+)
+
+
+@pytest.fixture
+def fake_encoder(monkeypatch):
+    # Count model calls instead of running the SentenceTransformer
+    calls = []
+
+    def fake_embed_text(text):
+        calls.append(text)
+        return [float(len(text)), 1.0, 2.0]
+
+    monkeypatch.setattr(embeddings, "embed_text", fake_embed_text)
+    monkeypatch.setattr(
+        embeddings, "query_cache", EmbeddingCache(max_size=2, ttl_seconds=0)
+    )
+    monkeypatch.setattr(embeddings, "query_batcher", None)
+    return calls
+
+
+def test_normalize_query_ignores_case_and_spacing():
+    assert normalize_query("  ¿Qué es  la FE?\n") == "¿qué es la fe?"
+
+
+def test_embed_query_reuses_cached_vector(fake_encoder):
+    first = embed_query("¿Qué es la fe?")
+    second = embed_query("  ¿qué es la   fe? ")
+    assert len(fake_encoder) == 1
+    assert first is second
+    assert first.dtype == np.float32
+    stats = embeddings.query_cache.stats()
+    assert stats["hits"] == 1 and stats["misses"] == 1
+
+
+def test_cache_evicts_least_recently_used(fake_encoder):
+    embed_query("uno")
+    embed_query("dos")
+    embed_query("uno")
+    embed_query("tres")  # evicts "dos"
+    embed_query("dos")
+    assert fake_encoder == ["uno", "dos", "tres", "dos"]
+    assert embeddings.query_cache.stats()["evictions"] == 2
+
+
+def test_cache_entries_expire_after_ttl(monkeypatch):
+    cache = EmbeddingCache(max_size=4, ttl_seconds=10)
+    now = [100.0]
+    monkeypatch.setattr(embeddings.time, "monotonic", lambda: now[0])
+    cache.put("fe", np.zeros(3, dtype="float32"))
+    assert cache.get("fe") is not None
+    now[0] += 11
+    assert cache.get("fe") is None
+    assert cache.stats()["evictions"] == 1
+
+
+def test_batcher_coalesces_concurrent_queries(monkeypatch):
+    batches = []
+
+    def fake_embed_texts(texts, batch_size=64):
+        batches.append(list(texts))
+        return np.array([[float(len(t)), 0.0] for t in texts], dtype="float32")
+
+    monkeypatch.setattr(embeddings, "embed_texts", fake_embed_texts)
+    batcher = EmbeddingBatcher(window_ms=200, max_batch_size=8)
+    queries = [f"pregunta {i}" for i in range(8)]
+    results = {}
+
+    def worker(q):
+        results[q] = batcher.embed(q)
+
+    threads = [threading.Thread(target=worker, args=(q,)) for q in queries]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert len(batches) < len(queries)
+    assert sum(len(b) for b in batches) == len(queries)
+    assert all(results[q][0] == len(q) for q in queries)
+    assert batcher.stats()["texts"] == len(queries)
+
+
+def test_batcher_survives_cancelled_waiters(monkeypatch):
+    release = threading.Event()
+
+    def fake_embed_texts(texts, batch_size=64):
+        # The first batch holds the worker so the next callers queue up
+        if "first" in texts:
+            release.wait(5)
+        return np.array([[float(len(t)), 0.0] for t in texts], dtype="float32")
+
+    monkeypatch.setattr(embeddings, "embed_texts", fake_embed_texts)
+    batcher = EmbeddingBatcher(window_ms=50, max_batch_size=8)
+    first = batcher.submit("first")
+    cancelled = batcher.submit("cancelled")
+    survivor = batcher.submit("survivor")
+    assert cancelled.cancel()
+    release.set()
+
+    assert first.result(timeout=2)[0] == len("first")
+    assert survivor.result(timeout=2)[0] == len("survivor")
+    assert batcher.submit("later").result(timeout=2)[0] == len("later")
+
+
+def test_cancelled_async_query_does_not_stall_others(monkeypatch):
+    release = threading.Event()
+
+    def fake_embed_texts(texts, batch_size=64):
+        if "first" in texts:
+            release.wait(5)
+        return np.array([[float(len(t)), 0.0] for t in texts], dtype="float32")
+
+    monkeypatch.setattr(embeddings, "embed_texts", fake_embed_texts)
+    monkeypatch.setattr(
+        embeddings, "query_cache", EmbeddingCache(max_size=8, ttl_seconds=0)
+    )
+    monkeypatch.setattr(
+        embeddings, "query_batcher", EmbeddingBatcher(window_ms=50, max_batch_size=8)
+    )
+
+    async def run():
+        first = asyncio.create_task(embed_query_async("first"))
+        await asyncio.sleep(0.05)
+        # Queued behind the first batch; one client disconnects
+        dropped = asyncio.create_task(embed_query_async("dropped"))
+        survivor = asyncio.create_task(embed_query_async("survivor"))
+        await asyncio.sleep(0.01)
+        dropped.cancel()
+        release.set()
+        return await asyncio.wait_for(asyncio.gather(first, survivor), 2)
+
+    first, survivor = asyncio.run(run())
+    assert first[0] == len("first")
+    assert survivor[0] == len("survivor")
@@ -0,0 +1,140 @@
+import json
+from datetime import datetime, timezone
+
+import boto3
+import pytest
+from fastapi.testclient import TestClient
+from moto import mock_aws
+
+from app.api.v1 import routes
+from app.core.http_cache import byte_range, cache_headers, not_modified
+from app.main import app
+from app.services.lesson_cache import LessonObjectCache
+from app.services.lesson_catalog import LessonCatalog
+from app.services.s3_store import S3Store
+
+BUCKET = "http-cache-test-bucket"
+PDF = bytes(range(256)) * 4
+LESSON_URL = "/api/v1/lessons/2025/Q2/lesson-8"
+
+
+@pytest.fixture
+def client(monkeypatch):
+    with mock_aws():
+        s3 = boto3.client("s3", region_name="us-east-1")
+        s3.create_bucket(Bucket=BUCKET)
+        s3.put_object(
+            Bucket=BUCKET,
+            Key="2025/Q2/lesson-8/lesson.json",
+            Body=json.dumps({"days": []}).encode("utf-8"),
+        )
+        s3.put_object(Bucket=BUCKET, Key="2025/Q2/lesson-8/lesson-8.pdf", Body=PDF)
+        monkeypatch.setattr(routes, "s3", s3)
+        monkeypatch.setattr(routes, "BUCKET", BUCKET)
+        monkeypatch.setattr(
+            routes,
+            "lesson_cache",
+            LessonObjectCache(
+                S3Store(s3, BUCKET), max_bytes=1024 * 1024, ttl_seconds=60
+            ),
+        )
+        monkeypatch.setattr(
+            routes,
+            "lesson_catalog",
+            LessonCatalog(S3Store(s3, BUCKET), ttl_seconds=60),
+        )
+        yield TestClient(app)
+
+
+def test_validators():
+    modified = datetime(2025, 4, 1, 12, 0, 0, 500000, tzinfo=timezone.utc)
+    headers = cache_headers('"abc"', modified, "public, max-age=60")
+    assert headers["Last-Modified"] == "Tue, 01 Apr 2025 12:00:00 GMT"
+
+    assert not_modified('"abc"', modified, if_none_match='"x", W/"abc"')
+    assert not_modified('"abc"', modified, if_none_match="*")
+    assert not not_modified('"abc"', modified, if_none_match='"x"')
+    # If-None-Match wins over If-Modified-Since
+    assert not not_modified('"abc"', modified, '"x"', "Tue, 01 Apr 2025 12:00:00 GMT")
+    assert not_modified('"abc"', modified, None, "Tue, 01 Apr 2025 12:00:00 GMT")
+    assert not not_modified('"abc"', modified, None, "Tue, 01 Apr 2025 11:59:59 GMT")
+    assert not not_modified('"abc"', modified, None, "yesterday")
+
+    assert byte_range("bytes=0-99") == "bytes=0-99"
+    assert byte_range("bytes=-500") == "bytes=-500"
+    assert byte_range("bytes=0-1,5-9") is None
+    assert byte_range("items=0-1") is None
+
+
+def test_lesson_json_carries_validators_and_answers_304(client):
+    response = client.get(LESSON_URL)
+    assert response.status_code == 200
+    assert response.json() == {"days": []}
+    etag = response.headers["etag"]
+    assert response.headers["cache-control"].startswith("public")
+
+    again = client.get(LESSON_URL, headers={"If-None-Match": etag})
+    assert again.status_code == 304
+    assert again.content == b""
+    assert again.headers["etag"] == etag
+
+    since = client.get(
+        LESSON_URL,
+        headers={"If-Modified-Since": response.headers["last-modified"]},
+    )
+    assert since.status_code == 304
+
+
+def test_pdf_supports_conditional_and_range_requests(client):
+    url = f"{LESSON_URL}/pdf"
+    response = client.get(url)
+    assert response.status_code == 200
+    assert response.content == PDF
+    assert response.headers["accept-ranges"] == "bytes"
+    etag = response.headers["etag"]
+
+    assert client.get(url, headers={"If-None-Match": etag}).status_code == 304
+    assert client.get(url, headers={"If-None-Match": f"W/{etag}"}).status_code == 304
+
+    partial = client.get(url, headers={"Range": "bytes=10-19"})
+    assert partial.status_code == 206
+    assert partial.content == PDF[10:20]
+    assert partial.headers["content-range"] == f"bytes 10-19/{len(PDF)}"
+
+    unsatisfiable = client.get(url, headers={"Range": "bytes=5000-"})
+    assert unsatisfiable.status_code == 416
+    assert unsatisfiable.headers["content-range"] == f"bytes */{len(PDF)}"
+
+
+def test_pdf_delivery_modes(client, monkeypatch):
+    monkeypatch.setattr(routes.settings, "LESSON_PDF_CHUNK_SIZE", 100)
+    url = f"{LESSON_URL}/pdf"
+    # Proxy streaming in small chunks still returns the whole file
+    assert client.get(url, params={"delivery": "proxy"}).content == PDF
+
+    redirect = client.get(url, params={"delivery": "redirect"}, follow_redirects=False)
+    assert redirect.status_code == 307
+    assert "lesson-8.pdf" in redirect.headers["location"]
+    assert redirect.headers["cache-control"] == "no-store"
+
+    monkeypatch.setattr(routes.settings, "LESSON_PDF_DELIVERY", "url")
+    body = client.get(url).json()
+    assert "X-Amz-Expires" in body["url"] or "Expires" in body["url"]
+    assert body["expires_in"] == routes.settings.LESSON_PDF_URL_EXPIRY_SECONDS
+
+    missing = client.get("/api/v1/lessons/2025/Q2/lesson-9/pdf")
+    assert missing.status_code == 404
+
+
+def test_pdf_missing_from_a_stale_catalog_is_still_delivered(client):
+    # The catalog is listed before the PDF exists, as on a worker that did
+    # not serve the import
+    assert not routes.lesson_catalog.has_object("2025/Q2/lesson-9/lesson-9.pdf")
+    routes.s3.put_object(
+        Bucket=BUCKET, Key="2025/Q2/lesson-9/lesson-9.pdf", Body=b"%PDF-1.4"
+    )
+    url = "/api/v1/lessons/2025/Q2/lesson-9/pdf"
+    response = client.get(url, params={"delivery": "url"})
+    assert response.status_code == 200
+    assert "lesson-9.pdf" in response.json()["url"]
+    assert client.get("/api/v1/lessons/2025/Q2/lesson-7/pdf").status_code == 404
@@ -0,0 +1,86 @@
+import json
+
+import botocore
+import pytest
+
+from app.services.lesson_cache import LessonObjectCache
+from app.services.s3_store import S3Store
+from tests.conftest import S3_TEST_BUCKET as BUCKET, put_json
+
+LESSON_KEY = "2025/Q2/lesson-8/lesson.json"
+METADATA_KEY = "2025/Q2/lesson-8/metadata.json"
+
+
+@pytest.fixture
+def s3_client(s3_client):
+    put_json(s3_client.client, LESSON_KEY, {"days": [{"day": "sábado"}]})
+    put_json(s3_client.client, METADATA_KEY, {"title": "Lección 8"})
+    return s3_client
+
+
+def make_cache(client, **overrides):
+    options = dict(max_bytes=1024 * 1024, ttl_seconds=60)
+    options.update(overrides)
+    return LessonObjectCache(S3Store(client, BUCKET), **options)
+
+
+def test_serves_documents_from_memory_and_invalidates_on_import(s3_client):
+    cache = make_cache(s3_client)
+    for _ in range(3):
+        assert cache.get_json(LESSON_KEY) == {"days": [{"day": "sábado"}]}
+        assert cache.get_json(METADATA_KEY) == {"title": "Lección 8"}
+    assert s3_client.gets == {"full": 2}
+
+    put_json(s3_client.client, LESSON_KEY, {"days": []})
+    cache.invalidate("2025/Q2/lesson-8/")
+    assert cache.get_json(LESSON_KEY) == {"days": []}
+    assert s3_client.gets == {"full": 3}
+    assert cache.stats()["hits"] == 4
+
+    with pytest.raises(botocore.exceptions.ClientError):
+        cache.get_json("2025/Q2/lesson-9/lesson.json")
+
+
+def test_revalidates_with_conditional_get_after_ttl(s3_client):
+    cache = make_cache(s3_client, ttl_seconds=0)
+    cache.get_json(LESSON_KEY)
+    assert cache.get_json(LESSON_KEY) == {"days": [{"day": "sábado"}]}
+    assert s3_client.gets == {"full": 1, "conditional": 1}
+    assert cache.stats()["revalidations"] == 1
+
+    # Changed elsewhere (e.g. imported through another worker)
+    put_json(s3_client.client, LESSON_KEY, {"days": []})
+    assert cache.get_json(LESSON_KEY) == {"days": []}
+    assert cache.stats()["misses"] == 2
+
+
+def test_evicts_least_recently_used_past_max_bytes(s3_client):
+    lesson_size = len(json.dumps({"days": [{"day": "sábado"}]}).encode("utf-8"))
+    cache = make_cache(s3_client, max_bytes=lesson_size + 5)
+    cache.get_json(LESSON_KEY)
+    cache.get_json(METADATA_KEY)
+    stats = cache.stats()
+    assert stats["entries"] == 1
+    assert stats["bytes"] <= stats["max_bytes"]
+
+    cache.get_json(METADATA_KEY)
+    cache.get_json(LESSON_KEY)
+    assert s3_client.gets == {"full": 3}
+
+
+def test_fetch_racing_an_invalidation_is_not_cached(s3_client):
+    cache = make_cache(s3_client)
+    get_object = s3_client.client.get_object
+
+    def get_then_import(**params):
+        # An import lands between this GET and the cache storing its result
+        obj = get_object(**params)
+        put_json(s3_client.client, LESSON_KEY, {"days": []})
+        cache.invalidate("2025/Q2/lesson-8/")
+        return obj
+
+    s3_client.client.get_object = get_then_import
+    assert cache.get_json(LESSON_KEY) == {"days": [{"day": "sábado"}]}
+    s3_client.client.get_object = get_object
+    assert cache.get_json(LESSON_KEY) == {"days": []}
+    assert s3_client.gets == {"full": 2}
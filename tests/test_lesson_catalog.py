@@ -0,0 +1,75 @@
+import pytest
+
+from app.services.lesson_catalog import LessonCatalog
+from app.services.s3_store import S3Store
+from tests.conftest import S3_TEST_BUCKET as BUCKET, put_json
+
+
+@pytest.fixture
+def s3_client(s3_client):
+    client = s3_client.client
+    put_json(client, "2025/Q2/metadata.json", {"slug": "q2-2025", "title": "Q2"})
+    put_json(client, "2024/Q1/metadata.json", {"slug": "q1-2024", "title": "Q1"})
+    client.put_object(Bucket=BUCKET, Key="covers/q2-2025-cover.png", Body=b"png")
+    for year, quarter, lesson_id in [
+        ("2025", "Q2", "lesson-9"),
+        ("2025", "Q2", "lesson-8"),
+        ("2024", "Q1", "lesson-1"),
+    ]:
+        prefix = f"{year}/{quarter}/{lesson_id}"
+        put_json(client, f"{prefix}/metadata.json", {"title": lesson_id})
+        put_json(client, f"{prefix}/lesson.json", {"days": []})
+    # A lesson folder without metadata.json is left out
+    put_json(client, "2025/Q2/lesson-10/lesson.json", {"days": []})
+    return s3_client
+
+
+def test_catalog_lists_quarters_and_lessons(s3_client):
+    catalog = LessonCatalog(S3Store(s3_client, BUCKET), ttl_seconds=60)
+
+    quarters = catalog.quarters()
+    assert [(q["year"], q["slug"]) for q in quarters] == [
+        ("2024", "Q1"),
+        ("2025", "Q2"),
+    ]
+    assert quarters[0]["cover_url"] is None
+    assert "covers/q2-2025-cover.png" in quarters[1]["cover_url"]
+
+    assert [l["lesson_id"] for l in catalog.lessons()] == [
+        "lesson-1",
+        "lesson-8",
+        "lesson-9",
+    ]
+    assert [l["lesson_id"] for l in catalog.lessons(year="2025")] == [
+        "lesson-8",
+        "lesson-9",
+    ]
+    assert catalog.lessons(quarter="Q1")[0]["metadata"] == {"title": "lesson-1"}
+    assert catalog.lessons(year="2025", quarter="Q1") == []
+
+
+def test_catalog_serves_from_memory_and_revalidates_by_etag(s3_client):
+    catalog = LessonCatalog(S3Store(s3_client, BUCKET), ttl_seconds=60)
+    catalog.lessons()
+    assert s3_client.calls["get_object"] == 5
+    s3_client.calls.clear()
+
+    # Within the TTL nothing goes to S3
+    catalog.quarters()
+    catalog.lessons(year="2024")
+    assert s3_client.calls["list_objects_v2"] == 0
+    assert s3_client.calls["get_object"] == 0
+
+    # After an import only new or changed metadata.json files are downloaded
+    put_json(s3_client.client, "2025/Q2/lesson-8/metadata.json", {"title": "new"})
+    put_json(s3_client.client, "2025/Q2/lesson-10/metadata.json", {"title": "10"})
+    catalog.invalidate()
+    lessons = {l["lesson_id"]: l["metadata"] for l in catalog.lessons(year="2025")}
+    assert lessons == {
+        "lesson-10": {"title": "10"},
+        "lesson-8": {"title": "new"},
+        "lesson-9": {"title": "lesson-9"},
+    }
+    assert s3_client.calls["list_objects_v2"] == 1
+    assert s3_client.calls["get_object"] == 2
+    assert catalog.stats()["refreshes"] == 2
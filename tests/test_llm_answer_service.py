@@ -1,3 +1,4 @@
+import json
 import pytest
 from fastapi.testclient import TestClient
 from app.main import app
@@ -66,3 +67,95 @@ def test_llm_answer_no_relevant_context():
         )
         # 404 if no context; 200 if fallback applies
         assert response.status_code in [404, 200]
+
+
+def parse_sse(body: str) -> list:
+    events = []
+    for block in body.strip().split("\n\n"):
+        fields = dict(line.split(": ", 1) for line in block.splitlines())
+        events.append((fields["event"], json.loads(fields["data"])))
+    return events
+
+
+def test_llm_answer_stream_sends_refs_then_tokens(fake_llm):
+    with TestClient(app) as client:
+        response = client.post(
+            "/api/v1/llm/answer",
+            json={
+                "question": "¿Qué significa la fe?",
+                "top_k": 3,
+                "lang": "es",
+                "mode": "explain",
+                "stream": True,
+            },
+        )
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/event-stream")
+        events = parse_sse(response.text)
+
+    name, refs = events[0]
+    assert name == "refs"
+    assert refs["context_used"] == 3
+    assert "rag_refs" in refs and "other_refs" in refs
+    tokens = [data["text"] for name, data in events if name == "token"]
+    assert len(tokens) > 1
+    assert "".join(tokens) == fake_llm.answer
+    assert events[-1] == ("done", {})
+
+
+def test_prompt_stream_sends_tokens(fake_llm):
+    with TestClient(app) as client:
+        response = client.post(
+            "/api/v1/prompt", json={"prompt": "Explica Juan 3:16", "stream": True}
+        )
+        assert response.status_code == 200
+        events = parse_sse(response.text)
+
+    tokens = [data["text"] for name, data in events if name == "token"]
+    assert "".join(tokens) == fake_llm.answer
+    assert events[-1] == ("done", {"lang": "es"})
+
+
+def test_prompt_answers_in_the_requested_language(fake_llm):
+    with TestClient(app) as client:
+        for stream in (False, True):
+            response = client.post(
+                "/api/v1/prompt",
+                json={"prompt": "Explain John 3:16", "lang": "en", "stream": stream},
+            )
+            assert response.status_code == 200
+
+    assert len(fake_llm.prompts) == 2
+    assert all(p.endswith("responde en en.") for p in fake_llm.prompts)
+
+
+def test_prompt_stream_reports_model_errors(fake_llm, monkeypatch):
+    async def failing_generate(prompt, stream=False):
+        raise RuntimeError("Gemini is down")
+
+    monkeypatch.setattr(fake_llm, "generate_content_async", failing_generate)
+    with TestClient(app) as client:
+        response = client.post(
+            "/api/v1/prompt", json={"prompt": "Hola", "stream": True}
+        )
+        assert response.status_code == 200
+        assert parse_sse(response.text)[-1][0] == "error"
+
+
+def test_llm_answer_reports_model_errors(monkeypatch):
+    from app.api.v1 import routes
+
+    async def fake_search(question, top_k=1):
+        return [{"type": "lesson-section", "text": "La fe es la certeza."}]
+
+    async def failing_llm(question, mode, context_text, lang):
+        return "[Error with Gemini SDK: quota]"
+
+    monkeypatch.setattr(routes, "search_lessons_async", fake_search)
+    monkeypatch.setattr(routes, "generate_llm_response_async", failing_llm)
+    with TestClient(app) as client:
+        response = client.post(
+            "/api/v1/llm/answer", json={"question": "¿Qué es la fe?", "lang": "es"}
+        )
+    assert response.status_code == 502
+    assert "quota" in response.json()["detail"]
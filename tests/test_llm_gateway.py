@@ -0,0 +1,148 @@
+import asyncio
+import time
+from types import SimpleNamespace
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.services.llm_gateway import (
+    CircuitBreaker,
+    LLMGateway,
+    LLMTimeoutError,
+    LLMUnavailableError,
+    TokenBucket,
+)
+
+
+class Throttled(Exception):
+    # Shaped like google.api_core.exceptions.ResourceExhausted
+    code = 429
+
+
+class FlakyBackend:
+    """
+    Fails its first `failures` calls with `error`, then answers after `delay`
+    seconds, recording how many calls were in flight at once.
+    """
+
+    def __init__(self, failures=0, error=Throttled("quota"), delay=0.0):
+        self.failures = failures
+        self.error = error
+        self.delay = delay
+        self.calls = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    def generate_content(self, prompt):
+        self.calls += 1
+        if self.calls <= self.failures:
+            raise self.error
+        return SimpleNamespace(text="Amén.")
+
+    async def generate_content_async(self, prompt, stream=False):
+        self.calls += 1
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(self.delay)
+            if self.calls <= self.failures:
+                raise self.error
+            return SimpleNamespace(text="Amén.")
+        finally:
+            self.in_flight -= 1
+
+
+def make_gateway(backend, **overrides):
+    options = dict(
+        max_concurrency=8,
+        rate_per_second=0,
+        burst=1,
+        max_retries=3,
+        backoff_base=0.001,
+        backoff_max=0.01,
+        timeout_seconds=2.0,
+        breaker=CircuitBreaker(failure_threshold=0, reset_seconds=1.0),
+    )
+    options.update(overrides)
+    return LLMGateway(backend, **options)
+
+
+def test_retries_throttled_calls_with_backoff():
+    backend = FlakyBackend(failures=2)
+    gateway = make_gateway(backend)
+    assert gateway.generate("hola").text == "Amén."
+    assert asyncio.run(gateway.generate_async("hola")).text == "Amén."
+    assert backend.calls == 4
+    assert gateway.stats()["retries"] == 2
+
+
+def test_gives_up_after_max_retries_and_passes_other_errors_through():
+    gateway = make_gateway(FlakyBackend(failures=10), max_retries=2)
+    with pytest.raises(LLMUnavailableError):
+        gateway.generate("hola")
+
+    backend = FlakyBackend(failures=1, error=ValueError("bad request"))
+    with pytest.raises(ValueError):
+        make_gateway(backend).generate("hola")
+    assert backend.calls == 1
+
+
+def test_deadline_cancels_slow_calls():
+    gateway = make_gateway(FlakyBackend(delay=1.0), timeout_seconds=0.1)
+    start = time.perf_counter()
+    with pytest.raises(LLMTimeoutError):
+        asyncio.run(gateway.generate_async("hola"))
+    assert time.perf_counter() - start < 0.5
+
+
+def test_concurrency_is_capped():
+    backend = FlakyBackend(delay=0.05)
+    gateway = make_gateway(backend, max_concurrency=3)
+
+    async def run_all():
+        return await asyncio.gather(*(gateway.generate_async("hola") for _ in range(9)))
+
+    assert len(asyncio.run(run_all())) == 9
+    assert backend.max_in_flight == 3
+
+
+def test_token_bucket_spreads_calls_and_rejects_past_the_deadline():
+    bucket = TokenBucket(rate=10, burst=2)
+    assert bucket.reserve(max_wait=0) == 0
+    assert bucket.reserve(max_wait=0) == 0
+    assert bucket.reserve(max_wait=0) is None
+    assert bucket.reserve(max_wait=1) == pytest.approx(0.1, abs=0.02)
+
+
+def test_circuit_breaker_fails_fast_then_lets_a_trial_through():
+    backend = FlakyBackend(failures=2)
+    breaker = CircuitBreaker(failure_threshold=2, reset_seconds=0.1)
+    gateway = make_gateway(backend, max_retries=0, breaker=breaker)
+
+    for _ in range(2):
+        with pytest.raises(LLMUnavailableError):
+            gateway.generate("hola")
+    assert breaker.state == "open"
+    with pytest.raises(LLMUnavailableError, match="circuit breaker"):
+        gateway.generate("hola")
+    assert backend.calls == 2
+
+    time.sleep(0.15)
+    assert gateway.generate("hola").text == "Amén."
+    assert breaker.state == "closed"
+
+
+def test_prompt_returns_503_with_retry_after_when_circuit_is_open(
+    fake_llm, monkeypatch
+):
+    from app.services import llm_service
+
+    breaker = CircuitBreaker(failure_threshold=1, reset_seconds=30)
+    breaker.record_failure()
+    monkeypatch.setattr(llm_service.gateway, "breaker", breaker)
+    with TestClient(app) as client:
+        response = client.post("/api/v1/prompt", json={"prompt": "Hola"})
+    assert response.status_code == 503
+    assert int(response.headers["Retry-After"]) >= 1
+    assert fake_llm.prompts == []
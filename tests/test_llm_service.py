@@ -1,6 +1,14 @@
+import asyncio
+import time
+import numpy as np
 import pytest
-from unittest.mock import patch, MagicMock
-from app.services.llm_service import generate_llm_response
+from unittest.mock import patch, MagicMock, AsyncMock
+from app.services.llm_service import (
+    AnswerCache,
+    answer_cache,
+    generate_llm_response,
+    generate_llm_response_async,
+)
 from app.core.prompt_builder import build_prompt
 
 
@@ -64,3 +72,279 @@ def test_generate_llm_response_empty_input(mock_generate):
     # Empty input triggers the guard-clause error
     expected = "[error: empty or invalid input provided to llm]"
     assert answer.lower().startswith(expected)
+
+
+# --- TEST generate_llm_response_async ---
+@patch("app.services.llm_service.model.generate_content_async", new_callable=AsyncMock)
+def test_generate_llm_response_async_valid(mock_generate):
+    mock_generate.return_value = MagicMock(text="Jesus died for our sins.")
+    result = asyncio.run(generate_llm_response_async("Isaiah 53:5", "explain", "en"))
+    assert isinstance(result, dict)
+    assert "Jesus" in result["answer"]
+
+
+@patch("app.services.llm_service.model.generate_content_async")
+def test_generate_llm_response_async_calls_overlap(mock_generate):
+    # Slow model calls must not serialize: 20 in flight take about one call
+    async def slow_generate(prompt):
+        await asyncio.sleep(0.2)
+        return MagicMock(text="Amén.")
+
+    mock_generate.side_effect = slow_generate
+
+    async def run_all():
+        return await asyncio.gather(
+            *(
+                generate_llm_response_async("¿Qué es la fe?", "ask", "", "es")
+                for _ in range(20)
+            )
+        )
+
+    start = time.perf_counter()
+    results = asyncio.run(run_all())
+    assert all(r["answer"] == "Amén." for r in results)
+    assert time.perf_counter() - start < 1.0
+
+
+# --- TEST answer cache ---
+@pytest.fixture
+def question_vectors(monkeypatch):
+    # Paraphrases of one question share a direction; other questions do not
+    vectors = {
+        "¿Qué es la fe?": np.array([1.0, 0.0, 0.0]),
+        "¿Qué significa la fe?": np.array([0.99, 0.05, 0.0]),
+        "¿Qué es el sábado?": np.array([0.0, 1.0, 0.0]),
+    }
+    monkeypatch.setattr(
+        "app.services.llm_service.embed_query", lambda text: vectors[text]
+    )
+    return vectors
+
+
+@patch("app.services.llm_service.model.generate_content")
+def test_answer_cache_reuses_similar_question(mock_generate, question_vectors):
+    mock_generate.return_value = MagicMock(text="Fe es confiar en Dios.")
+    first = generate_llm_response("¿Qué es la fe?", "explain", "Hebreos 11", "es")
+    second = generate_llm_response(
+        "¿Qué significa la fe?", "explain", "Hebreos 11", "es"
+    )
+    assert second == first
+    assert mock_generate.call_count == 1
+    assert answer_cache.stats()["hits"] == 1
+
+    # A different question, context, mode or language goes to the model
+    generate_llm_response("¿Qué es el sábado?", "explain", "Hebreos 11", "es")
+    generate_llm_response("¿Qué es la fe?", "explain", "Romanos 4", "es")
+    generate_llm_response("¿Qué es la fe?", "reflect", "Hebreos 11", "es")
+    generate_llm_response("¿Qué es la fe?", "explain", "Hebreos 11", "en")
+    assert mock_generate.call_count == 5
+
+
+@patch("app.services.llm_service.model.generate_content")
+def test_answer_cache_invalidated_by_index_reload(
+    mock_generate, question_vectors, monkeypatch
+):
+    from app.indexing.search_service import IndexStore
+
+    mock_generate.return_value = MagicMock(text="Fe es confiar en Dios.")
+    generate_llm_response("¿Qué es la fe?", "explain", "Hebreos 11", "es")
+    monkeypatch.setattr(IndexStore, "version", IndexStore.version + 1)
+    generate_llm_response("¿Qué es la fe?", "explain", "Hebreos 11", "es")
+    assert mock_generate.call_count == 2
+
+
+@patch("app.services.llm_service.model.generate_content")
+def test_answer_cache_skips_errors(mock_generate, question_vectors):
+    mock_generate.return_value = MagicMock(text="  ")
+    generate_llm_response("¿Qué es la fe?", "explain", "Hebreos 11", "es")
+    generate_llm_response("¿Qué es la fe?", "explain", "Hebreos 11", "es")
+    assert mock_generate.call_count == 2
+
+
+def test_answer_cache_ttl_and_size_eviction(monkeypatch):
+    cache = AnswerCache(max_size=2, ttl_seconds=60, threshold=0.9)
+    answer = {"answer": "a", "refs": set()}
+    for i, question in enumerate(["uno", "dos", "tres"]):
+        cache.put("ask", "es", "ctx", question, np.eye(3)[i], answer)
+    assert cache.get("ask", "es", "ctx", "uno", np.eye(3)[0]) is None
+    assert cache.get("ask", "es", "ctx", "tres", np.eye(3)[2]) == answer
+
+    now = time.monotonic()
+    monkeypatch.setattr(time, "monotonic", lambda: now + 61)
+    assert cache.get("ask", "es", "ctx", "tres", np.eye(3)[2]) is None
+    assert cache.stats()["evictions"] == 2
+
+
+# --- TEST local Bible resolution ---
+@pytest.fixture
+def local_bible(monkeypatch):
+    bible = {
+        "S. Juan": {
+            "3": {
+                "16": "Porque de tal manera amó Dios al mundo,",
+                "17": "Porque no envió Dios a su Hijo al mundo para condenar al mundo,",
+                "18": "El que en él cree, no es condenado;",
+            }
+        },
+        "2 Timoteo": {"1": {"7": "Porque no nos ha dado Dios espíritu de cobardía,"}},
+    }
+    monkeypatch.setattr("app.services.bible_service.BIBLE", bible)
+
+    def no_network(*args, **kwargs):
+        raise AssertionError("Bible references must resolve without the network")
+
+    monkeypatch.setattr("app.core.prompt_builder.requests.get", no_network)
+    return bible
+
+
+def test_local_passage_reads_local_bible(local_bible):
+    from app.core.prompt_builder import extract_bible_references, local_passage
+
+    tim, john, missing = extract_bible_references(
+        "2 Tim. 1:7, Juan 3:16-17, 18 y Juan 4:1"
+    )
+    assert local_passage(tim) == (
+        "2 Tim. 1:7 (RVR1960): Porque no nos ha dado Dios espíritu de cobardía,"
+    )
+    text = local_passage(john)
+    assert text.startswith("Juan 3:16-17, 18 (RVR1960): Porque de tal manera")
+    assert "no es condenado" in text
+    assert local_passage(missing) == ""
+
+
+def test_build_prompt_resolves_references_locally(local_bible):
+    result = build_prompt("explain", "¿Qué enseña Juan 3:16?", "Ver 2 Tim. 1:7", "es")
+    assert result["refs"] == {"Juan 3:16", "2 Tim. 1:7"}
+    assert "Porque de tal manera amó Dios al mundo" in result["prompt"]
+    assert "espíritu de cobardía" in result["prompt"]
+
+
+def test_build_prompt_without_remote_fallback(local_bible, monkeypatch):
+    from app.core.config import settings
+
+    monkeypatch.setattr(settings, "BIBLE_REMOTE_FALLBACK", False)
+    result = build_prompt("explain", "¿Qué dice Romanos 8:1?", "", "es")
+    assert result["refs"] == {"Romanos 8:1"}
+    assert "Bible references" not in result["prompt"]
+
+
+def test_extract_bible_references_returns_spans():
+    from app.core.prompt_builder import extract_bible_references
+
+    text = "Lee Génesis 22:9, 16-18 y (1 Juan 4:8). Juan 3:16 también."
+    refs = extract_bible_references(text)
+    assert [r.text for r in refs] == ["Génesis 22:9, 16-18", "1 Juan 4:8", "Juan 3:16"]
+    assert refs[0].book == "Génesis" and refs[0].chapter == 22
+    assert refs[0].verses == ((9, 9), (16, 18))
+    assert refs[1].book == "1 Juan"
+    assert text[refs[2].start : refs[2].end] == "Juan 3:16"
+    assert extract_bible_references("sin referencias") == []
+
+
+def test_template_store_compiles_once_and_reloads(tmp_path):
+    from app.core.prompt_builder import TemplateStore
+
+    (tmp_path / "ask.txt").write_text("Q: {question}\nC: {context}\nL: {lang}")
+    store = TemplateStore(tmp_path)
+    assert store.load() == ["ask"]
+    template = store.get("ask", "en")
+    assert store.get("ask", "en") is template
+    assert template.render(context="ctx {x}", question="why?") == (
+        "Q: why?\nC: ctx {x}\nL: en"
+    )
+
+    (tmp_path / "ask.txt").write_text("{question}!")
+    store.load()
+    assert store.get("ask", "es").render(context="", question="hola") == "hola!"
+    with pytest.raises(FileNotFoundError):
+        store.get("missing", "es")
+
+
+def test_template_store_rejects_malformed_template(tmp_path):
+    from app.core.prompt_builder import TemplateStore
+
+    (tmp_path / "ask.txt").write_text("{question}")
+    store = TemplateStore(tmp_path)
+    store.load()
+
+    (tmp_path / "ask.txt").write_text("{question} {verse}")
+    with pytest.raises(ValueError):
+        store.load()
+    # The previous templates stay in use
+    assert store.get("ask", "es").render(context="", question="hola") == "hola"
+
+
+def test_template_reload_drops_cached_answers():
+    from app.api.v1.admin_routes import reload_templates
+
+    answer = {"answer": "a", "refs": set()}
+    answer_cache.put("ask", "es", "ctx", "¿Qué es la fe?", np.eye(3)[0], answer)
+    assert answer_cache.stats()["size"] == 1
+    assert reload_templates().status_code == 200
+    assert answer_cache.stats()["size"] == 0
+
+
+def test_rebuild_runs_as_a_background_task(monkeypatch):
+    from fastapi import BackgroundTasks, HTTPException
+    from app.api.v1 import admin_routes
+
+    calls = []
+    monkeypatch.setattr(admin_routes, "build_index", lambda: calls.append("build"))
+    monkeypatch.setattr(
+        admin_routes, "preload_index_and_metadata", lambda: calls.append("load")
+    )
+    tasks = BackgroundTasks()
+    response = admin_routes.reindex(tasks, rebuild=True)
+    assert response.status_code == 202
+    assert calls == []
+    assert admin_routes.rebuild_state["status"] == "building"
+    with pytest.raises(HTTPException) as exc:
+        admin_routes.reindex(BackgroundTasks(), rebuild=True)
+    assert exc.value.status_code == 409
+
+    asyncio.run(tasks())
+    assert calls == ["build", "load"]
+    assert admin_routes.rebuild_state["status"] == "idle"
+    assert not admin_routes.rebuild_lock.locked()
+
+
+def test_pack_context_keeps_best_whole_sentences_within_budget():
+    from app.core.prompt_builder import estimate_tokens, pack_context
+
+    passage = "Juan 3:16 (RVR1960): Porque de tal manera amó Dios al mundo."
+    top = "La gracia es un regalo de Dios. Nadie la gana por obras."
+    other = "El templo tenía dos compartimentos. " * 20 + "La gracia sostiene."
+    passages, chunks = pack_context([passage], [top, other], "¿Qué es la gracia?", 60)
+
+    assert passages == [passage]
+    assert chunks[0] == top
+    # Only whole sentences of the lower-ranked chunk, preferring the one
+    # that mentions the question's terms
+    assert "La gracia sostiene." in chunks[1]
+    assert chunks[1] in other
+    packed = " ".join(passages + chunks)
+    assert estimate_tokens(packed) <= 60
+
+
+def test_build_prompt_bounds_context_tokens():
+    from app.core.prompt_builder import estimate_tokens, template_store
+
+    context = "\n\n".join(
+        f"Párrafo {i}. " + "Una oración larga. " * 50 for i in range(10)
+    )
+    result = build_prompt(
+        "explain", "¿Qué dice?", context, lang="es", max_context_tokens=100
+    )
+    overhead = estimate_tokens(
+        template_store.get("explain", "es").render(context="", question="¿Qué dice?")
+    )
+    assert "Párrafo 0." in result["prompt"]
+    assert estimate_tokens(result["prompt"]) - overhead <= 100
+
+
+def test_clean_text_normalizes_in_one_pass():
+    from app.core.prompt_builder import clean_text
+
+    text = '  Dijo:\r\n\t"Sígueme"​  y   él\x07 lo siguió. 𝔄 \n'
+    assert clean_text(text) == "Dijo: 'Sígueme' y él lo siguió. 𝔄"
+    assert clean_text("") == ""
@@ -0,0 +1,50 @@
+from app.indexing.metadata_store import MetadataStore, write_metadata_store
+
+ROWS = [
+    {
+        "type": "book-section",
+        "book_title": "El Conflicto de los Siglos",
+        "page_number": 16,
+        "text": "Desde lo alto del Monte de los Olivos miraba Jesús a Jerusalén.",
+    },
+    {
+        "type": "lesson-section",
+        "year": "2025",
+        "lesson_id": "lesson-08",
+        "day_index": 1,
+        "text": "“¡Oh si también tú conocieses!”",
+        "quote": None,
+    },
+    {
+        "type": "book-section",
+        "book_title": "El Conflicto de los Siglos",
+        "page_number": 17,
+        "text": "Otro párrafo distinto.",
+    },
+]
+
+
+def test_metadata_store_round_trip(tmp_path):
+    path = tmp_path / "meta.bin"
+    write_metadata_store(ROWS, path)
+    store = MetadataStore(path)
+
+    assert len(store) == len(ROWS)
+    assert list(store) == ROWS
+    assert store[-1] == ROWS[-1]
+    # Fields missing from a row stay missing rather than reading as None
+    assert "year" not in store[0]
+    assert store[1]["quote"] is None
+
+
+def test_metadata_store_text_column_and_postings(tmp_path):
+    path = tmp_path / "meta.bin"
+    write_metadata_store(ROWS, path)
+    store = MetadataStore(path)
+
+    texts = store.text_column("text")
+    assert [texts[i] for i in range(len(store))] == [r["text"] for r in ROWS]
+    postings = store.postings("type")
+    assert postings["book-section"].tolist() == [0, 2]
+    assert postings["lesson-section"].tolist() == [1]
+    assert store.postings("text") is None
@@ -0,0 +1,136 @@
+import asyncio
+import threading
+import time
+from unittest.mock import MagicMock
+
+import pytest
+
+from app.core.prompt_builder import extract_bible_references
+from app.services.passage_cache import PassageCache, reference_key
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return PassageCache(max_size=16, path=tmp_path / "passages.sqlite3")
+
+
+JOHN_3_16 = reference_key("Juan", 3, ((16, 16),))
+
+
+def counting_fetch(text="(WEB): For God so loved the world", delay=0.0):
+    calls = []
+
+    def fetch():
+        calls.append(1)
+        time.sleep(delay)
+        return text
+
+    return fetch, calls
+
+
+def test_reference_key_maps_abbreviations():
+    assert reference_key("Jn.", 3, ((16, 16),)) == "S. Juan 3:16"
+    assert reference_key("Juan", 3, ((16, 18), (20, 20))) == "S. Juan 3:16-18,20"
+    assert reference_key("2 Tim.", 1, ((7, 7),)) == "2 Timoteo 1:7"
+    keys = [ref.key for ref in extract_bible_references("Jn. 3:16 y Juan  3:16")]
+    assert keys == [JOHN_3_16, JOHN_3_16]
+
+
+def test_repeat_lookups_fetch_once_and_survive_restarts(cache, tmp_path):
+    fetch, calls = counting_fetch()
+    first = cache.get_or_fetch(JOHN_3_16, fetch)
+    assert cache.get_or_fetch(JOHN_3_16, fetch) == first
+    assert len(calls) == 1
+
+    # A new process reads the passage back from the SQLite tier
+    restarted = PassageCache(max_size=16, path=tmp_path / "passages.sqlite3")
+    assert restarted.get_or_fetch(JOHN_3_16, fetch) == first
+    assert len(calls) == 1
+    assert restarted.stats()["disk_hits"] == 1
+
+
+def test_concurrent_misses_are_single_flighted(cache):
+    fetch, calls = counting_fetch(delay=0.1)
+    results = []
+    threads = [
+        threading.Thread(
+            target=lambda: results.append(cache.get_or_fetch(JOHN_3_16, fetch))
+        )
+        for _ in range(10)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(calls) == 1
+    assert len(set(results)) == 1 and results[0]
+
+
+def test_failed_fetches_are_retried(cache):
+    fetch, calls = counting_fetch(text="")
+    assert cache.get_or_fetch(JOHN_3_16, fetch) == ""
+    assert cache.get_or_fetch(JOHN_3_16, fetch) == ""
+    assert len(calls) == 2
+
+
+def test_fetch_bible_text_makes_no_repeat_requests(cache, monkeypatch):
+    from app.core import prompt_builder
+
+    response = MagicMock()
+    response.json.return_value = {
+        "verses": [{"text": "For God so loved the world"}],
+        "translation_name": "World English Bible",
+    }
+    get = MagicMock(return_value=response)
+    monkeypatch.setattr(prompt_builder, "passage_cache", cache)
+    monkeypatch.setattr(prompt_builder.requests, "get", get)
+
+    (ref,) = extract_bible_references("Juan 3:16")
+    first = prompt_builder.fetch_bible_text(ref)
+    assert first == "Juan 3:16 (World English Bible): For God so loved the world"
+    assert prompt_builder.fetch_bible_text(ref) == first
+    assert get.call_count == 1
+
+
+def test_cached_passages_carry_the_callers_spelling(cache, monkeypatch):
+    from app.core import prompt_builder
+
+    calls = []
+
+    def request_bible_text(ref):
+        calls.append(ref)
+        return "(WEB): For God so loved the world"
+
+    monkeypatch.setattr(prompt_builder, "passage_cache", cache)
+    monkeypatch.setattr(prompt_builder, "request_bible_text", request_bible_text)
+
+    short, written = extract_bible_references("Jn. 3:16 o Juan 3:16")
+    first = prompt_builder.fetch_bible_text(short)
+    assert first == "Jn. 3:16 (WEB): For God so loved the world"
+    again = prompt_builder.fetch_bible_text(written)
+    assert again == "Juan 3:16 (WEB): For God so loved the world"
+    assert calls == ["Jn. 3:16"]
+
+
+def test_async_lookups_keep_sqlite_off_the_event_loop(cache, monkeypatch):
+    from app.services import passage_cache as module
+
+    offloaded = []
+
+    async def run_in_threadpool(func, *args):
+        offloaded.append(func.__name__)
+        return func(*args)
+
+    async def fetch():
+        return "(WEB): For God so loved the world"
+
+    monkeypatch.setattr(module, "run_in_threadpool", run_in_threadpool)
+
+    async def lookups():
+        first = await cache.get_or_fetch_async(JOHN_3_16, fetch)
+        assert await cache.get_or_fetch_async(JOHN_3_16, fetch) == first
+
+    asyncio.run(lookups())
+    # The miss reads and writes SQLite in the threadpool; the repeat is a
+    # memory hit answered on the loop
+    assert offloaded == ["_claim", "_settle"]
@@ -0,0 +1,64 @@
+import threading
+import time
+
+import pytest
+
+from app.services.s3_store import S3Store
+
+
+class PagedClient:
+    """
+    list_objects_v2 stand-in returning `page_size` keys per response.
+    """
+
+    def __init__(self, keys, page_size):
+        self.keys = keys
+        self.page_size = page_size
+        self.requests = []
+
+    def list_objects_v2(self, Bucket, Prefix="", ContinuationToken=None):
+        self.requests.append(ContinuationToken)
+        keys = [k for k in self.keys if k.startswith(Prefix)]
+        start = int(ContinuationToken or 0)
+        page = keys[start : start + self.page_size]
+        resp = {"Contents": [{"Key": k, "ETag": f'"{k}"'} for k in page]}
+        if start + self.page_size < len(keys):
+            resp["IsTruncated"] = True
+            resp["NextContinuationToken"] = str(start + self.page_size)
+        return resp
+
+
+def test_list_objects_follows_continuation_tokens():
+    keys = [f"2025/Q2/lesson-{i:04d}/metadata.json" for i in range(2500)]
+    client = PagedClient(keys + ["covers/a.png"], page_size=1000)
+    store = S3Store(client, "bucket")
+
+    assert [obj["Key"] for obj in store.list_objects("2025/")] == keys
+    assert client.requests == [None, "1000", "2000"]
+
+
+def test_map_runs_reads_concurrently_in_order():
+    store = S3Store(client=None, bucket="bucket")
+    active, peak = 0, 0
+    lock = threading.Lock()
+
+    def slow_read(key):
+        nonlocal active, peak
+        with lock:
+            active += 1
+            peak = max(peak, active)
+        time.sleep(0.05)
+        with lock:
+            active -= 1
+        return key.upper()
+
+    start = time.perf_counter()
+    assert store.map(slow_read, ["a", "b", "c", "d"]) == ["A", "B", "C", "D"]
+    assert time.perf_counter() - start < 0.15
+    assert peak > 1
+
+    def failing_read(key):
+        raise KeyError(key)
+
+    with pytest.raises(KeyError):
+        store.map(failing_read, ["a", "b"])
@@ -157,3 +157,89 @@ def test_llm_long_text():
     )
     assert response.status_code == 200
     assert isinstance(response.json().get("result"), dict)
+
+
+def test_search_hydrates_text_from_chunk_store(monkeypatch):
+    # Result text must come from the in-memory chunk store, not the source files
+    import app.indexing.search_service as search_service
+
+    def fail_load_chunk_text(meta):
+        raise AssertionError("search_lessons should not re-read source files")
+
+    with TestClient(app) as client:
+        assert len(search_service.IndexStore.chunk_texts) == len(
+            search_service.IndexStore.metadata
+        )
+        monkeypatch.setattr(search_service, "load_chunk_text", fail_load_chunk_text)
+        response = client.get("/api/v1/search?q=esperanza&top_k=3")
+        assert response.status_code == 200
+        results = response.json()["results"]
+        assert len(results) == 3
+        assert all(isinstance(r["text"], str) and r["text"] for r in results)
+
+
+def test_search_cosine_index_returns_similarities(monkeypatch):
+    # Rebuild the stored vectors as a cosine (inner-product) index
+    import faiss
+    import app.indexing.search_service as search_service
+    from app.indexing.index_builder import create_index
+    from app.indexing.search_service import IndexStore, search_lessons
+
+    flat = search_service.load_faiss_index()
+    vectors = flat.reconstruct_n(0, 50)
+    monkeypatch.setattr(IndexStore, "index", create_index(vectors, metric="cosine"))
+    monkeypatch.setattr(IndexStore, "metadata", [{"type": "book-section"}] * 50)
+    monkeypatch.setattr(IndexStore, "chunk_texts", [f"chunk {i}" for i in range(50)])
+    # Scaled copy of chunk 7: identical direction, so cosine similarity is 1
+    monkeypatch.setattr(search_service, "embed_query", lambda q: vectors[7] * 3)
+
+    results = search_lessons("consulta", top_k=5)
+    assert results[0]["text"] == "chunk 7"
+    assert results[0]["score"] == pytest.approx(1.0, abs=1e-5)
+    assert results[0]["normalized_score"] == pytest.approx(100.0, abs=1e-3)
+    assert all(-1.0 <= r["score"] <= 1.0 + 1e-5 for r in results)
+
+    # A similarity threshold drops everything but the exact match
+    assert len(search_lessons("consulta", top_k=5, min_similarity=0.9999)) == 1
+
+
+def test_search_type_filter_returns_top_k_matches():
+    # The filter runs inside FAISS, so top_k matching chunks come back
+    with TestClient(app) as client:
+        response = client.get("/api/v1/search?q=esperanza&type=book&top_k=7")
+        assert response.status_code == 200
+        results = response.json()["results"]
+        assert len(results) == 7
+        assert all(r["type"] == "book-section" for r in results)
+
+
+def test_search_filter_without_matches_returns_empty():
+    with TestClient(app) as client:
+        response = client.get(
+            "/api/v1/search?q=esperanza&book_title=Libro%20inexistente"
+        )
+        assert response.status_code == 200
+        data = response.json()
+        assert data["results"] == [] and data["count"] == 0
+
+
+def test_filter_on_field_missing_from_index_matches_nothing():
+    # The shipped index holds only book sections, with no year or lesson_id;
+    # filtering on those must not return chunks that fail the filter
+    with TestClient(app) as client:
+        for query in ("year=2025", "lesson_id=lesson-1"):
+            response = client.get(f"/api/v1/search?q=esperanza&{query}")
+            assert response.status_code == 200
+            assert response.json()["count"] == 0
+
+
+def test_memory_mapped_index_matches_loaded_copy():
+    import numpy as np
+    from app.indexing.search_service import load_faiss_index
+
+    mapped = load_faiss_index(mmap=True)
+    copy = load_faiss_index(mmap=False)
+    assert mapped.ntotal == copy.ntotal
+    queries = copy.reconstruct_n(0, 5)
+    for a, b in zip(mapped.search(queries, 5), copy.search(queries, 5)):
+        np.testing.assert_array_equal(a, b)